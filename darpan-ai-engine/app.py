@@ -7,7 +7,8 @@ import requests
 import vertexai
 import io
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import httplib2
 from google.cloud import firestore
 from google.cloud import translate_v2 as translate
 from vertexai.generative_models import GenerativeModel
@@ -19,7 +20,12 @@ from googleapiclient.discovery import build # For Web Search
 from datetime import datetime
 from text_forensic import analyze_text_forensics
 from google.cloud import vision
-import exifread
+from decoded_media import DecodedMedia
+from evidence import gather_evidence, SourceUnavailable, TEXT_EVIDENCE_DEADLINE_S, MEDIA_EVIDENCE_DEADLINE_S
+from vector_index import load_corpus, load_or_build
+from embedding_cache import EmbeddingCache
+from search_cache import TTLCache, normalize_query
+from verdict_cache import VerdictCache
 
 # ML model imports
 import tensorflow as tf
@@ -49,12 +55,26 @@ SEARCH_ENGINE_ID = os.environ.get("SEARCH_ENGINE_ID", "8428b10238cc84bdb")
 PROJECT_ID = os.environ.get("PROJECT_ID", "darpan-project")
 LOCATION = os.environ.get("LOCATION", "us-central1")
 MODEL_ID = os.environ.get("MODEL_ID", "gemini-2.5-flash")
-
-# RAG endpoint config
+# Part of the verdict cache key: bump when the matching system prompt changes
+TEXT_PROMPT_VERSION = "1"
+MEDIA_PROMPT_VERSION = "1"
+
+# RAG config. "local" searches an in-process index of TRUSTED_CORPUS plus
+# corpus/*.txt; "remote" queries the Vertex AI Vector Search endpoint.
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "local")
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "text-embedding-004")
+CORPUS_DIR = os.environ.get("CORPUS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus"))
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "/tmp/darpan_vector_index")
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "3"))
+# Cosine similarity; the endpoint's 0.7 squared-L2 cut-off on unit vectors is ~0.65
+RAG_MIN_SCORE = float(os.environ.get("RAG_MIN_SCORE", "0.65"))
 RAG_INDEX_ENDPOINT_ID = os.environ.get("RAG_INDEX_ENDPOINT_ID", "5271518339418554368")
 RAG_DEPLOYED_INDEX_ID = os.environ.get("RAG_DEPLOYED_INDEX_ID", "darpan_rag_endpoint_1760863191758")
 
 FORENSIC_SERVICE_URL = os.environ.get("FORENSIC_SERVICE_URL", "https://darpan-forensic-service-361059167059.us-central1.run.app")
+# Use the forensic service's submit/poll job API instead of one long request
+FORENSIC_JOB_MODE = os.environ.get("FORENSIC_JOB_MODE", "0") == "1"
+FORENSIC_JOB_POLL_WAIT = float(os.environ.get("FORENSIC_JOB_POLL_WAIT", "20"))
 
 MODEL_BUCKET = os.environ.get("MODEL_BUCKET", "darpan-hackathon-us-central1")
 MODEL_GCS_PATH = os.environ.get("MODEL_GCS_PATH", "models/artifact-detector/v1_sample/model_weights.h5")
@@ -89,6 +109,13 @@ init_error = None
 llm_model = None
 embedding_model = None
 index_endpoint = None
+rag_index = None
+embedding_cache = EmbeddingCache()
+search_cache = TTLCache()
+verdict_cache = VerdictCache()
+_search_service = None
+_search_service_lock = threading.Lock()
+_search_http = threading.local()
 translate_client = None
 db = None
 artifact_model = None
@@ -116,6 +143,14 @@ def build_model(learning_rate=0.001):
     print("--- Model built and compiled successfully ---")
     return model
 
+# ---------------------------
+# Utility: Cached text embeddings
+# ---------------------------
+def embed_texts(texts):
+    """Embeddings for `texts`; only texts not seen before reach the Vertex AI API."""
+    return embedding_cache.embed(
+        texts, lambda batch: [e.values for e in embedding_model.get_embeddings(batch)], EMBEDDING_MODEL_ID)
+
 # ---------------------------
 # Initialization (run once)
 # ---------------------------
@@ -128,13 +163,18 @@ try:
 
     print(f"--- (Global Scope) Initializing Vertex AI Models (LLM: {MODEL_ID}) ---")
     llm_model = GenerativeModel(MODEL_ID)
-    embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
+    embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_ID)
     print("--- (Global Scope) Vertex AI Models Initialized ---")
 
-    print(f"--- (Global Scope) Connecting to Vector Search Endpoint {RAG_INDEX_ENDPOINT_ID} ---")
-    endpoint_path = f"projects/{PROJECT_ID}/locations/{LOCATION}/indexEndpoints/{RAG_INDEX_ENDPOINT_ID}"
-    index_endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=endpoint_path)
-    print(f"--- (Global Scope) Successfully connected to Vector Search Endpoint ---")
+    if RAG_BACKEND == "remote":
+        print(f"--- (Global Scope) Connecting to Vector Search Endpoint {RAG_INDEX_ENDPOINT_ID} ---")
+        endpoint_path = f"projects/{PROJECT_ID}/locations/{LOCATION}/indexEndpoints/{RAG_INDEX_ENDPOINT_ID}"
+        index_endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=endpoint_path)
+        print(f"--- (Global Scope) Successfully connected to Vector Search Endpoint ---")
+    else:
+        print(f"--- (Global Scope) Loading local vector index ({CORPUS_DIR}) ---")
+        rag_index = load_or_build(VECTOR_INDEX_DIR, load_corpus(CORPUS_DIR, TRUSTED_CORPUS),
+                                  embed_texts, EMBEDDING_MODEL_ID)
 
     print(f"--- (Global Scope) Initializing Google Cloud Translate Client ---")
     translate_client = translate.Client()
@@ -159,7 +199,7 @@ try:
 
 except Exception as e:
     init_error = e
-    llm_model = embedding_model = index_endpoint = translate_client = db = artifact_model = None
+    llm_model = embedding_model = index_endpoint = rag_index = translate_client = db = artifact_model = None
     print(f"!!! (Global Scope) CRITICAL ERROR during Initialization: {e}")
     print(traceback.format_exc())
 
@@ -187,40 +227,68 @@ def analyze_media_preflight():
 # ---------------------------
 # Helper: Google Search
 # ---------------------------
+def _search_client():
+    """The Custom Search client, built once (building it parses the discovery document)."""
+    global _search_service
+    with _search_service_lock:
+        if _search_service is None:
+            _search_service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY, cache_discovery=False)
+    return _search_service
+
+def _search_snippets(query, num):
+    # httplib2 connections aren't thread-safe, so each evidence worker keeps its own
+    if not hasattr(_search_http, "http"):
+        _search_http.http = httplib2.Http(timeout=15)
+    res = _search_client().cse().list(q=query, cx=SEARCH_ENGINE_ID, num=num).execute(http=_search_http.http)
+    snippets = []
+    for item in res.get('items', []):
+        snippets.append(f"Title: {item.get('title', 'N/A')}\nSource: {item.get('displayLink', 'N/A')}\nSnippet: {item.get('snippet', 'N/A').replace(chr(10), ' ')}")
+    print(f"--- google_search: Found {len(snippets)} web results.")
+    return "\n---\n".join(snippets) if snippets else "No relevant web results found."
+
 def google_search(query, num=3):
     if not GOOGLE_API_KEY or not SEARCH_ENGINE_ID:
         print("!!! google_search: API Key or Search Engine ID not configured.")
-        return "Web search is not configured."
+        raise SourceUnavailable("Web search is not configured.")
+    key = normalize_query(query)
+    if not key:
+        return "No relevant web results found."
     try:
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-        res = service.cse().list(q=query, cx=SEARCH_ENGINE_ID, num=num).execute()
-        snippets = []
-        for item in res.get('items', []):
-            snippets.append(f"Title: {item.get('title', 'N/A')}\nSource: {item.get('displayLink', 'N/A')}\nSnippet: {item.get('snippet', 'N/A').replace(chr(10), ' ')}")
-        print(f"--- google_search: Found {len(snippets)} web results.")
-        return "\n---\n".join(snippets) if snippets else "No relevant web results found."
+        # Failed searches raise out of the cache and are never stored
+        return search_cache.get((key, num), lambda: _search_snippets(key, num))
     except Exception as e:
         print(f"!!! google_search: CRITICAL ERROR - {e.__class__.__name__}: {e}")
-        return f"Google Search failed: {e.__class__.__name__}."
+        raise SourceUnavailable(f"Google Search failed: {e.__class__.__name__}.")
 
 # ---------------------------
 # Helper: Vector Search
 # ---------------------------
-def vector_search(query, threshold=0.7):
-    global embedding_model, index_endpoint, TRUSTED_CORPUS
-    if not embedding_model or not index_endpoint:
-        return "RAG components not initialized."
-    try:
-        query_embedding = embedding_model.get_embeddings([query])[0].values
-        response = index_endpoint.find_neighbors(deployed_index_id=RAG_DEPLOYED_INDEX_ID, queries=[query_embedding], num_neighbors=1)
-        if response and response[0] and len(response[0]) > 0:
-            best = response[0][0]
-            if best.distance < threshold:
-                return TRUSTED_CORPUS.get(best.id, "No matching facts found.")
+def rag_ready():
+    return bool(rag_index if RAG_BACKEND != "remote" else index_endpoint)
+
+def vector_search(query, k=RAG_TOP_K, threshold=0.7):
+    """
+    Top-k trusted corpus entries for `query` as [{"id", "score", "text"}],
+    or a message string when nothing matches. `threshold` is the remote
+    endpoint's distance cut-off; the local index uses RAG_MIN_SCORE.
+    """
+    global embedding_model, index_endpoint, rag_index, TRUSTED_CORPUS
+    if not embedding_model or not rag_ready():
+        raise SourceUnavailable("RAG components not initialized.")
+    if not query or not query.strip():
         return "No matching facts found in the trusted database."
+    try:
+        query_embedding = embed_texts([query])[0]
+        if RAG_BACKEND == "remote":
+            response = index_endpoint.find_neighbors(deployed_index_id=RAG_DEPLOYED_INDEX_ID, queries=[query_embedding.tolist()], num_neighbors=k)
+            hits = [{"id": n.id, "distance": round(float(n.distance), 4), "text": TRUSTED_CORPUS.get(n.id, "")}
+                    for n in (response[0] if response else []) if n.distance < threshold]
+        else:
+            hits = rag_index.search(query_embedding, k=k, min_score=RAG_MIN_SCORE)[0]
+        return hits or "No matching facts found in the trusted database."
     except Exception as e:
         print(f"!!! vector_search: Error during query - {e} !!!")
-        return f"Trusted fact-check database query failed: {e.__class__.__name__}."
+        raise SourceUnavailable(f"Trusted fact-check database query failed: {e.__class__.__name__}.")
 
 # ---------------------------
 # Helper: Translation
@@ -264,16 +332,17 @@ def translate_report_data(report_json, target_language):
 # ---------------------------
 # Helper: ML artifact detector
 # ---------------------------
-def run_ml_artifact_detector(image_bytes):
+def run_ml_artifact_detector(decoded):
     global artifact_model
     if not artifact_model:
-        return {"error": "ML model not available."}
+        raise SourceUnavailable({"error": "ML model not available."})
+    if decoded is None:
+        raise SourceUnavailable({"error": "Unsupported or undecodable image."})
     try:
         print("--- RUNNING REAL ML ARTIFACT DETECTOR ---")
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img = img.resize((IMG_WIDTH, IMG_HEIGHT))
-        arr = np.array(img)
-        batch = np.expand_dims(arr, axis=0)
+        if decoded.frames is not None:
+            return run_ml_artifact_detector_frames(decoded)
+        batch = np.expand_dims(decoded.model_input, axis=0)
         pred = artifact_model.predict(batch, verbose=0)
         score = float(pred[0][0])
         print(f"--- ML MODEL PREDICTION: {score:.4f} ---")
@@ -281,29 +350,88 @@ def run_ml_artifact_detector(image_bytes):
         return {"artifact_detector": {"artifact_likelihood_score": fake_likelihood_score}}
     except Exception as e:
         print(f"!!! run_ml_artifact_detector error: {e}")
-        return {"error": str(e)}
+        raise SourceUnavailable({"error": str(e)})
+
+def run_ml_artifact_detector_frames(decoded):
+    """Score every sampled frame of a video / animation in one batch; the peak frame sets the verdict."""
+    pred = artifact_model.predict(decoded.frames, batch_size=len(decoded.frames), verbose=0)
+    scores = [round(1.0 - float(p[0]), 4) for p in pred]
+    peak = int(np.argmax(scores))
+    print(f"--- ML MODEL PREDICTION: {len(scores)} frames, peak {scores[peak]:.4f} ---")
+    return {"artifact_detector": {
+        "artifact_likelihood_score": scores[peak],
+        "mean_artifact_likelihood": round(float(np.mean(scores)), 4),
+        "peak_t": round(decoded.frame_times[peak], 3),
+        "frames": [{"t": round(t, 3), "artifact_likelihood_score": s} for t, s in zip(decoded.frame_times, scores)],
+    }}
 
 # ---------------------------
 # Helper: External forensic service
 # ---------------------------
+def absolutize_forensic_urls(report):
+    """
+    The forensic service links artifacts and reports by path (/artifacts/<digest>,
+    /download?...); prefix its base URL so the browser can fetch them directly.
+    """
+    if isinstance(report, dict):
+        for key, value in report.items():
+            if key == "url" and isinstance(value, str) and value.startswith("/"):
+                report[key] = FORENSIC_SERVICE_URL + value
+            elif key == "report_urls" and isinstance(value, dict):
+                report[key] = {fmt: FORENSIC_SERVICE_URL + u for fmt, u in value.items()}
+            else:
+                absolutize_forensic_urls(value)
+    elif isinstance(report, list):
+        for value in report:
+            absolutize_forensic_urls(value)
+    return report
+
+def run_external_forensics_job(file_bytes, mime_type, filename, timeout=120):
+    """Submit to the forensic service's job API and long-poll for the result."""
+    deadline = time.time() + timeout
+    files = {'file': (filename, file_bytes, mime_type)}
+    resp = requests.post(f"{FORENSIC_SERVICE_URL}/jobs", files=files, timeout=30)
+    if resp.status_code != 202:
+        print(f"!!! EXTERNAL FORENSICS job submit error: {resp.status_code} {resp.text}")
+        raise SourceUnavailable({"error": f"forensic service status {resp.status_code}", "details": resp.text})
+    job_id = resp.json()["job_id"]
+    print(f"--- EXTERNAL FORENSICS: Job {job_id} submitted. ---")
+
+    job = {}
+    while time.time() < deadline:
+        wait = max(0, min(FORENSIC_JOB_POLL_WAIT, deadline - time.time()))
+        job = requests.get(f"{FORENSIC_SERVICE_URL}/jobs/{job_id}", params={"wait": wait}, timeout=wait + 10).json()
+        if job.get("status") == "done":
+            print("--- EXTERNAL FORENSICS: Job report received successfully. ---")
+            return absolutize_forensic_urls(job["result"])
+        if job.get("status") == "error":
+            raise SourceUnavailable({"error": "forensic job failed", "details": job.get("error")})
+    # Out of time: hand back whatever stages finished
+    raise SourceUnavailable(absolutize_forensic_urls(
+        {"error": "forensic job timed out", "job_id": job_id, **job.get("partial", {})}))
+
 def run_external_forensics(file_bytes, mime_type, filename, timeout=120):
     print(f"--- RUNNING EXTERNAL IMAGE FORENSICS (Calling: {FORENSIC_SERVICE_URL}) ---")
     try:
+        if FORENSIC_JOB_MODE:
+            return run_external_forensics_job(file_bytes, mime_type, filename, timeout)
         files = {'file': (filename, file_bytes, mime_type)}
         resp = requests.post(f"{FORENSIC_SERVICE_URL}/analyze-media-forensics", files=files, timeout=timeout)
         if resp.status_code == 200:
             print("--- EXTERNAL FORENSICS: Report received successfully. ---")
-            return resp.json()
+            return absolutize_forensic_urls(resp.json())
         print(f"!!! EXTERNAL FORENSICS Error: {resp.status_code} {resp.text}")
-        return {"error": f"forensic service status {resp.status_code}", "details": resp.text}
+        raise SourceUnavailable({"error": f"forensic service status {resp.status_code}", "details": resp.text})
+    except SourceUnavailable:
+        raise
     except Exception as e:
         print(f"!!! run_external_forensics error: {e}")
-        return {"error": str(e)}
+        raise SourceUnavailable({"error": str(e)})
 
 # ---------------------------
 # Helper: Digital provenance
 # ---------------------------
-def run_digital_provenance(image_bytes):
+def run_digital_provenance(image_bytes, decoded=None):
     print("--- RUNNING DIGITAL PROVENANCE (Vision API) ---")
     try:
         client = vision.ImageAnnotatorClient()
@@ -326,21 +454,23 @@ def run_digital_provenance(image_bytes):
         prov["web_origin"]["pages_with_matching_pages"] = pages
 
     try:
-        stream = io.BytesIO(image_bytes)
-        tags = exifread.process_file(stream, details=True, stop_tag='UNDEF', strict=False)
+        if decoded is None:
+            raise ValueError("image could not be decoded")
+        # EXIF comes from the request's single decode (exifread-style tag names)
         cleaned = {}
         suspicious = []
-        for tag, value in tags.items():
-            if tag in ('JPEGThumbnail', 'TIFFThumbnail', 'EXIF MakerNote'): continue
-            tag_str, val_str = str(tag), str(value.values)
+        for tag_str, val_str in decoded.exif.items():
             if tag_str.lower() in ['image software', 'exif image description', 'image description'] and any(k in val_str.lower() for k in ['photoshop', 'gimp', 'ai']):
                 suspicious.append(val_str)
             cleaned[tag_str] = val_str
         prov['metadata'] = {"has_metadata": bool(cleaned), "suspicious_tags": suspicious, "all_tags": cleaned}
     except Exception as e:
-        print(f"!!! EXIFRead failed: {e}")
+        print(f"!!! EXIF metadata read failed: {e}")
         prov['metadata'] = {"error": str(e)}
     print("--- DIGITAL PROVENANCE COMPLETE ---")
+    if web is None:
+        # The EXIF half still goes to the prompt, but the web origin is missing
+        raise SourceUnavailable(prov, "Vision API web detection failed")
     return prov
 
 # ---------------------------
@@ -411,7 +541,23 @@ def prune_forensic_report_for_gemini(raw):
             pruned['metadata_summary'] = "No EXIF data."
     else:
         pruned['metadata_summary'] = "Metadata invalid."
-        
+
+    # Video / animated uploads: per-frame scores aggregated by the forensic service
+    timeline = raw.get('timeline')
+    if isinstance(timeline, dict):
+        pruned['timeline_summary'] = {
+            "summary": timeline.get('summary'),
+            "synthetic_likelihood": timeline.get('synthetic_likelihood')
+        }
+
+    # Perceptual-hash match against registered known fakes
+    known_fake = raw.get('known_fake_match')
+    if isinstance(known_fake, dict):
+        pruned['known_fake_match'] = {
+            "hamming_distance": known_fake.get('distance'),
+            "note": known_fake.get('note')
+        }
+
     return pruned
 
 def prune_provenance_report_for_gemini(raw):
@@ -431,13 +577,66 @@ def prune_provenance_report_for_gemini(raw):
         
     return pruned
 
+def claim_embedding(text):
+    """The claim's embedding for the semantic verdict lookup, or None when it is disabled or fails."""
+    if verdict_cache.semantic_min_score <= 0 or not (text or "").strip():
+        return None
+    try:
+        return embed_texts([text])[0]
+    except Exception as e:
+        print(f"!!! claim_embedding: {e.__class__.__name__}: {e}")
+        return None
+
+def generate_verdict(endpoint, scope, claim, evidence, evidence_stage, system_prompt, claim_vector=None):
+    """
+    Gemini's parsed (English) report for this prompt, reused from the verdict
+    cache when the same claim was judged on the same evidence. Returns
+    (report, cache) where cache is "exact", "semantic" or None.
+    """
+    report_data, cache = verdict_cache.get(scope, claim, evidence, claim_vector)
+    if report_data is not None:
+        print(f"--- {endpoint}: Reusing cached verdict ({cache} match). ---")
+        return report_data, cache
+
+    print(f"--- {endpoint}: Calling {MODEL_ID} with {len(system_prompt)} char prompt... ---")
+    response = llm_model.generate_content([system_prompt], generation_config={"response_mime_type": "application/json"})
+    response_text = response.text
+    print(f"--- {endpoint}: Received raw English JSON response ({len(response_text)} chars). ---")
+
+    report_data = json.loads(response_text)
+    if "score" not in report_data or "summary" not in report_data:
+        raise ValueError("Gemini response missing required keys")
+    # A verdict reached on partial evidence isn't worth pinning for the TTL
+    if all(s["status"] == "ok" for s in evidence_stage["sources"].values()):
+        verdict_cache.put(scope, claim, evidence, report_data, claim_vector)
+    return report_data, None
+
+def request_timings(evidence_stage, llm_s, translate_s, total_s, llm_cache=None):
+    """
+    Where a request's time went. The stages run one after another, so the
+    critical path is the evidence stage's slowest source, then Gemini, then
+    translation. `llm_cache` says whether the verdict came from the cache.
+    """
+    return {
+        "evidence": evidence_stage,
+        "llm_s": round(llm_s, 3),
+        "llm_cache": llm_cache,
+        "translate_s": round(translate_s, 3),
+        "total_s": round(total_s, 3),
+        "critical_path": [
+            {"stage": f"evidence:{evidence_stage['critical_path']['source']}", "time_s": evidence_stage['wall_time_s']},
+            {"stage": "llm", "time_s": round(llm_s, 3)},
+            {"stage": "translate", "time_s": round(translate_s, 3)},
+        ],
+    }
+
 # ---------------------------
 # Endpoint: Text analysis (RESTORED 6-FACTOR PROMPT)
 # ---------------------------
 @app.route('/analyze', methods=['POST'])
 def analyze_content():
     if init_error: return jsonify({"error": f"AI Service initialization failed: {init_error}"}), 500
-    if not all([llm_model, embedding_model, index_endpoint, translate_client, db]):
+    if not all([llm_model, embedding_model, rag_ready(), translate_client, db]):
         return jsonify({"error": "AI components missing."}), 500
 
     start_time = time.time()
@@ -448,9 +647,14 @@ def analyze_content():
         lang = data.get('lang', 'en').split('-')[0]
         if not user_query: return jsonify({"error": "No query"}), 400
 
-        text_forensic_results = analyze_text_forensics(user_query) if lang == 'en' else {"error": f"forensics not for {lang}"}
-        rag_results = vector_search(user_query)
-        web_results = google_search(user_query)
+        # --- Gather evidence concurrently under the request deadline ---
+        sources = {"rag": (vector_search, user_query), "web": (google_search, user_query)}
+        if lang == 'en':
+            sources["text_forensics"] = (analyze_text_forensics, user_query)
+        evidence, evidence_stage = gather_evidence(sources, TEXT_EVIDENCE_DEADLINE_S)
+        rag_results = evidence["rag"]
+        web_results = evidence["web"]
+        text_forensic_results = evidence.get("text_forensics", {"error": f"forensics not for {lang}"})
 
         system_prompt = f"""
         You are 'Darpan', a neutral, professional, and multilingual AI fact-checking analyst.
@@ -529,16 +733,16 @@ def analyze_content():
           }}
         }}
         """
-        print(f"--- /analyze: Calling {MODEL_ID} (Text) with {len(system_prompt)} char prompt... ---")
-        response = llm_model.generate_content([system_prompt], generation_config={"response_mime_type": "application/json"})
-        response_text = response.text
-        print(f"--- /analyze: Received raw English JSON response ({len(response_text)} chars). ---")
-        
-        report_data = json.loads(response_text)
-        if "score" not in report_data or "summary" not in report_data:
-            raise ValueError("Gemini response missing required keys")
-
+        llm_start = time.time()
+        report_data, llm_cache = generate_verdict(
+            "/analyze", (MODEL_ID, "text", TEXT_PROMPT_VERSION), user_query,
+            {"rag_search": rag_results, "web_search": web_results, "text_forensics": text_forensic_results},
+            evidence_stage, system_prompt, claim_embedding(user_query))
+        llm_s = time.time() - llm_start
+
+        translate_start = time.time()
         report_data = translate_report_data(report_data.copy(), lang)
+        translate_s = time.time() - translate_start
         report_data['text_forensics'] = text_forensic_results
         case_id = f"text-{int(time.time())}"
         report_data['caseId'] = case_id
@@ -546,6 +750,7 @@ def analyze_content():
         report_data['sha256_hash'] = report_hash
         
         elapsed = time.time() - start_time
+        report_data['timings'] = request_timings(evidence_stage, llm_s, translate_s, elapsed, llm_cache)
         print(f"--- /analyze: Success. Language: '{lang}'. Time: {elapsed:.2f}s ---")
         return jsonify(report_data), 200
 
@@ -561,7 +766,7 @@ def analyze_content():
 @app.route('/analyze-media', methods=['POST'])
 def analyze_media():
     if init_error: return jsonify({"error": f"AI Service initialization failed: {init_error}"}), 500
-    if not all([llm_model, embedding_model, index_endpoint, translate_client, db, artifact_model]):
+    if not all([llm_model, embedding_model, rag_ready(), translate_client, db, artifact_model]):
         return jsonify({"error": "AI components missing."}), 500
 
     start_time = time.time()
@@ -581,33 +786,26 @@ def analyze_media():
         mime_type = magic.from_buffer(file_bytes, mime=True)
         print(f"--- /analyze-media: Received '{filename}', mime: {mime_type}, size: {len(file_bytes)} bytes ---")
 
-        # --- Run all analysis modules in parallel (IO-bound) ---
-        evidence = {}
+        # Decode once for every local image analyzer
+        decoded = DecodedMedia.from_bytes(file_bytes, (IMG_WIDTH, IMG_HEIGHT), mime_type)
+
+        # --- Run all analysis modules concurrently under the request deadline ---
         evidence_for_gemini = {}
-        tasks = {}
-        with ThreadPoolExecutor(max_workers=5) as ex:
-            tasks['forensic'] = ex.submit(run_external_forensics, file_bytes, mime_type, filename, 120)
-            tasks['provenance'] = ex.submit(run_digital_provenance, file_bytes)
-            tasks['ml'] = ex.submit(run_ml_artifact_detector, file_bytes)
-            tasks['web'] = ex.submit(google_search, prompt)
-            tasks['rag'] = ex.submit(vector_search, prompt)
-
-        # Collect results
-        for name, future in tasks.items():
-            try:
-                res = future.result(timeout=125) # 125s total timeout
-            except Exception as e:
-                print(f"!!! Task {name} failed: {e}")
-                res = {"error": str(e)}
-            
-            evidence_key_map = {
-                'forensic': 'forensic_report',
-                'provenance': 'provenance_report',
-                'ml': 'ml_model_report',
-                'web': 'web_hits',
-                'rag': 'rag_hits'
-            }
-            evidence[evidence_key_map[name]] = res
+        results, evidence_stage = gather_evidence({
+            'forensic': (run_external_forensics, file_bytes, mime_type, filename, 120),
+            'provenance': (run_digital_provenance, file_bytes, decoded),
+            'ml': (run_ml_artifact_detector, decoded),
+            'web': (google_search, prompt),
+            'rag': (vector_search, prompt),
+        }, MEDIA_EVIDENCE_DEADLINE_S)
+        evidence_key_map = {
+            'forensic': 'forensic_report',
+            'provenance': 'provenance_report',
+            'ml': 'ml_model_report',
+            'web': 'web_hits',
+            'rag': 'rag_hits'
+        }
+        evidence = {evidence_key_map[name]: res for name, res in results.items()}
 
         # --- Build PRUNED evidence for Gemini (small) ---
         evidence_for_gemini['forensic_service_report'] = prune_forensic_report_for_gemini(evidence.get('forensic_report', {}))
@@ -637,7 +835,7 @@ def analyze_media():
         1.  **Analyze All Evidence:**
             * `digital_provenance`: This is your *most critical* evidence. Look at `web_origin.first_seen_url` (is it old?), `best_guess_label` (does it match?), and `metadata_summary.suspicious_tags` (Photoshop?).
             * `forensic_service_report`: This is your second most critical. Look at `scatter_summary.synthetic_likelihood` (is it high?), `metadata_summary.Software` (does it confirm Photoshop?).
-            * `ml_artifact_detector`: This is your new REAL model. `artifact_likelihood_score` is the probability the image is FAKE (0.0 to 1.0). A score > 0.7 is a strong sign of AI generation.
+            * `ml_artifact_detector`: This is your new REAL model. `artifact_likelihood_score` is the probability the image is FAKE (0.0 to 1.0). A score > 0.7 is a strong sign of AI generation. For videos / animations it is the peak over sampled frames (see `frames` and `peak_t`).
             * `web_search` / `rag_search`: Use this to check the *user's prompt_claim*. Is the *event* real?
         2.  **Synthesize & Score:**
             * Generate a `score` from 0 (High Risk) to 100 (Trusted).
@@ -711,16 +909,14 @@ def analyze_media():
         }}
         """
 
-        prompt_size = len(system_prompt)
-        print(f"--- /analyze-media: Calling {MODEL_ID} (Media) with {prompt_size} char prompt... ---")
-        
-        response = llm_model.generate_content([system_prompt], generation_config={"response_mime_type": "application/json"})
-        response_text = response.text
-        print(f"--- /analyze-media: Received raw English JSON response ({len(response_text)} chars). ---")
-
-        report_data = json.loads(response_text)
-        if "score" not in report_data or "summary" not in report_data:
-            raise ValueError("Gemini response missing required keys")
+        # No semantic lookup here: the evidence is tied to this file, not the wording.
+        # The pruned evidence can match for two different files, so the key names the file too.
+        file_sha256 = hashlib.sha256(file_bytes).hexdigest()
+        llm_start = time.time()
+        report_data, llm_cache = generate_verdict(
+            "/analyze-media", (MODEL_ID, "media", MEDIA_PROMPT_VERSION, file_sha256), prompt,
+            evidence_for_gemini, evidence_stage, system_prompt)
+        llm_s = time.time() - llm_start
 
         # Add the full evidence payload *after* parsing Gemini's response
         report_data['report_payload'] = {
@@ -732,13 +928,16 @@ def analyze_media():
         }
 
         # Translate & ledger
+        translate_start = time.time()
         report_data = translate_report_data(report_data.copy(), lang)
+        translate_s = time.time() - translate_start
         case_id = f"media-{int(time.time())}"
         report_data['caseId'] = case_id
         report_hash = save_to_ledger(case_id, report_data, report_data.get('score'))
         report_data['sha256_hash'] = report_hash
 
         elapsed = time.time() - start_time
+        report_data['timings'] = request_timings(evidence_stage, llm_s, translate_s, elapsed, llm_cache)
         print(f"--- /analyze-media: Success. Language: '{lang}'. Time: {elapsed:.2f}s ---")
         return jsonify(report_data), 200
 
@@ -758,13 +957,15 @@ def health_check():
     status = {
         "llm_model": bool(llm_model),
         "embedding_model": bool(embedding_model),
-        "index_endpoint": bool(index_endpoint),
+        "vector_search": rag_ready(),
         "translate_client": bool(translate_client),
         "db": bool(db),
         "artifact_model": bool(artifact_model)
     }
     ok = all(status.values())
-    return jsonify({"status": "ok" if ok else "error", "services": status}), (200 if ok else 500)
+    return jsonify({"status": "ok" if ok else "error", "services": status, "rag_backend": RAG_BACKEND,
+                    "embedding_cache": embedding_cache.stats(), "search_cache": search_cache.stats(),
+                    "verdict_cache": verdict_cache.stats()}), (200 if ok else 500)
 
 # ---------------------------
 # Run
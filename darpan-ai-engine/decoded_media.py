@@ -0,0 +1,98 @@
+# decoded_media.py
+
+import io
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Same keyframe sampling and EXIF naming as the forensic service
+from darpan_media import MAX_FRAMES, SAMPLE_FPS, animated_frames, exif_dict, sample_times
+
+
+def _animated_frames(img, model_size):
+    """(times, frames) sampled from an animated GIF/WebP/PNG, each resized to model_size."""
+    times, frames = [], []
+    for _, start, frame in animated_frames(img):
+        times.append(start)
+        frames.append(np.array(frame.convert('RGB').resize(model_size)))
+    return times, frames
+
+
+def _video_frames(data, model_size):
+    """(times, frames, (w, h)) sampled from video bytes with OpenCV; skipped frames are only grab()bed."""
+    import cv2
+
+    with tempfile.NamedTemporaryFile(suffix='.bin') as tmp:
+        tmp.write(data)
+        tmp.flush()
+        cap = cv2.VideoCapture(tmp.name)
+        if not cap.isOpened():
+            raise ValueError("OpenCV could not open the video")
+        try:
+            native_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            wanted = sample_times(count / native_fps if count else MAX_FRAMES / SAMPLE_FPS)
+            times, frames, index = [], [], 0
+            for target in (int(round(t * native_fps)) for t in wanted):
+                while index < target and cap.grab():
+                    index += 1
+                ok, bgr = cap.read()
+                if not ok:
+                    break
+                times.append(index / native_fps)
+                frames.append(cv2.resize(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), model_size,
+                                         interpolation=cv2.INTER_AREA))
+                index += 1
+        finally:
+            cap.release()
+    return times, frames, size
+
+
+class DecodedMedia:
+    """
+    One decode of an uploaded image, shared by the ML artifact detector and
+    the provenance metadata check. The model input is decoded at reduced
+    scale with PIL draft() (JPEG), since the detector only sees 224x224.
+    """
+
+    def __init__(self, model_input, exif, fmt, size, frames=None, frame_times=None):
+        self.model_input = model_input
+        self.exif = exif
+        self.format = fmt
+        self.size = size
+        # Video / animated images: (N, h, w, 3) sampled frames and their timestamps;
+        # model_input is then the first sampled frame
+        self.frames = frames
+        self.frame_times = frame_times
+
+    @classmethod
+    def from_bytes(cls, data, model_size, mime=None):
+        """Returns None when the bytes aren't a decodable image, animation or video."""
+        if mime and mime.startswith('video/'):
+            return cls.from_video(data, model_size)
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                fmt, size = img.format, img.size
+                exif = exif_dict(img)
+                if getattr(img, 'n_frames', 1) > 1:
+                    times, frames = _animated_frames(img, model_size)
+                    return cls(frames[0], exif, fmt, size, np.stack(frames), times)
+                img.draft('RGB', model_size)
+                model_input = np.array(img.convert('RGB').resize(model_size))
+            return cls(model_input, exif, fmt, size)
+        except Exception as e:
+            print(f"!!! DecodedMedia: could not decode image - {e}")
+            return None
+
+    @classmethod
+    def from_video(cls, data, model_size):
+        try:
+            times, frames, size = _video_frames(data, model_size)
+            if not frames:
+                raise ValueError("no frames decoded")
+            return cls(frames[0], {}, "video", size, np.stack(frames), times)
+        except Exception as e:
+            print(f"!!! DecodedMedia: could not decode video - {e}")
+            return None
@@ -0,0 +1,156 @@
+# embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "/tmp/darpan_ai/embeddings.sqlite")
+MEMORY_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096"))
+DISK_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_DISK_ENTRIES", "200000"))
+EMBED_BATCH = 16  # texts per embedding call on a miss
+
+
+def normalize_text(text):
+    """NFKC with whitespace collapsed, so re-pasted copies of a claim share a key."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def cache_key(text, model_id):
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed on (normalised text, model id).
+
+    Two tiers: an in-memory LRU of float32 vectors and a SQLite table of
+    float32 blobs that survives restarts, trimmed least-recently-used first
+    once it holds more than `disk_entries` rows. Misses are embedded in
+    batches of EMBED_BATCH and written to both tiers.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "api_calls": 0, "evictions": 0}
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL, accessed REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings(accessed)")
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            # Memory tier only; a read-only or full disk shouldn't take RAG down
+            print(f"!!! embedding_cache: Persistent tier disabled ({path}): {e}")
+            self._db = None
+
+    # ---------- Lookup / store ----------
+    def embed(self, texts, embed_fn, model_id):
+        """
+        float32 vectors for `texts`, in order. Only texts missing from both
+        tiers reach `embed_fn(list_of_texts) -> list_of_vectors`, called with
+        the normalised texts in batches of EMBED_BATCH.
+        """
+        keys = [cache_key(t, model_id) for t in texts]
+        found = self._get_many(keys)
+
+        missing = {}  # key -> normalised text, deduplicated
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, normalize_text(text))
+        if missing:
+            miss_keys, miss_texts = list(missing), list(missing.values())
+            vectors = []
+            for i in range(0, len(miss_texts), EMBED_BATCH):
+                vectors.extend(embed_fn(miss_texts[i:i + EMBED_BATCH]))
+                with self._lock:
+                    self.counters["api_calls"] += 1
+            fresh = {k: np.asarray(v, dtype=np.float32) for k, v in zip(miss_keys, vectors)}
+            self._put_many(fresh, model_id)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def _get_many(self, keys):
+        found, pending = {}, []
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    found[key] = self._memory[key]
+                elif key not in pending:
+                    pending.append(key)
+            if not pending:
+                return found
+
+            rows = []
+            if self._db is not None:
+                marks = ",".join("?" * len(pending))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", pending).fetchall()
+                if rows:
+                    self._db.executemany("UPDATE embeddings SET accessed = ? WHERE key = ?",
+                                         [(time.time(), key) for key, _ in rows])
+                    self._db.commit()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember(key, vector)
+                found[key] = vector
+            self.counters["disk_hits"] += len(rows)
+            self.counters["misses"] += len(pending) - len(rows)
+        return found
+
+    def _put_many(self, vectors, model_id):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            if self._db is None:
+                return
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, accessed) VALUES (?, ?, ?, ?, ?)",
+                [(key, model_id, len(v), v.tobytes(), now) for key, v in vectors.items()])
+            self._db.commit()
+            self._trim_disk()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self):
+        # Least-recently-used first, down to 90% of the budget to avoid thrashing
+        count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.disk_entries:
+            return
+        drop = count - int(self.disk_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)", (drop,))
+        self._db.commit()
+        self.counters["evictions"] += drop
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "persistent": self._db is not None,
+            }
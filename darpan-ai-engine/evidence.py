@@ -0,0 +1,86 @@
+# evidence.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Per-request deadlines (seconds) for the evidence stage. Media requests wait
+# on the forensic service, which has its own 120s budget.
+TEXT_EVIDENCE_DEADLINE_S = float(os.environ.get("TEXT_EVIDENCE_DEADLINE_S", "20"))
+MEDIA_EVIDENCE_DEADLINE_S = float(os.environ.get("MEDIA_EVIDENCE_DEADLINE_S", "125"))
+EVIDENCE_WORKERS = int(os.environ.get("EVIDENCE_WORKERS", "16"))
+
+# Shared across requests: a per-request `with ThreadPoolExecutor()` would
+# block on exit until every source finished, deadline or not.
+_executor = ThreadPoolExecutor(max_workers=EVIDENCE_WORKERS, thread_name_prefix="evidence")
+
+
+class SourceUnavailable(Exception):
+    """
+    Raised by an evidence source that couldn't do its job (not configured,
+    backend error). `evidence` is what the prompt gets in its place, e.g.
+    "Web search is not configured." or {"error": ...}; gather_evidence
+    reports the source as failed so the verdict isn't cached.
+    """
+
+    def __init__(self, evidence, message=None):
+        if message is None:
+            message = evidence["error"] if isinstance(evidence, dict) and "error" in evidence else str(evidence)
+        super().__init__(message)
+        self.evidence = evidence
+
+
+def _timed_call(fn, args):
+    start = time.perf_counter()
+    try:
+        return fn(*args), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+def gather_evidence(sources, deadline_s):
+    """
+    Run every evidence source concurrently and collect what finishes before
+    the deadline.
+
+    `sources` is {name: (fn, *args)}. Returns (results, stage) where
+    results[name] is the source's return value, the evidence carried by a
+    SourceUnavailable it raised, or {"error": ...} if it raised anything
+    else or missed the deadline (it is left to finish in the background),
+    and `stage` describes the run:
+        {"deadline_s", "wall_time_s",
+         "sources": {name: {"status": "ok"|"error"|"timeout", "time_s"}},
+         "critical_path": {"source", "time_s"}}
+    The critical path is the slowest source, i.e. what the stage waited on.
+    """
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed_call, spec[0], spec[1:]) for name, spec in sources.items()}
+    wait(futures.values(), timeout=deadline_s)
+
+    results, status = {}, {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()  # only helps if it hasn't started yet
+            print(f"!!! Evidence source {name} missed the {deadline_s:g}s deadline")
+            results[name] = {"error": f"timed out after {deadline_s:g}s"}
+            status[name] = {"status": "timeout", "time_s": round(deadline_s, 3)}
+            continue
+        value, error, elapsed = future.result()
+        if error is not None:
+            print(f"!!! Evidence source {name} failed: {error}")
+            results[name] = error.evidence if isinstance(error, SourceUnavailable) else {"error": str(error)}
+            status[name] = {"status": "error", "time_s": round(elapsed, 3), "error": str(error)}
+        else:
+            results[name] = value
+            status[name] = {"status": "ok", "time_s": round(elapsed, 3)}
+
+    slowest = max(status, key=lambda n: status[n]["time_s"], default=None)
+    stage = {
+        "deadline_s": deadline_s,
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "sources": status,
+        "critical_path": {"source": slowest, "time_s": status[slowest]["time_s"] if slowest else 0.0},
+    }
+    print(f"--- Evidence: {stage['wall_time_s']:.2f}s, critical path {slowest} "
+          f"({stage['critical_path']['time_s']:.2f}s) ---")
+    return results, stage
@@ -0,0 +1,109 @@
+# search_cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+SEARCH_CACHE_TTL_S = float(os.environ.get("SEARCH_CACHE_TTL_S", "900"))
+# How long past its TTL an entry may still be served while it is refreshed
+SEARCH_CACHE_STALE_S = float(os.environ.get("SEARCH_CACHE_STALE_S", "3600"))
+SEARCH_CACHE_ENTRIES = int(os.environ.get("SEARCH_CACHE_ENTRIES", "2048"))
+
+
+def normalize_query(query):
+    return " ".join((query or "").casefold().split())
+
+
+class TTLCache:
+    """
+    In-memory LRU of fetched values with a TTL and stale-while-revalidate.
+
+    get(key, fetch) returns a fresh entry directly; an entry past its TTL
+    but within the stale window is returned as-is while one background
+    refresh replaces it; anything older is fetched inline. Concurrent misses
+    for the same key share one fetch. A fetch that raises is not cached (a
+    failed refresh leaves the stale entry in place).
+    """
+
+    def __init__(self, ttl_s=SEARCH_CACHE_TTL_S, stale_s=SEARCH_CACHE_STALE_S, max_entries=SEARCH_CACHE_ENTRIES):
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._inflight = {}            # key -> Future of the running fetch
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                         "refreshes": 0, "refresh_errors": 0}
+
+    def get(self, key, fetch):
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.counters["fresh_hits"] += 1
+                    return entry[1]
+                if age < self.ttl_s + self.stale_s:
+                    self._entries.move_to_end(key)
+                    self.counters["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = Future()
+                        self._refresher.submit(self._refresh, key, fetch, self._inflight[key])
+                    return entry[1]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+            else:
+                self.counters["misses"] += 1
+                future = self._inflight[key] = Future()
+                owner = True
+        if owner:
+            return self._fetch(key, fetch, future)
+        return future.result()
+
+    def _fetch(self, key, fetch, future):
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, value)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key, fetch, future):
+        with self._lock:
+            self.counters["refreshes"] += 1
+        try:
+            self._fetch(key, fetch, future)
+        except Exception as e:
+            with self._lock:
+                self.counters["refresh_errors"] += 1
+            print(f"!!! search_cache: Background refresh failed: {e.__class__.__name__}: {e}")
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(self.counters[k] for k in ("fresh_hits", "stale_hits", "misses", "coalesced"))
+            return {
+                **self.counters,
+                "hit_rate": round((lookups - self.counters["misses"]) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "ttl_s": self.ttl_s,
+                "stale_s": self.stale_s,
+            }
@@ -0,0 +1,66 @@
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+class Embed:
+    """An embed_fn whose vectors encode the text length; records every batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [np.full(4, len(t), dtype=np.float64) for t in texts]
+
+
+def test_misses_are_embedded_once_and_normalised(tmp_path):
+    cache, embed = EmbeddingCache(str(tmp_path / "e.sqlite")), Embed()
+    vectors = cache.embed(["a  b", "a b", "xyz"], embed, "m")
+    assert embed.batches == [["a b", "xyz"]]
+    assert [v.tolist() for v in vectors] == [[3.0] * 4, [3.0] * 4, [3.0] * 4]
+    assert vectors[0].dtype == np.float32
+    cache.embed(["xyz", "a\u00a0b"], embed, "m")  # NFKC folds the no-break space
+    assert len(embed.batches) == 1
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_misses_are_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBED_BATCH", 2)
+    cache, embed = EmbeddingCache(str(tmp_path / "e.sqlite")), Embed()
+    cache.embed([f"t{i}" for i in range(5)], embed, "m")
+    assert [len(b) for b in embed.batches] == [2, 2, 1]
+    assert cache.stats()["api_calls"] == 3
+
+
+def test_disk_tier_survives_a_restart_and_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "e.sqlite")
+    EmbeddingCache(path).embed(["claim"], Embed(), "m")
+    cache, embed = EmbeddingCache(path), Embed()
+    assert cache.embed(["claim"], embed, "m")[0].tolist() == [5.0] * 4
+    assert embed.batches == [] and cache.stats()["disk_hits"] == 1
+    cache.embed(["claim"], embed, "other-model")
+    assert embed.batches == [["claim"]]
+
+
+def test_memory_and_disk_tiers_are_bounded(tmp_path):
+    cache, embed = EmbeddingCache(str(tmp_path / "e.sqlite"), memory_entries=2, disk_entries=10), Embed()
+    cache.embed([f"t{i}" for i in range(20)], embed, "m")
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["evictions"] == 11
+    rows = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert rows == 9
+    # Evicted from memory but still on disk
+    cache.embed(["t12"], embed, "m")
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_unwritable_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = EmbeddingCache(str(blocker / "e.sqlite"))
+    embed = Embed()
+    cache.embed(["claim"], embed, "m")
+    cache.embed(["claim"], embed, "m")
+    assert len(embed.batches) == 1 and cache.stats()["persistent"] is False
@@ -0,0 +1,103 @@
+import threading
+import time
+import types
+
+import pytest
+
+import search_cache
+from search_cache import TTLCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(search_cache, "time", types.SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+class Fetch:
+    """A fetch callable returning "v1", "v2", ... and counting its calls."""
+
+    def __init__(self, gate=None):
+        self.calls = 0
+        self.gate = gate
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return f"v{self.calls}"
+
+
+def wait_until(condition, timeout=5):
+    """Poll until `condition()` holds; the work under test runs on other threads."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for another thread"
+        time.sleep(0.001)
+
+
+def test_queries_are_normalised():
+    assert normalize_query("  Free LAPTOPS\tfor students ") == "free laptops for students"
+    assert normalize_query(None) == ""
+
+
+def test_fresh_hit_then_stale_while_revalidate_then_refetch(clock):
+    cache, fetch = TTLCache(ttl_s=10, stale_s=20), Fetch()
+    assert cache.get("k", fetch) == "v1"
+    clock.t += 9
+    assert cache.get("k", fetch) == "v1" and fetch.calls == 1
+    clock.t += 2  # past the TTL: served stale, refreshed in the background
+    assert cache.get("k", fetch) == "v1"
+    wait_until(lambda: not cache._inflight)
+    assert cache.get("k", fetch) == "v2" and fetch.calls == 2
+    clock.t += 31  # past TTL + stale window: fetched inline
+    assert cache.get("k", fetch) == "v3"
+    stats = cache.stats()
+    assert (stats["fresh_hits"], stats["stale_hits"], stats["misses"], stats["refreshes"]) == (2, 1, 2, 1)
+
+
+def test_failed_refresh_keeps_the_stale_entry(clock):
+    cache = TTLCache(ttl_s=10, stale_s=20)
+    cache.get("k", Fetch())
+    clock.t += 15
+
+    def broken():
+        raise RuntimeError("quota")
+    assert cache.get("k", broken) == "v1"
+    wait_until(lambda: cache.stats()["refresh_errors"] == 1)
+    assert cache.get("k", broken) == "v1"
+
+
+def test_failed_fetch_is_not_cached():
+    cache = TTLCache()
+
+    def broken():
+        raise RuntimeError("quota")
+    with pytest.raises(RuntimeError):
+        cache.get("k", broken)
+    assert cache.get("k", Fetch()) == "v1"
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache, gate = TTLCache(), threading.Event()
+    fetch = Fetch(gate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("k", fetch))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: cache.stats()["coalesced"] == 4)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["v1"] * 5 and fetch.calls == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.get("a", lambda: "a")
+    cache.get("b", lambda: "b")
+    cache.get("a", lambda: "a")
+    cache.get("c", lambda: "c")
+    assert cache.get("b", lambda: "b again") == "b again"
+    assert cache.get("c", lambda: "c again") == "c"
@@ -0,0 +1,81 @@
+import types
+
+import numpy as np
+import pytest
+
+import verdict_cache
+from verdict_cache import VerdictCache
+
+TEXT = ("gemini", "text", "3")
+EVIDENCE = {"web_search": ["snippet"], "rag_search": []}
+REPORT = {"score": 12, "summary": "Likely false."}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(verdict_cache, "time", types.SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+def test_exact_hit_ignores_whitespace_and_returns_a_copy():
+    cache = VerdictCache()
+    assert cache.get(TEXT, "Free laptops for students", EVIDENCE) == (None, None)
+    cache.put(TEXT, "Free  laptops for\nstudents", EVIDENCE, REPORT)
+    report, how = cache.get(TEXT, "Free laptops for students", EVIDENCE)
+    assert (report, how) == (REPORT, "exact")
+    report["score"] = 99
+    assert cache.get(TEXT, "Free laptops for students", EVIDENCE)[0] == REPORT
+    assert cache.stats()["exact_hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_changed_evidence_or_scope_misses():
+    cache = VerdictCache()
+    cache.put(TEXT, "claim", EVIDENCE, REPORT)
+    assert cache.get(TEXT, "claim", {**EVIDENCE, "web_search": ["newer snippet"]}) == (None, None)
+    assert cache.get(("gemini", "text", "4"), "claim", EVIDENCE) == (None, None)
+
+
+def test_media_verdicts_are_kept_apart_by_file():
+    # Two files can prune down to the same evidence; the scope carries their sha256
+    cache = VerdictCache()
+    cache.put(("gemini", "media", "2", "a" * 64), "prompt", EVIDENCE, REPORT)
+    assert cache.get(("gemini", "media", "2", "b" * 64), "prompt", EVIDENCE) == (None, None)
+    assert cache.get(("gemini", "media", "2", "a" * 64), "prompt", EVIDENCE)[1] == "exact"
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = VerdictCache(ttl_s=60)
+    cache.put(TEXT, "claim", EVIDENCE, REPORT)
+    clock.t += 59
+    assert cache.get(TEXT, "claim", EVIDENCE)[1] == "exact"
+    clock.t += 1
+    assert cache.get(TEXT, "claim", EVIDENCE) == (None, None)
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerdictCache(max_entries=2)
+    for claim in ("a", "b"):
+        cache.put(TEXT, claim, EVIDENCE, {"claim": claim})
+    cache.get(TEXT, "a", EVIDENCE)
+    cache.put(TEXT, "c", EVIDENCE, {"claim": "c"})
+    assert cache.get(TEXT, "b", EVIDENCE) == (None, None)
+    assert [cache.get(TEXT, c, EVIDENCE)[0] for c in ("a", "c")] == [{"claim": "a"}, {"claim": "c"}]
+
+
+def test_semantic_lookup_stays_within_the_scope():
+    cache = VerdictCache(semantic_min_score=0.9)
+    cache.put(TEXT, "Free laptops for all students", EVIDENCE, REPORT, np.array([1.0, 0.0, 0.0]))
+    near = np.array([0.99, 0.1, 0.0])
+    assert cache.get(TEXT, "Students get free laptops", {"web_search": []}, near) == (REPORT, "semantic")
+    assert cache.get(TEXT, "Unrelated claim", EVIDENCE, np.array([0.0, 1.0, 0.0])) == (None, None)
+    assert cache.get(("gemini", "text", "4"), "Students get free laptops", EVIDENCE, near) == (None, None)
+    # Without the claim's vector only the exact key can match
+    assert cache.get(TEXT, "Students get free laptops", EVIDENCE) == (None, None)
+
+
+def test_semantic_lookup_is_off_by_default():
+    cache = VerdictCache(semantic_min_score=0)
+    cache.put(TEXT, "claim", EVIDENCE, REPORT, np.array([1.0, 0.0]))
+    assert cache.get(TEXT, "other claim", EVIDENCE, np.array([1.0, 0.0])) == (None, None)
@@ -8,6 +8,8 @@ import re
 from collections import Counter
 import json # Added json import for the example usage
 
+from evidence import SourceUnavailable
+
 # --- Download NLTK data (run once locally or add to Dockerfile if needed) ---
 try:
     nltk.data.find('tokenizers/punkt')
@@ -158,12 +160,12 @@ def analyze_text_forensics(text):
         # Log traceback for debugging if needed:
         # import traceback
         # print(traceback.format_exc())
-        return {
+        raise SourceUnavailable({
              "ai_likelihood_heuristic": 0.0, "readability_score_flesch": 0.0,
             "sentiment_polarity": 0.0, "subjectivity": 0.0,
             "lexical_diversity_ttr": 0.0, "burstiness_variance": 0.0,
             "repetition_trigram": 0.0, "error": f"Analysis failed: {str(e)}"
-        }
+        })
 
 # --- Example Usage (for testing) ---
 if __name__ == '__main__':
@@ -0,0 +1,200 @@
+# vector_index.py
+
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Above this many entries the index is built as an IVF (inverted file) index:
+# vectors are clustered and a query only scans the `nprobe` closest clusters.
+# Below it a brute-force scan of the whole matrix is faster and exact.
+IVF_MIN_ENTRIES = int(os.environ.get("VECTOR_IVF_MIN_ENTRIES", "20000"))
+IVF_NPROBE = int(os.environ.get("VECTOR_IVF_NPROBE", "8"))
+EMBED_BATCH = 16  # texts per embedding call
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+CENTROIDS_FILE = "centroids.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _kmeans(x, k, iters=10, seed=0):
+    """Spherical k-means on a sample of `x`; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    sample = x[rng.choice(len(x), min(len(x), k * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(k):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def load_corpus(directory, extra=None):
+    """
+    {id: text} for every .txt file in `directory` (id is the file stem),
+    plus the `extra` entries (e.g. the built-in TRUSTED_CORPUS).
+    """
+    entries = dict(extra or {})
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read().strip()
+        if text:
+            entries[os.path.splitext(os.path.basename(path))[0]] = text
+    return entries
+
+
+def corpus_fingerprint(entries, model_id):
+    """Changes whenever the corpus text or the embedding model changes."""
+    h = hashlib.sha256(model_id.encode())
+    for key in sorted(entries):
+        h.update(b"\0" + key.encode() + b"\0" + entries[key].encode())
+    return h.hexdigest()
+
+
+class VectorIndex:
+    """
+    In-process cosine-similarity index over L2-normalised float32 embeddings.
+
+    Small corpora are searched exactly with one matrix product. Large ones
+    are stored as an IVF index: rows are grouped by cluster (`offsets[c]` to
+    `offsets[c + 1]`) so the clusters a query probes are contiguous slices of
+    the (possibly memory-mapped) matrix.
+    """
+
+    def __init__(self, ids, texts, vectors, centroids=None, offsets=None, fingerprint=None):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def mode(self):
+        return "ivf" if self.centroids is not None else "brute"
+
+    @classmethod
+    def build(cls, entries, embed_fn, fingerprint=None, ivf_min_entries=IVF_MIN_ENTRIES):
+        """
+        Embed {id: text} with `embed_fn(list_of_texts) -> list_of_vectors`
+        (called in batches of EMBED_BATCH) and build the index.
+        """
+        ids, texts = list(entries), list(entries.values())
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(embed_fn(texts[i:i + EMBED_BATCH]))
+        vectors = _normalize(vectors)
+        if len(ids) < ivf_min_entries:
+            return cls(ids, texts, vectors, fingerprint=fingerprint)
+
+        nlist = max(1, int(np.sqrt(len(ids))))
+        centroids = _kmeans(vectors, nlist)
+        assign = np.concatenate([np.argmax(vectors[i:i + 4096] @ centroids.T, axis=1)
+                                 for i in range(0, len(vectors), 4096)])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls([ids[i] for i in order], [texts[i] for i in order], vectors[order],
+                   centroids=centroids, offsets=offsets, fingerprint=fingerprint)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.vectors))
+        if self.centroids is not None:
+            np.save(os.path.join(directory, CENTROIDS_FILE), self.centroids)
+            np.save(os.path.join(directory, OFFSETS_FILE), self.offsets)
+        # Written last: a directory without meta.json is never loaded
+        tmp = os.path.join(directory, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "fingerprint": self.fingerprint,
+                       "mode": self.mode}, f)
+        os.replace(tmp, os.path.join(directory, META_FILE))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved index; the embedding matrix is memory-mapped by default."""
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        centroids = offsets = None
+        if meta.get("mode") == "ivf":
+            centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+            offsets = np.load(os.path.join(directory, OFFSETS_FILE))
+        return cls(meta["ids"], meta["texts"], vectors, centroids, offsets, meta.get("fingerprint"))
+
+    def search(self, queries, k=3, min_score=None, nprobe=IVF_NPROBE):
+        """
+        Top-k entries for each query embedding, best first.
+
+        `queries` is one vector or a (n, dim) batch; returns one list of
+        {"id", "score", "text"} per query (score is cosine similarity).
+        Hits scoring below `min_score` are dropped.
+        """
+        q = _normalize(np.atleast_2d(queries))
+        if self.centroids is None:
+            scores = q @ self.vectors.T
+            return [self._hits(np.arange(len(self)), row, k, min_score) for row in scores]
+
+        results = []
+        probe = np.argsort(-(q @ self.centroids.T), axis=1)[:, :nprobe]
+        for qi, clusters in enumerate(probe):
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in clusters])
+            scores = self.vectors[rows] @ q[qi]
+            results.append(self._hits(rows, scores, k, min_score))
+        return results
+
+    def _hits(self, rows, scores, k, min_score):
+        hits = []
+        for i in _top_k(scores, k):
+            score = float(scores[i])
+            if min_score is not None and score < min_score:
+                break
+            row = int(rows[i])
+            hits.append({"id": self.ids[row], "score": round(score, 4), "text": self.texts[row]})
+        return hits
+
+
+def load_or_build(directory, entries, embed_fn, model_id):
+    """
+    The index saved in `directory` if it was built from this corpus and
+    model, otherwise a freshly built one (saved back for the next start).
+    """
+    fingerprint = corpus_fingerprint(entries, model_id)
+    try:
+        index = VectorIndex.load(directory)
+        if index.fingerprint == fingerprint:
+            print(f"--- vector_index: Loaded {len(index)} entries ({index.mode}) from {directory} ---")
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = VectorIndex.build(entries, embed_fn, fingerprint)
+    try:
+        index.save(directory)
+    except OSError as e:
+        print(f"!!! vector_index: Could not save index to {directory}: {e}")
+    print(f"--- vector_index: Built {len(index)} entries ({index.mode}) ---")
+    return index
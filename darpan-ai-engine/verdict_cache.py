@@ -0,0 +1,108 @@
+# verdict_cache.py
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+VERDICT_CACHE_TTL_S = float(os.environ.get("VERDICT_CACHE_TTL_S", "21600"))
+VERDICT_CACHE_ENTRIES = int(os.environ.get("VERDICT_CACHE_ENTRIES", "1024"))
+# Cosine similarity above which a differently worded claim reuses a cached
+# verdict (same model, template and scope). 0 disables the semantic lookup.
+VERDICT_SEMANTIC_MIN_SCORE = float(os.environ.get("VERDICT_SEMANTIC_MIN_SCORE", "0"))
+
+
+def verdict_key(scope, claim, evidence):
+    """
+    sha256 of the scope (model id, prompt template version, ...), the
+    normalised claim and the pruned evidence the prompt was built from.
+    """
+    payload = json.dumps([scope, normalize_text(claim), evidence], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    In-memory LRU of parsed LLM reports (before translation, caseId and
+    ledger hash are added), each valid for `ttl_s`.
+
+    get() looks up the exact (scope, claim, evidence) key first. When the
+    semantic lookup is enabled and the caller passes the claim's embedding,
+    a miss falls back to the most similar cached claim in the same scope.
+    """
+
+    def __init__(self, ttl_s=VERDICT_CACHE_TTL_S, max_entries=VERDICT_CACHE_ENTRIES,
+                 semantic_min_score=VERDICT_SEMANTIC_MIN_SCORE):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.semantic_min_score = semantic_min_score
+        self._entries = OrderedDict()  # key -> (stored_at, scope, report, claim vector or None)
+        self._lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "expired": 0}
+
+    def get(self, scope, claim, evidence, claim_vector=None):
+        """Return (report, "exact"|"semantic") or (None, None). The report is a private copy."""
+        key = verdict_key(scope, claim, evidence)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["exact_hits"] += 1
+                return copy.deepcopy(entry[2]), "exact"
+
+            if self.semantic_min_score > 0 and claim_vector is not None:
+                q = np.asarray(claim_vector, dtype=np.float32)
+                q = q / max(float(np.linalg.norm(q)), 1e-12)
+                best_key, best_score = None, self.semantic_min_score
+                for k, (_, entry_scope, _, vector) in self._entries.items():
+                    if vector is not None and entry_scope == scope:
+                        score = float(vector @ q)
+                        if score >= best_score:
+                            best_key, best_score = k, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.counters["semantic_hits"] += 1
+                    return copy.deepcopy(self._entries[best_key][2]), "semantic"
+
+            self.counters["misses"] += 1
+        return None, None
+
+    def put(self, scope, claim, evidence, report, claim_vector=None):
+        vector = None
+        if claim_vector is not None:
+            vector = np.asarray(claim_vector, dtype=np.float32)
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        key = verdict_key(scope, claim, evidence)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), scope, copy.deepcopy(report), vector)
+            self._entries.move_to_end(key)
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now):
+        # Insertion order is refreshed on hits, so scan everything; the cache is small
+        stale = [k for k, (stored_at, *_rest) in self._entries.items() if now - stored_at >= self.ttl_s]
+        for k in stale:
+            del self._entries[k]
+        self.counters["expired"] += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["exact_hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round((lookups - self.counters["misses"]) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "ttl_s": self.ttl_s,
+                "semantic_min_score": self.semantic_min_score,
+            }
@@ -24,6 +24,40 @@ export interface Factor {
   analysis: string;
   score: number;
 }
+// Large forensic outputs are stored server-side and referenced by digest
+export interface ArtifactRef {
+  digest: string;
+  url: string;
+  media_type: string;
+  size: number;
+}
+
+const fetchArtifactDataUrl = async (ref: ArtifactRef): Promise<string> => {
+  const response = await fetch(ref.url);
+  if (!response.ok) throw new Error(`artifact ${ref.digest.slice(0, 12)}: HTTP ${response.status}`);
+  const blob = await response.blob();
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve(reader.result as string);
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(blob);
+  });
+};
+
+// Artifacts are garbage-collected server-side after a day, but history lives
+// in localStorage: copy the scatter image into the report while it is fresh
+// so later PDF exports don't depend on the artifact still existing.
+const inlineScatterImage = async (report: Analysis): Promise<void> => {
+  const scatter = report.report_payload?.forensic_report?.scatter_analysis;
+  if (!scatter?.scatter_image || scatter.scatter_image_base64) return;
+  try {
+    const dataUrl = await fetchArtifactDataUrl(scatter.scatter_image);
+    scatter.scatter_image_base64 = dataUrl.slice(dataUrl.indexOf(',') + 1);
+  } catch (e) {
+    console.error("Failed to fetch scatter image for history:", e);
+  }
+};
+
 export interface Analysis {
   score: number;
   summary: string; 
@@ -37,7 +71,8 @@ export interface Analysis {
         entropies: any;
         correlations: any;
         synthetic_likelihood: number;
-        scatter_image_base64: string;
+        scatter_image?: ArtifactRef | null;
+        scatter_image_base64?: string;
       };
     };
   };
@@ -202,6 +237,7 @@ const Index = () => {
         analysis: report 
       };
       setMessages(prev => [...prev, assistantMessage]);
+      await inlineScatterImage(report);
       saveToHistory(assistantMessage, fileNameForHistory);
       toast({ title: t('toast.analysisComplete'), description: t('toast.analysisCompleteDesc', { score: report.score }) });
 
@@ -231,7 +267,7 @@ const Index = () => {
 
 
    // --- PDF EXPORT FUNCTION (FULLY FIXED) ---
-   const handleExport = (analysis: Analysis | null) => {
+   const handleExport = async (analysis: Analysis | null) => {
     if (!analysis) {
         toast({ title: t('toast.noReportSelected'), description: t('toast.noReportSelectedDesc'), variant: "destructive" });
         return;
@@ -420,6 +456,7 @@ const Index = () => {
       // --- SCATTER PLOT SECTION (Unchanged) ---
       if (isMediaReport && reportPayload?.forensic_report?.scatter_analysis) {
           const scatter_data = reportPayload.forensic_report.scatter_analysis;
+          const scatter_image_ref = scatter_data.scatter_image;
           const scatter_image_b64 = scatter_data.scatter_image_base64;
 
           addSectionTitle(t('pdf.subSection.scatter'));
@@ -437,9 +474,12 @@ const Index = () => {
           y += 5; // Add padding
           
           // Add the scatter plot image
-          if (scatter_image_b64) {
+          if (scatter_image_ref || scatter_image_b64) {
               try {
-                  const imgData = "data:image/png;base64," + scatter_image_b64;
+                  // Inlined when the report arrived; fetch only if that failed
+                  const imgData = scatter_image_b64
+                      ? "data:image/png;base64," + scatter_image_b64
+                      : await fetchArtifactDataUrl(scatter_image_ref!);
                   const imgWidth = 150;
                   const imgHeight = 50;
                   checkPageBreak(imgHeight + 10);
@@ -0,0 +1,78 @@
+# darpan_media.py
+"""
+Media helpers shared by the forensic service and the AI engine, so both
+sample the same keyframes and report EXIF under the same names.
+"""
+import os
+
+from PIL import ExifTags
+
+# Keyframe sampling for video / animated uploads
+SAMPLE_FPS = float(os.environ.get("DARPAN_SAMPLE_FPS", "1"))
+MAX_FRAMES = int(os.environ.get("DARPAN_MAX_FRAMES", "32"))
+DEFAULT_FRAME_MS = 100  # GIF/WebP frames without a duration
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+# MakerNote blobs and thumbnails are large and vendor-specific
+SKIP_TAGS = ("JPEGThumbnail", "TIFFThumbnail", "EXIF MakerNote")
+
+
+def exif_dict(img):
+    """EXIF with exifread-style names ("Image Software", "EXIF DateTimeOriginal", "GPS ...")."""
+    try:
+        exif = img.getexif()
+    except Exception:
+        return {}
+    out = {}
+    for tag, value in exif.items():
+        if tag in (EXIF_IFD, GPS_IFD):
+            continue
+        out[f"Image {ExifTags.TAGS.get(tag, tag)}"] = value
+    for ifd, prefix, names in ((EXIF_IFD, "EXIF", ExifTags.TAGS), (GPS_IFD, "GPS", ExifTags.GPSTAGS)):
+        try:
+            for tag, value in exif.get_ifd(ifd).items():
+                out[f"{prefix} {names.get(tag, tag)}"] = value
+        except Exception:
+            continue
+    return {k: v.decode("utf-8", "ignore").strip("\x00") if isinstance(v, bytes) else str(v)
+            for k, v in out.items() if k not in SKIP_TAGS}
+
+
+def sample_times(duration_s, fps=SAMPLE_FPS, max_frames=MAX_FRAMES):
+    """Evenly spaced timestamps at `fps`, thinned to at most `max_frames`."""
+    n = max(1, int(duration_s * fps))
+    step = max(1, -(-n // max_frames))
+    return [i / fps for i in range(0, n, step)][:max_frames]
+
+
+def _duration_ms(img):
+    return int(img.info.get("duration", DEFAULT_FRAME_MS) or DEFAULT_FRAME_MS)
+
+
+def animated_frames(img, fps=SAMPLE_FPS, max_frames=MAX_FRAMES):
+    """
+    Yield (frame_index, start_s, img) for the frames of an open animated
+    image showing at each sample time, walking the frames once with seek()
+    (GIF frames must be decoded in order anyway). Durations are only known
+    as frames are reached, so the interval comes from n_frames and the first
+    frame's duration: 1/fps, widened so `max_frames` covers the animation.
+    `img` is positioned on the yielded frame until the next one is read.
+    """
+    n = getattr(img, "n_frames", 1)
+    img.seek(0)
+    # Clock in whole milliseconds so long animations don't drift onto a neighbouring frame
+    interval = max(1000.0 / fps, n * _duration_ms(img) / max_frames)
+    clock, next_t, picked = 0, 0.0, 0
+    for index in range(n):
+        if index:
+            img.seek(index)
+        duration = _duration_ms(img)
+        if next_t < clock + duration:  # this frame is on screen at next_t
+            yield index, clock / 1000.0, img
+            picked += 1
+            if picked >= max_frames:
+                return
+            while next_t < clock + duration:
+                next_t += interval
+        clock += duration
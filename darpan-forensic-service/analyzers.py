@@ -0,0 +1,392 @@
+#analyzers
+"""
+Analyzer registry and per-upload DAG scheduler.
+
+Every analyzer is an async fn(ctx, **inputs) registered with the results it
+consumes, the MIME types / media kinds it applies to, a cost class and a
+timeout. A Pipeline resolves the analyzers a report asks for on one upload:
+inapplicable ones (and whatever requires them) are skipped without running,
+each node starts as soon as its inputs are ready so independent analyzers
+overlap, and shared inputs (decoded image, hashes) are computed once.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import time
+
+from cpu_pool import (CPU_WORKERS, SharedArray, run_cpu, stats_and_scatter_task, image_hashes_task, lsb_task,
+                      tiled_task, frame_task, frame_scatter_task)
+from exiftool_pool import get_pool as get_exiftool_pool
+from phash_index import KNOWN_FAKE, ANALYSED, DEFAULT_RADIUS as PHASH_RADIUS
+from plugins import plugin
+from tool_runner import run_tools, tool_timeout
+
+# Cost classes: where the work runs. CPU nodes are started first so the
+# longest chains get going before cheap I/O.
+INLINE, IO, CPU = "inline", "io", "cpu"
+COST_ORDER = {CPU: 0, IO: 1, INLINE: 2}
+# Default timeouts per cost class; DARPAN_TIMEOUT_<ANALYZER> overrides (see tool_runner)
+DEFAULT_TIMEOUTS = {INLINE: 10, IO: 60, CPU: 120}
+
+# Media kinds (frame_sampler.media_kind)
+STILL = ("image",)
+MOVING = ("video", "animated")
+
+# Sampled frames decoded but not yet analysed; bounds memory for long clips
+FRAMES_IN_FLIGHT = int(os.environ.get("DARPAN_FRAMES_IN_FLIGHT", "0")) or 2 * CPU_WORKERS
+STRINGS_ARTIFACT_LIMIT = 100_000
+SIGNATURE_LIMIT = 256  # signature matches listed in the report
+
+logger = logging.getLogger(__name__)
+
+ANALYZERS = {}
+
+
+class AnalyzerError(RuntimeError):
+    """A critical analyzer failed, so the report can't be produced."""
+
+
+class Analyzer:
+    def __init__(self, name, fn, inputs=(), optional=(), mime=None, kinds=None, services=(), cost=IO,
+                 timeout_s=None, critical=False):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)  # must succeed, or this analyzer is skipped
+        self.optional = tuple(optional)  # used when they apply to the upload, None otherwise
+        self.mime = tuple(mime) if mime else None  # MIME type prefixes
+        self.kinds = tuple(kinds) if kinds else None
+        self.services = tuple(services)  # Pipeline(services=...) entries it needs
+        self.cost = cost
+        self.timeout_s = timeout_s or tool_timeout(name, DEFAULT_TIMEOUTS[cost])
+        self.critical = critical
+
+    def skip_reason(self, ctx):
+        """Why this analyzer doesn't apply to the upload, or None."""
+        if self.mime and not ctx.mime.startswith(self.mime):
+            return f"not applicable to {ctx.mime}"
+        if self.kinds and ctx.kind not in self.kinds:
+            return f"not applicable to {ctx.kind} media"
+        missing = [s for s in self.services if s not in ctx.services]
+        if missing:
+            return f"{', '.join(missing)} not configured"
+        return None
+
+
+def analyzer(name, **spec):
+    """Register an async fn(ctx, **inputs) under `name` (see Analyzer for `spec`)."""
+    def register(fn):
+        ANALYZERS[name] = Analyzer(name, fn, **spec)
+        return fn
+    return register
+
+
+def validate(registry=None):
+    """Raise ValueError on unknown inputs or dependency cycles."""
+    registry = registry or ANALYZERS
+    state = {}
+
+    def visit(name, path):
+        if name not in registry:
+            raise ValueError(f"{path[-1]} depends on unknown analyzer {name}")
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"analyzer cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for dep in registry[name].inputs + registry[name].optional:
+            visit(dep, path + [name])
+        state[name] = "done"
+
+    for name in registry:
+        visit(name, [name])
+
+
+class Pipeline:
+    """
+    Runs analyzers for one upload. Use as an async context manager: leaving
+    it cancels anything still running and releases per-upload resources
+    (shared memory) registered on `stack`.
+
+    `results` holds each finished analyzer's output, `status` a
+    {"status": ok|skipped|error|timeout, ...} entry per scheduled analyzer.
+    `on_result(name, result)` is called as analyzers finish.
+    """
+
+    def __init__(self, upload, kind, services=None, on_result=None, registry=None):
+        self.upload = upload
+        self.path = upload["path"]
+        self.mime = upload.get("mime") or "application/octet-stream"
+        self.kind = kind
+        self.services = services or {}
+        self.on_result = on_result
+        self.registry = registry or ANALYZERS
+        self.results = {}
+        self.status = {}
+        self.stack = contextlib.ExitStack()
+        self._tasks = {}
+
+    @classmethod
+    async def open(cls, upload, **kwargs):
+        """Pipeline for an ingested upload, with its media kind sniffed off the event loop."""
+        kind = await asyncio.to_thread(plugin("media_kind"), upload.get("mime"), upload["path"])
+        return cls(upload, kind, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pending = [t for t in self._tasks.values() if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.stack.close()
+
+    async def run(self, targets):
+        """Run `targets` and everything they need; returns `results`."""
+        targets = sorted(targets, key=lambda n: COST_ORDER[self.registry[n].cost])
+        await asyncio.gather(*(self._node(name) for name in targets))
+        return self.results
+
+    def timings(self):
+        """{analyzer: wall seconds} for the analyzers that ran, excluding inline ones."""
+        return {name: s["wall_time_s"] for name, s in self.status.items()
+                if "wall_time_s" in s and s["cost"] != INLINE}
+
+    def _node(self, name):
+        if name not in self._tasks:
+            self._tasks[name] = asyncio.ensure_future(self._run_node(self.registry[name]))
+        return self._tasks[name]
+
+    def _applies(self, name):
+        a = self.registry[name]
+        return a.skip_reason(self) is None and all(self._applies(dep) for dep in a.inputs)
+
+    async def _run_node(self, a):
+        reason = a.skip_reason(self)
+        if reason is None:
+            deps = list(a.inputs) + [n for n in a.optional if self._applies(n)]
+            await asyncio.gather(*(self._node(dep) for dep in deps))
+            failed = [dep for dep in a.inputs if self.status[dep]["status"] != "ok"]
+            if failed:
+                reason = f"needs {', '.join(failed)}"
+        if reason is not None:
+            self.status[a.name] = {"status": "skipped", "reason": reason}
+            return
+
+        start = time.perf_counter()
+        status = {"cost": a.cost}
+        try:
+            kwargs = {dep: self.results.get(dep) for dep in a.inputs + a.optional}
+            result = await asyncio.wait_for(a.fn(self, **kwargs), a.timeout_s)
+        except asyncio.TimeoutError:
+            status.update(status="timeout", error=f"exceeded {a.timeout_s:g}s")
+            logger.warning("analyzer %s timed out after %gs", a.name, a.timeout_s)
+        except Exception as e:
+            status.update(status="error", error=str(e))
+            logger.exception("analyzer %s failed", a.name)
+        else:
+            status["status"] = "ok"
+            self.results[a.name] = result
+        status["wall_time_s"] = round(time.perf_counter() - start, 3)
+        self.status[a.name] = status
+
+        if status["status"] != "ok":
+            if a.critical:
+                raise AnalyzerError(f"{a.name} failed: {status['error']}")
+        elif self.on_result is not None:
+            self.on_result(a.name, result)
+
+
+# -----------------------------
+# Images
+# -----------------------------
+@analyzer("decode", kinds=STILL, cost=IO, critical=True)
+async def decode(ctx):
+    """
+    Decode once and share with every image analyzer. Very large images skip
+    the full-resolution decode; the worker reads them tile by tile
+    (tiled_analysis) to keep memory bounded.
+    """
+    tiled = await asyncio.to_thread(plugin("needs_tiling"), ctx.path)
+    decoded = await asyncio.to_thread(plugin("decode_image"), ctx.path, not tiled)
+    decoded.tiled = tiled
+    return decoded
+
+
+@analyzer("shared_image", inputs=["decode"], cost=INLINE)
+async def shared_image(ctx, decode):
+    """Full-resolution pixels in shared memory for the pool workers (None on the tiled path)."""
+    if decode.tiled:
+        return None
+    shared = ctx.stack.enter_context(SharedArray(decode.rgb))
+    decode.rgb = None  # workers read the shared copy
+    return shared.ref
+
+
+@analyzer("hashes", inputs=["decode"], cost=CPU)
+async def hashes(ctx, decode):
+    return await run_cpu(image_hashes_task, decode.working)
+
+
+@analyzer("image", inputs=["decode", "shared_image"], services=["artifacts"], cost=CPU)
+async def image(ctx, decode, shared_image):
+    """Image statistics, scatter analysis (FFT) and LSB steganalysis: {"stats", "scatter", "lsb"}."""
+    artifacts = ctx.services["artifacts"]
+    if decode.tiled:
+        (stats, scatter), lsb = await run_cpu(tiled_task, str(ctx.path), artifacts)
+    else:
+        (stats, scatter), lsb = await asyncio.gather(
+            run_cpu(stats_and_scatter_task, shared_image, str(ctx.path), True, artifacts),
+            run_cpu(lsb_task, shared_image, decode.format),
+        )
+    return {"stats": stats, "scatter": scatter, "lsb": lsb}
+
+
+# -----------------------------
+# Video / animated images
+# -----------------------------
+@analyzer("frames", kinds=MOVING, cost=CPU, timeout_s=tool_timeout("frames", 300))
+async def frames(ctx):
+    """
+    Decode sampled frames one at a time and analyse them in the CPU pool,
+    with at most FRAMES_IN_FLIGHT decoded frames alive. Returns
+    {"frames": per-frame results in time order, "peak_rgb": working copy of
+    the most synthetic-looking frame}.
+    """
+    frame_iter = plugin("iter_frames")(ctx.path, ctx.kind)
+    slots = asyncio.Semaphore(FRAMES_IN_FLIGHT)
+    peak = {"score": float("-inf"), "rgb": None}
+
+    async def analyze(index, t, rgb):
+        try:
+            result = await run_cpu(frame_task, rgb)
+        finally:
+            slots.release()
+        if result["synthetic_likelihood"] > peak["score"]:
+            peak.update(score=result["synthetic_likelihood"], rgb=rgb)
+        return {"index": index, "t": round(t, 3), **result}
+
+    tasks = []
+    try:
+        while True:
+            await slots.acquire()
+            frame = await asyncio.to_thread(next, frame_iter, None)
+            if frame is None:
+                slots.release()
+                break
+            tasks.append(asyncio.create_task(analyze(*frame)))
+    finally:
+        results = await asyncio.gather(*tasks)
+    return {"frames": list(results), "peak_rgb": peak["rgb"]}
+
+
+@analyzer("timeline", inputs=["frames"], cost=INLINE)
+async def timeline(ctx, frames):
+    return plugin("build_timeline")(frames["frames"])
+
+
+@analyzer("frame_scatter", inputs=["frames"], services=["artifacts"], cost=CPU)
+async def frame_scatter(ctx, frames):
+    """Spectrum and scores of the most synthetic-looking sampled frame."""
+    if frames["peak_rgb"] is None:
+        return {}
+    return await run_cpu(frame_scatter_task, frames["peak_rgb"], ctx.services["artifacts"])
+
+
+# -----------------------------
+# Any file
+# -----------------------------
+@analyzer("exiftool", cost=IO)
+async def exiftool(ctx):
+    """exiftool -j via the persistent daemon pool."""
+    return await asyncio.to_thread(get_exiftool_pool().extract, str(ctx.path))
+
+
+@analyzer("bytescan", cost=CPU)
+async def bytescan(ctx):
+    """
+    One mmap pass over the upload for signatures, printable strings and
+    block entropy; the digest comes from ingest rather than a re-hash.
+    """
+    return await run_cpu(plugin("scan_file"), str(ctx.path), 4096, 6, STRINGS_ARTIFACT_LIMIT,
+                         ctx.upload.get("sha256"), SIGNATURE_LIMIT)
+
+
+@analyzer("signatures", inputs=["bytescan"], cost=INLINE)
+async def signatures(ctx, bytescan):
+    """Embedded-file signature scan (reported under "binwalk")."""
+    return bytescan["signatures"]
+
+
+@analyzer("stego_tools", mime=["image/", "audio/"], cost=IO)
+async def stego_tools(ctx):
+    """steghide/zsteg, only for the MIME types they support."""
+    return await run_tools(plugin("stego_tools_for")(ctx.mime, ctx.path))
+
+
+@analyzer("stego", optional=["image", "stego_tools"], cost=INLINE)
+async def stego(ctx, image, stego_tools):
+    if image is not None:
+        lsb = image["lsb"]
+    elif ctx.kind in MOVING:
+        lsb = {"applicable": False, "summary": f"LSB analysis not run on {ctx.kind} media."}
+    else:
+        lsb = {"applicable": False, "summary": "LSB analysis only applies to still images."}
+    return plugin("stego_report")(lsb, stego_tools or {})
+
+
+@analyzer("strings", inputs=["bytescan"], services=["artifacts"], cost=INLINE)
+async def strings(ctx, bytescan):
+    """The full string dump goes to the artifact store, the report keeps a sample."""
+    return {
+        "sample": bytescan["strings"][:40],
+        "total": bytescan["strings_total"],
+        "artifact": ctx.services["artifacts"].put("\n".join(bytescan["strings"]).encode(), "text/plain"),
+        "entropy_blocks": bytescan["entropy_blocks"][:50],
+    }
+
+
+# -----------------------------
+# Derived results
+# -----------------------------
+@analyzer("ai_detection", optional=["image", "frames"], kinds=STILL + MOVING, cost=INLINE)
+async def ai_detection(ctx, image, frames):
+    """Entropy heuristic: gray entropy of the image, or its mean over sampled frames."""
+    if image is not None:
+        entropy = image["stats"]["gray_entropy"]
+    elif frames and frames["frames"]:
+        entropy = statistics.fmean(f["gray_entropy"] for f in frames["frames"])
+    else:
+        raise ValueError("no decoded pixels to score")
+    return {"ai_score": round(min(entropy / 16, 1.0), 2), "avg_entropy": round(entropy, 2)}
+
+
+@analyzer("byte_entropy_score", inputs=["bytescan"], cost=INLINE)
+async def byte_entropy_score(ctx, bytescan):
+    """The legacy /analyze-media score: mean per-block byte entropy, for any file type."""
+    return plugin("heuristic_ai_score")(bytescan["entropy_blocks"])
+
+
+@analyzer("near_duplicates", optional=["hashes", "frames"], services=["phash_index"], cost=INLINE)
+async def near_duplicates(ctx, hashes, frames):
+    """
+    pHash matches within PHASH_RADIUS: {"radius", "known_fake": [...],
+    "previously_analysed": [...]}. Known fakes re-cut into a clip still
+    match frame by frame.
+    """
+    index = ctx.services["phash_index"]
+    out = {"radius": PHASH_RADIUS, "known_fake": [], "previously_analysed": []}
+    if hashes and "phash" in hashes:
+        # Separate queries, so a crowd of closer re-uploads can't push a known fake past the limit
+        out["known_fake"] = index.query(hashes["phash"], PHASH_RADIUS, label=KNOWN_FAKE)
+        out["previously_analysed"] = index.query(hashes["phash"], PHASH_RADIUS, label=ANALYSED)
+    for frame in (frames or {}).get("frames", []):
+        if frame.get("phash"):
+            for match in index.query(frame["phash"], PHASH_RADIUS, label=KNOWN_FAKE):
+                out["known_fake"].append({**match, "t": frame["t"]})
+    return out
+
+
+validate()
@@ -1,88 +1,81 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse, FileResponse
-import uuid, os, tempfile, time
-from forensic import *
-from report_builder import build_json_report, build_pdf_report
+import asyncio, json, uuid, os, shutil, tempfile, time
+from ingest import stream_upload, UploadLimitMiddleware
+from plugins import plugin, warm_up
+from cpu_pool import warm_pool
+from analyzers import Pipeline, AnalyzerError
+from artifact_store import ArtifactStore
 
 app = FastAPI(title="Darpan Forensic Local Service")
+app.add_middleware(UploadLimitMiddleware)
 
 DATA_DIR = os.environ.get("DARPAN_DATA", "/tmp/darpan_data")
 os.makedirs(DATA_DIR, exist_ok=True)
+artifact_store = ArtifactStore(DATA_DIR)
 
-@app.post("/analyze-media")
-async def analyze_media(file: UploadFile = File(...), prompt: str = Form(None)):
-    start = time.time()
-    case_id = f"DFP-{uuid.uuid4().hex[:12]}"
-    # Save upload
-    tmpdir = tempfile.mkdtemp(prefix="darpan_")
-    upload_path = os.path.join(tmpdir, file.filename)
-    with open(upload_path, "wb") as f:
-        f.write(await file.read())
 
-    # compute sha256
-    file_sha = sha256_from_file(upload_path)
-    findings = {}
+@app.on_event("startup")
+async def startup():
+    # Import the analyzers and start the CPU pool in the background (see main.py)
+    async def _warm():
+        await asyncio.to_thread(warm_up)
+        await warm_pool()
+    if os.environ.get("DARPAN_WARMUP", "1") == "1":
+        app.state.warm_up = asyncio.create_task(_warm())
 
-    # 1) detect mime
-    findings["mime"] = detect_mime(upload_path)
 
-    # 2) metadata
-    try:
-        findings["metadata"] = extract_metadata(upload_path)
-    except Exception as e:
-        findings["metadata_error"] = str(e)
+# Sections of the legacy report, by the analyzer that produces them. The
+# legacy ai_detection section keeps its byte-entropy score (any file type)
+# rather than main.py's pixel-entropy ai_detection analyzer.
+LEGACY_ANALYZERS = ["exiftool", "signatures", "stego", "hashes", "strings", "byte_entropy_score"]
 
-    # 3) binwalk (raw output)
-    try:
-        findings["binwalk"] = binwalk_scan(upload_path, extract=False)
-    except Exception as e:
-        findings["binwalk_error"] = str(e)
 
-    # 4) stego checks
+@app.post("/analyze-media")
+async def analyze_media(file: UploadFile = File(...), prompt: str = Form(None)):
+    start = time.time()
+    case_id = f"DFP-{uuid.uuid4().hex[:12]}"
+    # Save upload (streamed; sha256 and mime computed while writing)
+    tmpdir = tempfile.mkdtemp(prefix="darpan_")
     try:
-        findings["steghide"] = steghide_check(upload_path)
-    except Exception as e:
-        findings["steghide_error"] = str(e)
+        upload = await stream_upload(file, tmpdir)
+        file_sha = upload["sha256"]
+        findings = {"mime": upload["mime"]}
 
-    if findings["mime"] and "png" in findings["mime"]:
+        # Same analyzer registry as main.py; inapplicable analyzers are skipped
         try:
-            findings["zsteg"] = zsteg_check(upload_path)
+            async with await Pipeline.open(upload, services={"artifacts": artifact_store}) as pipeline:
+                results = await pipeline.run(LEGACY_ANALYZERS)
+        except AnalyzerError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        for key, name in (("metadata", "exiftool"), ("binwalk", "signatures"), ("steghide", "stego"),
+                          ("image_hashes", "hashes"), ("ai_detection", "byte_entropy_score")):
+            if name in results:
+                findings[key] = results[name]
+            elif "error" in pipeline.status[name]:
+                findings[f"{key}_error"] = pipeline.status[name]["error"]
+        if "strings" in results:
+            scan = results["strings"]
+            findings.update(strings_sample=scan["sample"], strings_total=scan["total"], strings=scan["artifact"],
+                            entropy_blocks=scan["entropy_blocks"])
+        findings["analyzers"] = pipeline.status
+
+        # Combine & report
+        report_json = plugin("build_json_report")(case_id=case_id, filename=upload["filename"], file_sha256=file_sha, findings=findings)
+        # Save JSON
+        json_path = os.path.join(tmpdir, f"{case_id}.json")
+        with open(json_path, "w") as jf:
+            json.dump(report_json, jf, indent=2)
+
+        # Build PDF
+        pdf_path = os.path.join(tmpdir, f"{case_id}.pdf")
+        try:
+            plugin("build_pdf_report")(report_json, pdf_path, artifacts=artifact_store)
         except Exception as e:
-            findings["zsteg_error"] = str(e)
-
-    # 5) image hashes
-    findings["image_hashes"] = image_hashes(upload_path)
-
-    # 6) strings and iocs (trimmed)
-    try:
-        strings = extract_strings(upload_path, min_len=6)
-        findings["strings_sample"] = strings[:40]
-    except Exception as e:
-        findings["strings_error"] = str(e)
-
-    # 7) entropy
-    try:
-        ent = entropy_blocks(upload_path, block_size=4096)
-        findings["entropy_blocks"] = ent[:50]
-    except Exception as e:
-        findings["entropy_error"] = str(e)
-
-    # 8) heuristic AI detection (placeholder)
-    findings["ai_detection"] = heuristic_ai_score(upload_path)
-
-    # Combine & report
-    report_json = build_json_report(case_id=case_id, filename=file.filename, file_sha256=file_sha, findings=findings)
-    # Save JSON
-    json_path = os.path.join(tmpdir, f"{case_id}.json")
-    with open(json_path, "w") as jf:
-        json.dump(report_json, jf, indent=2)
-
-    # Build PDF
-    pdf_path = os.path.join(tmpdir, f"{case_id}.pdf")
-    try:
-        build_pdf_report(report_json, pdf_path)
-    except Exception as e:
-        report_json["pdf_error"] = str(e)
+            report_json["pdf_error"] = str(e)
+    finally:
+        # Nothing in the response points into tmpdir (artifacts live in the store)
+        await asyncio.to_thread(shutil.rmtree, tmpdir, True)
 
     elapsed = time.time() - start
     report_json["meta"] = {"process_time_s": round(elapsed, 2), "case_id": case_id}
@@ -90,6 +83,14 @@ async def analyze_media(file: UploadFile = File(...), prompt: str = Form(None)):
     # return JSON and downloadable pdf link (base: /download?path=)
     return JSONResponse(report_json)
 
+@app.get("/artifacts/{digest}")
+def get_artifact(digest: str):
+    found = artifact_store.locate(digest)
+    if not found:
+        return JSONResponse({"error": f"Artifact not found: {digest}"}, status_code=404)
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "darpan-local-forensics"}
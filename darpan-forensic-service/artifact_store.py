@@ -0,0 +1,107 @@
+#artifact_store
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DATA_DIR = os.environ.get("DARPAN_DATA", "/tmp/darpan_data")
+ARTIFACT_TTL_S = float(os.environ.get("DARPAN_CASE_TTL_HOURS", "24")) * 3600
+
+# media type <-> file extension; the extension is how a blob's type is stored
+EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "application/pdf": ".pdf",
+    "application/json": ".json",
+    "text/plain": ".txt",
+    "application/octet-stream": ".bin",
+}
+MEDIA_TYPES = {ext: media_type for media_type, ext in EXTENSIONS.items()}
+
+
+def artifact_refs(report):
+    """Every artifact reference nested anywhere in a report."""
+    if isinstance(report, dict):
+        if "digest" in report and str(report.get("url", "")).startswith("/artifacts/"):
+            yield report
+            return
+        for value in report.values():
+            yield from artifact_refs(value)
+    elif isinstance(report, list):
+        for value in report:
+            yield from artifact_refs(value)
+
+
+class ArtifactStore:
+    """
+    Content-addressed blob store for large report outputs (spectrum
+    thumbnails, string dumps, ...). Blobs live at
+    <DARPAN_DATA>/artifacts/<ab>/<sha256><ext> and reports carry only a
+    reference: {"digest", "url", "media_type", "size"}.
+
+    Writes go through a temp file + rename, so the store is safe to share
+    between the API process and the CPU pool workers. Only the root path is
+    kept, so instances pickle cheaply into the pool.
+    """
+
+    def __init__(self, root=None, ttl_s=ARTIFACT_TTL_S):
+        self.root = Path(root or DATA_DIR) / "artifacts"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+
+    def _path(self, digest, ext):
+        return self.root / digest[:2] / f"{digest}{ext}"
+
+    def put(self, data, media_type="application/octet-stream"):
+        """Store bytes (deduplicated by SHA-256) and return their reference."""
+        ext = EXTENSIONS.get(media_type, ".bin")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, ext)
+        if path.exists():
+            os.utime(path)  # keep it alive for gc()
+        else:
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return {"digest": digest, "url": f"/artifacts/{digest}", "media_type": media_type, "size": len(data)}
+
+    def locate(self, digest):
+        """(path, media_type) of a stored blob, or None."""
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            return None
+        for path in (self.root / digest[:2]).glob(f"{digest}.*"):
+            return path, MEDIA_TYPES.get(path.suffix, "application/octet-stream")
+        return None
+
+    def read(self, digest):
+        """Blob bytes, or None if unknown."""
+        found = self.locate(digest)
+        return found[0].read_bytes() if found else None
+
+    def touch(self, ref):
+        """Refresh a referenced blob's TTL; False if it is gone."""
+        found = self.locate(ref.get("digest", ""))
+        if not found:
+            return False
+        os.utime(found[0])
+        return True
+
+    def gc(self, now=None):
+        """Remove blobs not written or re-put within the TTL; returns the count removed."""
+        cutoff = (now or time.time()) - self.ttl_s
+        removed = 0
+        for path in self.root.glob("*/*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def stats(self):
+        files = [p for p in self.root.glob("*/*") if not p.name.startswith(".tmp-")]
+        return {"blobs": len(files), "bytes": sum(p.stat().st_size for p in files)}
@@ -0,0 +1,480 @@
+#benchmark
+"""
+Micro-benchmarks for the forensic service.
+
+    python benchmark.py image-stats --mp 1 4 12
+    python benchmark.py throughput --concurrency 1 2 4 8
+    python benchmark.py signatures --mb 1 16 128
+    python benchmark.py scatter --mp 1 4 12
+    python benchmark.py memory --mp 12 48 100
+    python benchmark.py fps [--clip a.mp4 b.gif]
+    python benchmark.py startup --runs 3
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from image_stats import compute_image_stats, load_rgb
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def synthetic_rgb(megapixels, seed=0):
+    """Noisy gradient image of roughly `megapixels` MP (4:3)."""
+    h = int(math.sqrt(megapixels * 1e6 * 3 / 4))
+    w = int(h * 4 / 3)
+    rng = np.random.default_rng(seed)
+    base = np.linspace(0, 255, w, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 24, size=(h, w, 3)).astype(np.float32)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# -----------------------------
+# image-stats
+# -----------------------------
+def legacy_gray_entropy(img):
+    """The original pure-Python histogram loop from main.py."""
+    gray = img.convert("L")
+    pixels = list(gray.getdata())
+    histogram = [0] * 256
+    for p in pixels:
+        histogram[p] += 1
+    total = len(pixels)
+    return -sum((h / total) * math.log2(h / total) for h in histogram if h != 0)
+
+
+def bench_image_stats(args):
+    print(f"{'MP':>6} {'legacy s':>10} {'numpy s':>10} {'legacy s/MP':>12} {'numpy s/MP':>12} {'speedup':>8}")
+    for mp in args.mp:
+        rgb = synthetic_rgb(mp)
+        real_mp = rgb.shape[0] * rgb.shape[1] / 1e6
+        img = Image.fromarray(rgb)
+
+        legacy = timed(legacy_gray_entropy, img) if not args.skip_legacy else float("nan")
+        fast = timed(compute_image_stats, rgb, repeat=args.repeat)
+        print(f"{real_mp:6.1f} {legacy:10.3f} {fast:10.3f} {legacy / real_mp:12.4f} {fast / real_mp:12.4f} {legacy / fast:8.1f}x")
+
+
+# -----------------------------
+# throughput
+# -----------------------------
+def _cpu_stage_inline(image_path):
+    """Decode + stats/scatter + hashes in the calling thread (GIL-bound)."""
+    from cpu_pool import _stats_and_scatter
+    from forensic import image_hashes
+    rgb = load_rgb(image_path)
+    _stats_and_scatter(rgb, image_path)
+    image_hashes(Image.fromarray(rgb))
+
+
+async def _cpu_stage_pool(image_path):
+    """The main.py path: decode in a thread, analyzers in the process pool."""
+    from cpu_pool import SharedArray, run_cpu, stats_and_scatter_task, image_hashes_task
+    from decoded_image import DecodedImage
+    decoded = await asyncio.to_thread(DecodedImage.open, image_path)
+    with SharedArray(decoded.rgb) as shared:
+        await asyncio.gather(
+            run_cpu(stats_and_scatter_task, shared.ref, image_path),
+            run_cpu(image_hashes_task, decoded.working),
+        )
+
+
+async def _run_clients(mode, image_path, concurrency, per_client):
+    async def client():
+        for _ in range(per_client):
+            if mode == "threads":
+                await asyncio.to_thread(_cpu_stage_inline, image_path)
+            else:
+                await _cpu_stage_pool(image_path)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - t0
+
+
+def bench_throughput(args):
+    from cpu_pool import shutdown_executor, CPU_WORKERS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "bench.jpg")
+        Image.fromarray(synthetic_rgb(args.mp)).save(image_path, quality=92)
+
+        # Start the pool workers outside the timed region
+        asyncio.run(_run_clients("processes", image_path, CPU_WORKERS, 1))
+
+        print(f"CPU workers: {CPU_WORKERS}, image: {args.mp} MP, {args.per_client} uploads per client")
+        print(f"{'clients':>8} {'threads up/s':>13} {'processes up/s':>15} {'speedup':>8}")
+        for c in args.concurrency:
+            total = c * args.per_client
+            t_threads = asyncio.run(_run_clients("threads", image_path, c, args.per_client))
+            t_procs = asyncio.run(_run_clients("processes", image_path, c, args.per_client))
+            print(f"{c:8d} {total / t_threads:13.2f} {total / t_procs:15.2f} {t_threads / t_procs:7.1f}x")
+        shutdown_executor()
+
+
+# -----------------------------
+# signatures
+# -----------------------------
+def _polyglot_file(path, megabytes):
+    """Random bytes with a JPEG header and a ZIP + gzip member buried in them."""
+    rng = np.random.default_rng(0)
+    body = bytearray(rng.integers(0, 256, int(megabytes * 1024 * 1024), dtype=np.uint8).tobytes())
+    body[:4] = b"\xff\xd8\xff\xe0"
+    mid = len(body) // 2
+    body[mid:mid + 4] = b"PK\x03\x04"
+    body[-64:-60] = b"\x1f\x8b\x08\x00"
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def _binwalk_subprocess(path):
+    subprocess.run(["binwalk", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+
+def bench_signatures(args):
+    from signatures import scan_signatures
+
+    binwalk = shutil.which("binwalk")
+    if not binwalk:
+        print("binwalk not on PATH; timing the in-process scanner only")
+    print(f"{'MB':>6} {'binwalk s':>10} {'scanner s':>10} {'scanner MB/s':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in args.mb:
+            path = os.path.join(tmp, f"blob_{mb}.bin")
+            _polyglot_file(path, mb)
+            fast = timed(scan_signatures, path, repeat=args.repeat)
+            slow = timed(_binwalk_subprocess, path) if binwalk else float("nan")
+            print(f"{mb:6.0f} {slow:10.3f} {fast:10.3f} {mb / fast:13.1f} {slow / fast:7.1f}x")
+
+
+# -----------------------------
+# scatter
+# -----------------------------
+def legacy_fft_figure(rgb):
+    """The original spectrum path: full-resolution fft2 + matplotlib savefig."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from io import BytesIO
+
+    fig, axs = plt.subplots(1, 3, figsize=(9, 3))
+    for ax, i in zip(axs, range(3)):
+        spectrum = 20 * np.log(np.abs(np.fft.fftshift(np.fft.fft2(rgb[..., i]))) + 1)
+        ax.imshow(spectrum, cmap="gray")
+        ax.axis("off")
+    plt.tight_layout()
+    plt.savefig(BytesIO(), format="png")
+    plt.close(fig)
+
+
+def bench_scatter(args):
+    from scatter_analysis import log_spectra, render_spectra
+
+    try:
+        t0 = time.perf_counter()
+        import matplotlib.pyplot  # noqa: F401
+        print(f"matplotlib import: {time.perf_counter() - t0:.3f} s")
+        have_mpl = True
+    except ImportError:
+        print("matplotlib not installed; skipping the legacy path")
+        have_mpl = False
+
+    print(f"{'MP':>6} {'legacy s':>10} {'rfft+PIL s':>11} {'speedup':>8}")
+    for mp in args.mp:
+        rgb = synthetic_rgb(mp)
+        real_mp = rgb.shape[0] * rgb.shape[1] / 1e6
+        legacy = timed(legacy_fft_figure, rgb, repeat=args.repeat) if have_mpl else float("nan")
+        fast = timed(lambda a: render_spectra(log_spectra(a)), rgb, repeat=args.repeat)
+        print(f"{real_mp:6.1f} {legacy:10.3f} {fast:11.3f} {legacy / fast:7.1f}x")
+
+
+# -----------------------------
+# memory
+# -----------------------------
+# Save options per benchmarked format: BMP and uncompressed TIFF are read in
+# bands, PNG can only be decoded whole, JPEG is drafted once it is large enough
+MEMORY_FORMATS = {
+    "png": {"format": "PNG", "compress_level": 1},
+    "bmp": {"format": "BMP"},
+    "tiff": {"format": "TIFF"},
+    "jpeg": {"format": "JPEG", "quality": 90},
+}
+
+
+def _proc_status_kib(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _memory_probe(mode, image_path, queue):
+    """Runs in a fresh process: analyse once, report tracemalloc and RSS peaks."""
+    import tracemalloc
+    import warnings
+    warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+    from tiled_analysis import analyze_image_tiled  # import cost outside the measurement
+    from cpu_pool import _stats_and_scatter
+    from decoded_image import DecodedImage
+    from lsb_stego import analyze_lsb
+    base_rss = _proc_status_kib("VmRSS")
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    decode = "full"
+    if mode == "tiled":
+        decode = analyze_image_tiled(image_path)["stats"]["decode"]["mode"]
+    else:
+        decoded = DecodedImage.open(image_path)
+        _stats_and_scatter(decoded.rgb, image_path)
+        analyze_lsb(decoded.rgb, decoded.format)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    rss = _proc_status_kib("VmHWM") - base_rss
+    queue.put((decode, peak / 2**20, rss / 1024, elapsed))
+
+
+def _measure(mode, image_path):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_memory_probe, args=(mode, image_path, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def bench_memory(args):
+    print("numpy = tracemalloc peak (NumPy/Python allocations), rss = max RSS growth incl. PIL's decode buffer;")
+    print("decode = how the tiled path read the file (bands: row bands from disk, draft: reduced-scale JPEG,")
+    print("full: decoded whole by PIL, so its rss still grows with the image)")
+    print(f"{'MP':>6} {'format':>6} {'mode':>6} {'decode':>6} {'numpy MiB':>10} {'rss MiB':>9} {'time s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in args.mp:
+            img = Image.fromarray(synthetic_rgb(mp))
+            for fmt in args.formats:
+                image_path = os.path.join(tmp, f"bench_{mp}.{fmt}")
+                img.save(image_path, **MEMORY_FORMATS[fmt])
+                for mode in ("full", "tiled"):
+                    decode, numpy_mib, rss_mib, elapsed = _measure(mode, image_path)
+                    print(f"{mp:6.0f} {fmt:>6} {mode:>6} {decode:>6} {numpy_mib:10.1f} {rss_mib:9.1f} {elapsed:8.2f}")
+                os.remove(image_path)
+
+
+# -----------------------------
+# fps
+# -----------------------------
+def _synthetic_clips(tmp, seconds=10, fps=25, side=720):
+    """A panning-noise MP4 (if OpenCV can encode one) and an animated GIF."""
+    frames = [np.roll(synthetic_rgb(side * side * 4 / 3 / 1e6, seed=i % 4), i * 8, axis=1)
+              for i in range(seconds * fps)]
+    clips = []
+    try:
+        import cv2
+        path = os.path.join(tmp, "bench.mp4")
+        h, w = frames[0].shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+        for frame in frames:
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        writer.release()
+        clips.append(path)
+    except ImportError:
+        print("OpenCV not installed; skipping the video clip")
+    path = os.path.join(tmp, "bench.gif")
+    gif = [Image.fromarray(f).reduce(2) for f in frames[::5]]
+    gif[0].save(path, save_all=True, append_images=gif[1:], duration=200, loop=0)
+    clips.append(path)
+    return clips
+
+
+async def _analyse_frames(path, kind, fps, max_frames):
+    from cpu_pool import run_cpu, frame_task
+    from frame_sampler import iter_frames
+
+    frames = iter_frames(path, kind, fps=fps, max_frames=max_frames)
+    tasks = []
+    while (frame := await asyncio.to_thread(next, frames, None)) is not None:
+        tasks.append(asyncio.create_task(run_cpu(frame_task, frame[2])))
+    return await asyncio.gather(*tasks)
+
+
+def bench_fps(args):
+    from cpu_pool import shutdown_executor, CPU_WORKERS
+    from frame_sampler import media_kind, iter_frames
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = args.clip or _synthetic_clips(tmp)
+        print(f"CPU workers: {CPU_WORKERS}, sampling at {args.fps} fps, at most {args.max_frames} frames")
+        print(f"{'clip':>16} {'kind':>9} {'frames':>7} {'decode fps':>11} {'analysed fps':>13}")
+        for clip in clips:
+            mime = "video/mp4" if clip.endswith((".mp4", ".mov", ".mkv", ".webm", ".avi")) else None
+            kind = media_kind(mime, clip)
+            if kind == "image":
+                print(f"{os.path.basename(clip):>16} {'still':>9} (skipped)")
+                continue
+            t0 = time.perf_counter()
+            n = sum(1 for _ in iter_frames(clip, kind, fps=args.fps, max_frames=args.max_frames))
+            decode = time.perf_counter() - t0
+            asyncio.run(_analyse_frames(clip, kind, args.fps, 1))  # start the pool workers
+            t0 = time.perf_counter()
+            asyncio.run(_analyse_frames(clip, kind, args.fps, args.max_frames))
+            full = time.perf_counter() - t0
+            print(f"{os.path.basename(clip)[-16:]:>16} {kind:>9} {n:7d} {n / decode:11.1f} {n / full:13.1f}")
+        shutdown_executor()
+
+
+# -----------------------------
+# startup
+# -----------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _multipart(field, filename, data, content_type):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _upload(base, image_bytes):
+    body, content_type = _multipart("file", "bench.jpg", image_bytes, "image/jpeg")
+    req = urllib.request.Request(base + "/analyze-media-forensics", data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(req, timeout=300) as r:
+        r.read()
+
+
+def _cold_start(images, warmup, health_path, data_dir, delay_s):
+    """
+    Seconds from process start to the first 200 on `health_path`, to the
+    first finished analysis, and for a second (warm) analysis.
+    """
+    port = _free_port()
+    env = {**os.environ, "DARPAN_DATA": data_dir, "DARPAN_WARMUP": "1" if warmup else "0"}
+    t0 = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(base + health_path, timeout=5) as r:
+                    if r.status == 200:
+                        break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.01)
+        healthy = time.perf_counter() - t0
+        time.sleep(delay_s)  # idle time before the first request arrives (e.g. Cloud Run routing)
+        _upload(base, images[0])
+        first = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        _upload(base, images[1])
+        return healthy, first, time.perf_counter() - t1
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_startup(args):
+    from io import BytesIO
+
+    def jpeg(seed):
+        buf = BytesIO()
+        Image.fromarray(synthetic_rgb(args.mp, seed=seed)).save(buf, "JPEG", quality=92)
+        return buf.getvalue()
+
+    print(f"{args.runs} cold starts per mode, {args.mp} MP uploads, first request {args.delay}s after healthy")
+    print(f"{'warm-up':>8} {'healthy s':>10} {'first analysis s':>17} {'first request s':>16} {'warm request s':>15}")
+    for warmup in (False, True):
+        runs = []
+        for i in range(args.runs):
+            # Fresh data dir and never-seen images each run: no cache hits
+            images = [jpeg(1000 + 10 * i + 2 * warmup), jpeg(1001 + 10 * i + 2 * warmup)]
+            with tempfile.TemporaryDirectory() as data_dir:
+                runs.append(_cold_start(images, warmup, args.health, data_dir, args.delay))
+        healthy, first, warm = np.median(runs, axis=0)
+        print(f"{'on' if warmup else 'off':>8} {healthy:10.2f} {first:17.2f} {first - healthy - args.delay:16.2f} "
+              f"{warm:15.2f}")
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="DARPAN forensic service benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("image-stats", help="histogram/entropy/correlation cost per megapixel")
+    p.add_argument("--mp", type=float, nargs="+", default=[1, 4, 12])
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--skip-legacy", action="store_true", help="skip the slow pure-Python baseline")
+    p.set_defaults(func=bench_image_stats)
+
+    p = sub.add_parser("throughput", help="CPU-stage uploads/s with threads vs the process pool")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--per-client", type=int, default=2)
+    p.add_argument("--mp", type=float, default=4)
+    p.set_defaults(func=bench_throughput)
+
+    p = sub.add_parser("signatures", help="embedded-file signature scan vs the binwalk subprocess")
+    p.add_argument("--mb", type=float, nargs="+", default=[1, 16, 128])
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_signatures)
+
+    p = sub.add_parser("scatter", help="FFT spectrum thumbnail: fft2 + matplotlib vs rfft2 + PIL")
+    p.add_argument("--mp", type=float, nargs="+", default=[1, 4, 12])
+    p.add_argument("--repeat", type=int, default=2)
+    p.set_defaults(func=bench_scatter)
+
+    p = sub.add_parser("memory", help="peak memory of the full-resolution vs tiled analysis paths")
+    p.add_argument("--mp", type=float, nargs="+", default=[12, 48, 100])
+    p.add_argument("--formats", nargs="+", choices=sorted(MEMORY_FORMATS), default=["png", "bmp", "tiff", "jpeg"])
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("fps", help="sampled frames/s for video and animated images (decode vs full analysis)")
+    p.add_argument("--clip", nargs="+", help="local sample clips; synthesised when omitted")
+    p.add_argument("--fps", type=float, default=2)
+    p.add_argument("--max-frames", type=int, default=32)
+    p.set_defaults(func=bench_fps)
+
+    p = sub.add_parser("startup", help="cold start: time to first healthy response and to first analysis")
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--mp", type=float, default=2)
+    p.add_argument("--delay", type=float, default=1.0, help="idle seconds between healthy and the first upload")
+    p.add_argument("--health", default="/health")
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#binscan
+import hashlib
+import mmap
+import re
+
+import numpy as np
+
+from signatures import scan_buffer, signature_report
+
+# Blocks per bincount batch: bounds the int64 index temporary to
+# ~BATCH_BLOCKS * block_size * 8 bytes.
+BATCH_BLOCKS = 256
+
+
+def _printable_re(min_len):
+    return re.compile(rb"[\x20-\x7e]{%d,}" % min_len)
+
+
+def block_entropies(data, block_size=4096):
+    """
+    Shannon entropy (bits/byte) of each `block_size` block of a uint8 array,
+    using one bincount per batch of blocks over a strided view.
+    """
+    n = len(data)
+    if n == 0:
+        return []
+    full = n // block_size
+    out = []
+    if full:
+        blocks = data[:full * block_size].reshape(full, block_size)
+        for start in range(0, full, BATCH_BLOCKS):
+            batch = blocks[start:start + BATCH_BLOCKS]
+            rows = len(batch)
+            # Offset each block's byte values into its own 256-bin range
+            idx = batch + (np.arange(rows, dtype=np.int64) * 256)[:, None]
+            counts = np.bincount(idx.ravel(), minlength=rows * 256).reshape(rows, 256)
+            out.extend(_entropy_rows(counts, block_size))
+    tail = data[full * block_size:]
+    if len(tail):
+        out.extend(_entropy_rows(np.bincount(tail, minlength=256)[None, :], len(tail)))
+    return out
+
+
+def _entropy_rows(counts, length):
+    p = counts / length
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    return (-terms.sum(axis=1)).tolist()
+
+
+def scan_file(filepath, block_size=4096, min_len=4, max_strings=None, sha256=None, max_signatures=None):
+    """
+    Map the file once and derive everything the byte-level analyzers need:
+    SHA-256, printable ASCII runs (>= min_len), per-block entropy and, when
+    `max_signatures` is given, embedded-file signatures.
+
+    Returns {"sha256", "size", "strings", "strings_total", "entropy_blocks"}
+    plus "signatures" (see signatures.signature_report) when requested;
+    `strings` keeps at most `max_strings` runs while `strings_total` counts
+    all. Pass `sha256` when the digest is already known (ingest computes it
+    while streaming the upload) to skip hashing.
+    """
+    with open(filepath, "rb") as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            empty = {"sha256": sha256 or hashlib.sha256().hexdigest(), "size": 0,
+                     "strings": [], "strings_total": 0, "entropy_blocks": []}
+            if max_signatures is not None:
+                empty["signatures"] = signature_report([], 0, 0)
+            return empty
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sha = sha256 or hashlib.sha256(mm).hexdigest()
+            signatures = None
+            if max_signatures is not None:
+                signatures = signature_report(*scan_buffer(mm, max_signatures), size)
+
+            strings, total = [], 0
+            for m in _printable_re(min_len).finditer(mm):
+                total += 1
+                if max_strings is None or len(strings) < max_strings:
+                    strings.append(m.group().decode("ascii"))
+
+            data = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                entropy = block_entropies(data, block_size)
+            finally:
+                del data  # release the export before the mmap closes
+
+    result = {"sha256": sha, "size": size, "strings": strings,
+              "strings_total": total, "entropy_blocks": entropy}
+    if signatures is not None:
+        result["signatures"] = signatures
+    return result
@@ -0,0 +1,145 @@
+#case_store
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DATA_DIR = os.environ.get("DARPAN_DATA", "/tmp/darpan_data")
+CASE_TTL_S = float(os.environ.get("DARPAN_CASE_TTL_HOURS", "24")) * 3600
+TEMP_PREFIX = "darpan_"
+
+
+class CaseStore:
+    """
+    SQLite index of forensic cases and their report artifacts.
+
+    Artifacts live under <DARPAN_DATA>/cases/<case_id>/ and are looked up by
+    primary key, so /download no longer scans the filesystem. gc() expires
+    cases past their TTL and sweeps stale `darpan_*` upload directories.
+    """
+
+    def __init__(self, root=None, ttl_s=CASE_TTL_S, temp_dir=None):
+        self.root = Path(root or DATA_DIR)
+        self.cases_dir = self.root / "cases"
+        self.cases_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir = Path(temp_dir or tempfile.gettempdir())
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "cases.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS cases (
+                case_id TEXT PRIMARY KEY,
+                sha256 TEXT,
+                created_at REAL,
+                last_access REAL
+            );
+            CREATE TABLE IF NOT EXISTS artifacts (
+                case_id TEXT,
+                format TEXT,
+                path TEXT,
+                bytes INTEGER,
+                PRIMARY KEY (case_id, format)
+            );
+            CREATE INDEX IF NOT EXISTS cases_last_access ON cases(last_access);
+        """)
+        self.gc_runs = 0
+        self.last_gc = {}
+
+    # ---------- Write ----------
+    def case_dir(self, case_id):
+        d = self.cases_dir / case_id
+        d.mkdir(exist_ok=True)
+        return d
+
+    def register(self, case_id, sha256, artifacts=None):
+        """Record a case and any {format: path} artifacts already written."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO cases VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(case_id) DO UPDATE SET last_access = excluded.last_access",
+                (case_id, sha256, now, now),
+            )
+            for fmt, path in (artifacts or {}).items():
+                self._db.execute(
+                    "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)",
+                    (case_id, fmt, str(path), os.path.getsize(path)),
+                )
+
+    def forget(self, case_id, fmt):
+        """Drop one artifact record; returns its path (the caller removes the file) or None."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT path FROM artifacts WHERE case_id = ? AND format = ?", (case_id, fmt)
+            ).fetchone()
+            self._db.execute("DELETE FROM artifacts WHERE case_id = ? AND format = ?", (case_id, fmt))
+        return Path(row[0]) if row else None
+
+    # ---------- Read ----------
+    def lookup(self, case_id, fmt):
+        """Path of a case artifact, or None if unknown or gone from disk."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path FROM artifacts WHERE case_id = ? AND format = ?", (case_id, fmt)
+            ).fetchone()
+            if row:
+                with self._db:
+                    self._db.execute("UPDATE cases SET last_access = ? WHERE case_id = ?", (time.time(), case_id))
+        if row and os.path.exists(row[0]):
+            return Path(row[0])
+        return None
+
+    # ---------- Garbage collection ----------
+    def gc(self, now=None):
+        """Remove cases idle for longer than the TTL and stale darpan_* temp dirs."""
+        now = now or time.time()
+        cutoff = now - self.ttl_s
+        with self._lock, self._db:
+            expired = [r[0] for r in self._db.execute(
+                "SELECT case_id FROM cases WHERE last_access < ?", (cutoff,))]
+            self._db.executemany("DELETE FROM artifacts WHERE case_id = ?", [(c,) for c in expired])
+            self._db.executemany("DELETE FROM cases WHERE case_id = ?", [(c,) for c in expired])
+        for case_id in expired:
+            shutil.rmtree(self.cases_dir / case_id, ignore_errors=True)
+
+        temp_removed = 0
+        for d in self._temp_dirs():
+            try:
+                if d.stat().st_mtime < cutoff:
+                    shutil.rmtree(d, ignore_errors=True)
+                    temp_removed += 1
+            except FileNotFoundError:
+                continue
+
+        self.gc_runs += 1
+        self.last_gc = {"at": now, "cases_removed": len(expired), "temp_dirs_removed": temp_removed}
+        return self.last_gc
+
+    def _temp_dirs(self):
+        data_root = self.root.resolve()
+        for d in self.temp_dir.glob(f"{TEMP_PREFIX}*"):
+            # the default DARPAN_DATA (/tmp/darpan_data) matches the prefix too
+            if d.is_dir() and not data_root.is_relative_to(d.resolve()):
+                yield d
+
+    # ---------- Metrics ----------
+    def stats(self):
+        with self._lock:
+            cases = self._db.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+            by_format = dict(self._db.execute(
+                "SELECT format, COALESCE(SUM(bytes), 0) FROM artifacts GROUP BY format").fetchall())
+        disk = shutil.disk_usage(self.root)
+        return {
+            "cases": cases,
+            "artifact_bytes": by_format,
+            "temp_dirs": sum(1 for _ in self._temp_dirs()),
+            "ttl_s": self.ttl_s,
+            "gc_runs": self.gc_runs,
+            "last_gc": self.last_gc,
+            "volume_free_bytes": disk.free,
+            "volume_total_bytes": disk.total,
+        }
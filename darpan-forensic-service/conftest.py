@@ -0,0 +1,54 @@
+#conftest
+import os
+import tempfile
+
+# Point the service at a throwaway data dir before any module reads DARPAN_DATA
+os.environ.setdefault("DARPAN_DATA", tempfile.mkdtemp(prefix="darpan_test_"))
+os.environ.setdefault("DARPAN_WARMUP", "0")
+
+import numpy as np
+import pytest
+from PIL import Image
+
+
+def noise_rgb(h=64, w=64, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def write_clip(path, frames, fps=10):
+    """Encode RGB frames as an MP4 with OpenCV; skips the test if it can't."""
+    cv2 = pytest.importorskip("cv2")
+    h, w = frames[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    for frame in frames:
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    writer.release()
+    if not os.path.getsize(path):
+        pytest.skip("OpenCV can't encode mp4v here")
+    return path
+
+
+@pytest.fixture
+def black_clip(tmp_path):
+    """2s of black frames followed by 2s of noise."""
+    black = [np.zeros((64, 64, 3), np.uint8)] * 20
+    return write_clip(tmp_path / "black.mp4", black + [noise_rgb(seed=i) for i in range(20)])
+
+
+@pytest.fixture
+def png_bytes():
+    def make(rgb):
+        import io
+        buf = io.BytesIO()
+        Image.fromarray(rgb).save(buf, "PNG")
+        return buf.getvalue()
+    return make
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
@@ -0,0 +1,154 @@
+#cpu_pool
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from plugins import PLUGINS, WORKER_PLUGINS, plugin, warm_up
+
+# Sized to the CPUs the container actually gets, not the host's
+CPU_WORKERS = int(os.environ.get("DARPAN_CPU_WORKERS", "0")) or len(os.sched_getaffinity(0))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool for CPU-bound analyzers (forkserver: safe alongside threads)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            ctx = multiprocessing.get_context("forkserver")
+            # Workers fork from a server that has already imported the analyzers
+            ctx.set_forkserver_preload([PLUGINS[name].partition(":")[0] for name in WORKER_PLUGINS])
+            _executor = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=ctx)
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def run_cpu(fn, *args):
+    """Run a picklable top-level function in the process pool without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), fn, *args)
+
+
+def _warm_worker():
+    warm_up(WORKER_PLUGINS)
+    return os.getpid()
+
+
+async def warm_pool():
+    """Start every pool worker and import the analyzers in it; returns the worker count."""
+    pids = await asyncio.gather(*(run_cpu(_warm_worker) for _ in range(CPU_WORKERS)))
+    return len(set(pids))
+
+
+# -----------------------------
+# Shared-memory image hand-off
+# -----------------------------
+class SharedArray:
+    """
+    Copies an array into POSIX shared memory once so pool workers can map it
+    instead of receiving a pickled copy. Use as a context manager; pass
+    `.ref` (name, shape, dtype) to workers and open it with attach().
+    """
+
+    def __init__(self, arr):
+        import numpy as np
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=self._shm.buf)[...] = arr
+        self.ref = (self._shm.name, arr.shape, arr.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def with_shared(ref, fn, *args):
+    """
+    Worker side of SharedArray: map `ref` as a read-only array and call
+    fn(arr, *args). `fn` must not return views of the array.
+    """
+    import numpy as np
+
+    name, shape, dtype = ref
+    # Pool workers share the parent's resource tracker, and the parent
+    # unlinks the segment, so attaching here needs no extra bookkeeping.
+    shm = shared_memory.SharedMemory(name=name)
+    arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    arr.flags.writeable = False
+    try:
+        return fn(arr, *args)
+    finally:
+        del arr  # release the buffer export before closing the mapping
+        shm.close()
+
+
+# -----------------------------
+# Pool tasks (top-level so they pickle by reference)
+# -----------------------------
+def _stats_and_scatter(rgb, image_path, render=True, artifacts=None):
+    stats = plugin("compute_image_stats")(rgb)
+    scatter = plugin("analyze_image_scatter")(image_path, rgb=rgb, stats=stats, render=render, artifacts=artifacts)
+    return {"gray_entropy": stats["gray_entropy"]}, scatter
+
+
+def stats_and_scatter_task(ref, image_path, render=True, artifacts=None):
+    """
+    Image statistics + scatter analysis on a shared decoded image; render=False
+    skips the spectrum PNG, `artifacts` (an ArtifactStore) receives it.
+    """
+    return with_shared(ref, _stats_and_scatter, image_path, render, artifacts)
+
+
+def image_hashes_task(working):
+    """Perceptual hashes of the downscaled working copy (small enough to pickle)."""
+    from PIL import Image
+
+    return plugin("image_hashes")(Image.fromarray(working))
+
+
+def lsb_task(ref, fmt):
+    """LSB steganalysis on a shared decoded image (needs full-resolution pixels)."""
+    return with_shared(ref, plugin("analyze_lsb"), fmt)
+
+
+def tiled_task(image_path, artifacts=None):
+    """Stats, scatter and LSB for very large images, decoded in the worker and read tile by tile."""
+    result = plugin("analyze_image_tiled")(image_path, artifacts=artifacts)
+    return (result["stats"], result["scatter"]), result["lsb"]
+
+
+def frame_task(rgb):
+    """Numeric stats/scatter scores and pHash of one sampled video/animation frame."""
+    from PIL import Image
+
+    stats = plugin("compute_image_stats")(rgb)
+    scatter = plugin("analyze_image_scatter")(None, rgb=rgb, stats=stats, render=False)
+    return {
+        "phash": plugin("image_hashes")(Image.fromarray(rgb)).get("phash"),
+        "gray_entropy": round(stats["gray_entropy"], 4),
+        "synthetic_likelihood": scatter["synthetic_likelihood"],
+        "correlations": scatter["correlations"],
+    }
+
+
+def frame_scatter_task(rgb, artifacts=None):
+    """Full scatter analysis (with spectrum) of a single frame."""
+    return plugin("analyze_image_scatter")(None, rgb=rgb, artifacts=artifacts)
@@ -0,0 +1,210 @@
+#decoded_image
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from darpan_media import exif_dict
+
+# Largest image (in pixels) the service will open. Pillow's own
+# decompression-bomb guard would reject the very images the tiled path is
+# for, so it is switched off and this limit is checked from the header in
+# open_image() instead, before any pixel is decoded.
+MAX_IMAGE_PIXELS = int(os.environ.get("DARPAN_MAX_IMAGE_PIXELS", str(1_000_000_000)))
+Image.MAX_IMAGE_PIXELS = None
+
+# Longest side of the downscaled working copy handed to analyzers that
+# don't need full resolution (perceptual hashes, previews, ML inputs).
+WORKING_MAX_SIDE = 1024
+# Very large JPEGs can't be read in bands; they are decoded whole at the
+# DCT scale (1/2, 1/4 or 1/8) that brings them under this many pixels
+DRAFT_MAX_PIXELS = int(os.environ.get("DARPAN_DRAFT_MAX_PIXELS", str(40_000_000)))
+BAND_ROWS = 1024
+
+# Bits per pixel of the "raw" decoder modes BandReader can slice by row
+RAW_BITS = {"1": 1, "L": 8, "P": 8, "LA": 16, "I;16": 16, "I;16B": 16, "RGB": 24, "BGR": 24,
+            "RGBA": 32, "BGRA": 32, "RGBX": 32, "BGRX": 32, "CMYK": 32}
+
+
+def open_image(path):
+    """Image.open() with the service's pixel limit applied to the header."""
+    img = Image.open(path)
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        img.close()
+        raise Image.DecompressionBombError(
+            f"Image has {img.width * img.height} pixels, more than the {MAX_IMAGE_PIXELS} limit")
+    return img
+
+
+def _raw_band(tile, y0, y1):
+    """
+    A "raw" decoder tile cut down to image rows [y0, y1) and moved up by
+    y0, or None when it has no rows there. Bottom-up tiles (BMP, TGA) store
+    their last row first.
+    """
+    x0, ty0, x1, ty1 = tile.extents
+    a, b = max(ty0, y0), min(ty1, y1)
+    if a >= b:
+        return None
+    rawmode, stride, orientation = (tile.args, 0, 1) if isinstance(tile.args, str) else tile.args
+    stride = stride or -(-(x1 - x0) * RAW_BITS[rawmode] // 8)
+    skip = (a - ty0) if orientation >= 0 else (ty1 - b)
+    return tile._replace(extents=(x0, a - y0, x1, b - y0), offset=tile.offset + skip * stride,
+                         args=(rawmode, stride, orientation))
+
+
+def _sliceable(img):
+    """
+    True when every decoder tile is uncompressed pixel data we can cut by
+    row, and the loader won't rotate it (TIFF applies EXIF orientation).
+    """
+    def raw_mode(tile):
+        return tile.args if isinstance(tile.args, str) else tile.args[0]
+    if img.getexif().get(0x0112, 1) != 1:
+        return False
+    return bool(img.tile) and all(t.codec_name == "raw" and raw_mode(t) in RAW_BITS for t in img.tile)
+
+
+class BandReader:
+    """
+    A very large image, read in horizontal bands so memory stays bounded.
+
+    Uncompressed layouts (BMP, PPM/PGM, uncompressed TIFF and TGA) are
+    decoded one band at a time straight from the file ("bands"). PIL can
+    only decode other formats whole: JPEGs over DRAFT_MAX_PIXELS are decoded
+    at a reduced DCT scale ("draft", `size` is then the reduced size and
+    `scale` the factor), and everything else (PNG, WebP, compressed TIFF)
+    at full size ("full"), which costs memory proportional to the image.
+    """
+
+    def __init__(self, path, draft_max_pixels=None):
+        self.path = path
+        draft_max_pixels = draft_max_pixels or DRAFT_MAX_PIXELS
+        img = open_image(path)
+        self.format, self.scale, self._img = img.format, 1, None
+        if _sliceable(img):
+            self.decode = "bands"
+            self.size, self._tiles = img.size, img.tile
+            img.close()
+            return
+        self.decode = "full"
+        pixels = img.width * img.height
+        if img.format == "JPEG" and pixels > draft_max_pixels:
+            # Smallest DCT scale that fits the budget; JPEG can't go below 1/8
+            k = next((k for k in (2, 4, 8) if pixels / k ** 2 <= draft_max_pixels), 8)
+            img.draft(img.mode, (math.ceil(img.width / k), math.ceil(img.height / k)))
+            self.decode, self.scale = "draft", k
+        img.load()
+        self._img, self.size = img, img.size
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def rows(self, y0, y1):
+        """Rows [y0, y1) as an image; in "bands" mode only these rows are read."""
+        if self._img is not None:
+            return self._img.crop((0, y0, self.width, y1))
+        band = Image.open(self.path)  # parses the header only
+        band._size = (self.width, y1 - y0)
+        if hasattr(band, "_tile_size"):  # TIFF allocates its buffer from this
+            band._tile_size = band._size
+        band.tile = [t for t in (_raw_band(t, y0, y1) for t in self._tiles) if t is not None]
+        band.load()
+        return band
+
+    def bands(self, rows=BAND_ROWS):
+        """Yield (y, band image) from the top down."""
+        for y in range(0, self.height, rows):
+            yield y, self.rows(y, min(y + rows, self.height))
+
+    def reduced(self, max_side):
+        """An RGB copy with its longest side at most `max_side`, built band by band."""
+        # Integer reduce() to just above max_side, then resample the rest as thumbnail() does
+        f = max(1, max(self.size) // max_side)
+        out = Image.new("RGB", (-(-self.width // f), -(-self.height // f)))
+        # Bands a multiple of f rows tall, so reduce() boxes never straddle two bands
+        for y, band in self.bands(f * max(1, BAND_ROWS // f)):
+            out.paste(band.convert("RGB").reduce(f), (0, y // f))
+        out.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+        return out
+
+    def close(self):
+        if self._img is not None:
+            self._img.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DecodedImage:
+    """
+    Per-request decoded image shared by every image analyzer.
+
+    `rgb` is the full-resolution (H, W, 3) uint8 array (None when opened
+    with full=False), `working` a copy whose longest side is at most
+    WORKING_MAX_SIDE. When full resolution isn't needed only the working
+    copy is made: JPEGs are decoded at reduced scale (draft(), skipping most
+    of the IDCT work), large uncompressed images are reduced band by band
+    (BandReader) and other formats are reduced in their native mode, so
+    the only RGB conversion is of the small copy.
+    """
+
+    def __init__(self, rgb, working, fmt, mode, size, n_frames, exif, info):
+        self.rgb = rgb
+        self.working = working
+        self.format = fmt
+        self.mode = mode
+        self.size = size
+        self.n_frames = n_frames
+        self.exif = exif
+        self.info = info
+
+    @classmethod
+    def open(cls, path, full=True, working_max_side=WORKING_MAX_SIDE):
+        box = (working_max_side, working_max_side)
+        with open_image(path) as img:
+            fmt, mode, size = img.format, img.mode, img.size
+            n_frames = getattr(img, "n_frames", 1)
+            exif = exif_dict(img)
+            info = {k: v for k, v in img.info.items() if isinstance(v, (str, int, float, tuple))}
+
+            if full:
+                work_img = img.convert("RGB")
+                rgb = np.asarray(work_img)
+            elif _sliceable(img) and size[0] * size[1] > working_max_side ** 2 * 16:
+                # Large uncompressed image: reduce it band by band rather than load it whole
+                with BandReader(path) as reader:
+                    work_img = reader.reduced(working_max_side)
+                rgb = None
+            else:
+                # thumbnail() drafts JPEGs and reduce()s everything else in place
+                try:
+                    img.thumbnail(box, Image.Resampling.BILINEAR)
+                    work_img = img.convert("RGB")
+                except ValueError:  # modes reduce() doesn't support
+                    work_img = img.convert("RGB")
+                rgb = None
+
+        # thumbnail() swaps in a new buffer, so `rgb` (already a copy) is unaffected
+        work_img.thumbnail(box, Image.Resampling.BILINEAR)
+        return cls(rgb, np.asarray(work_img), fmt, mode, size, n_frames, exif, info)
+
+    def describe(self):
+        """Format information for reports."""
+        return {
+            "format": self.format,
+            "mode": self.mode,
+            "width": self.size[0],
+            "height": self.size[1],
+            "frames": self.n_frames,
+            "has_exif": bool(self.exif),
+        }
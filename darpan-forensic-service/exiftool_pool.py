@@ -0,0 +1,213 @@
+#exiftool_pool
+import json
+import os
+import queue
+import select
+import subprocess
+import threading
+import time
+
+EXIFTOOL_BIN = os.environ.get("DARPAN_EXIFTOOL_BIN", "exiftool")
+POOL_SIZE = int(os.environ.get("DARPAN_EXIFTOOL_WORKERS", "2"))
+REQUEST_TIMEOUT = float(os.environ.get("DARPAN_TIMEOUT_EXIFTOOL", "30"))
+# Recycle a daemon after this many requests to bound Perl memory growth
+MAX_REQUESTS_PER_WORKER = int(os.environ.get("DARPAN_EXIFTOOL_MAX_REQUESTS", "500"))
+
+
+class ExifToolError(RuntimeError):
+    pass
+
+
+# -----------------------------
+# One long-lived exiftool daemon
+# -----------------------------
+class ExifToolWorker:
+    """
+    Wraps `exiftool -stay_open True -@ -`. Arguments are written one per line
+    to stdin and each batch is terminated by `-executeN`; exiftool answers on
+    stdout followed by a `{readyN}` marker, so responses are matched to
+    requests by sequence number.
+    """
+
+    def __init__(self, exe=EXIFTOOL_BIN):
+        self.exe = exe
+        self.proc = None
+        self.seq = 0
+        self.requests = 0
+        self.started_at = None
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.exe, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        self.requests = 0
+        self.started_at = time.time()
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def execute(self, args, timeout=REQUEST_TIMEOUT):
+        """Send one batch of arguments and return exiftool's raw stdout."""
+        if not self.alive():
+            self.start()
+        for a in args:
+            if "\n" in a:
+                raise ValueError("exiftool arguments cannot contain newlines")
+        self.seq += 1
+        payload = "\n".join(list(args) + [f"-execute{self.seq}", ""])
+        try:
+            self.proc.stdin.write(payload.encode("utf-8"))
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise ExifToolError(f"exiftool daemon died: {e}")
+        out = self._read_until(f"{{ready{self.seq}}}".encode(), time.monotonic() + timeout)
+        self.requests += 1
+        return out.decode("utf-8", errors="ignore").strip()
+
+    def _read_until(self, marker, deadline):
+        fd = self.proc.stdout.fileno()
+        buf = bytearray()
+        while True:
+            idx = buf.find(marker)
+            if idx != -1:
+                return bytes(buf[:idx])
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # A hung daemon can't be resynchronised reliably; replace it.
+                self.kill()
+                raise TimeoutError("exiftool timed out")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                self.kill()
+                raise ExifToolError("exiftool daemon exited unexpectedly")
+            buf += chunk
+
+    def close(self, timeout=2):
+        if not self.alive():
+            return
+        try:
+            self.proc.stdin.write(b"-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=timeout)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+
+
+# -----------------------------
+# Pool
+# -----------------------------
+class ExifToolPool:
+    """
+    Fixed-size pool of exiftool daemons. Concurrent callers are spread over
+    the workers; a worker that hangs or dies is replaced on its next use.
+    Thread-safe, so it can be driven from asyncio via to_thread.
+    """
+
+    def __init__(self, size=POOL_SIZE, exe=EXIFTOOL_BIN):
+        self.size = max(1, size)
+        self.exe = exe
+        self._idle = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(ExifToolWorker(exe))
+        self.restarts = 0
+        self.served = 0
+
+    def execute(self, args, timeout=REQUEST_TIMEOUT):
+        worker = self._idle.get()
+        try:
+            if worker.requests >= MAX_REQUESTS_PER_WORKER:
+                worker.close()
+                worker.proc = None
+            if not worker.alive():
+                if worker.proc is not None:
+                    self.restarts += 1
+                worker.start()
+            out = worker.execute(args, timeout=timeout)
+            self.served += 1
+            return out
+        finally:
+            self._idle.put(worker)
+
+    def extract(self, filepath, timeout=REQUEST_TIMEOUT):
+        """
+        Metadata for one file as a dict (exiftool -j). Falls back to
+        {"raw": output} when the output isn't JSON, or {"error": ...}.
+        """
+        try:
+            out = self.execute(["-j", str(filepath)], timeout=timeout)
+        except (ExifToolError, TimeoutError, OSError, ValueError) as e:
+            return {"error": str(e)}
+        try:
+            data = json.loads(out)
+            return data[0] if isinstance(data, list) and data else {}
+        except Exception:
+            return {"raw": out}
+
+    def health_check(self, timeout=5):
+        """Ping every idle worker with -ver; restart any that are hung or dead."""
+        checked = []
+        for _ in range(self.size):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break  # busy workers are, by definition, responding to someone
+            checked.append(worker)
+            if worker.proc is None:
+                continue  # never started; nothing to check
+            try:
+                worker.execute(["-ver"], timeout=timeout)
+            except Exception:
+                self.restarts += 1
+                worker.kill()
+                try:
+                    worker.start()
+                except OSError:
+                    pass
+        for worker in checked:
+            self._idle.put(worker)
+        return self.stats()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "served": self.served,
+            "restarts": self.restarts,
+        }
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExifToolPool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
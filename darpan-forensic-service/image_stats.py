@@ -0,0 +1,104 @@
+#image_stats
+import numpy as np
+from PIL import Image
+
+from decoded_image import open_image
+
+# Rows processed per block when accumulating statistics, so temporaries stay
+# proportional to the image width rather than the pixel count.
+ROWS_PER_BLOCK = 256
+
+CHANNELS = ("R", "G", "B")
+PAIRS = (("R-G_corr", 0, 1), ("R-B_corr", 0, 2), ("G-B_corr", 1, 2))
+LEVELS = np.arange(256, dtype=np.int64)
+
+
+# -----------------------------
+# Decoding
+# -----------------------------
+def load_rgb(image_path):
+    """Decode an image once into an (H, W, 3) uint8 array."""
+    with open_image(image_path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+# -----------------------------
+# Statistics
+# -----------------------------
+def entropy_from_hist(hist):
+    """Shannon entropy (bits) of a histogram."""
+    total = hist.sum()
+    if total == 0:
+        return 0.0
+    p = hist[hist > 0] / total
+    return float(-np.sum(p * np.log2(p)))
+
+
+class StatsAccumulator:
+    """
+    Incrementally aggregates grayscale/per-channel histograms and the
+    inter-channel product sums over blocks of RGB pixels.
+
+    Histograms come from PIL's C histogram (grayscale via convert("L"), so
+    values match the previous implementation exactly); channel products are
+    exact integer sums, so correlations don't lose precision on large images.
+    """
+
+    def __init__(self):
+        self.gray_hist = np.zeros(256, dtype=np.int64)
+        self.channel_hists = np.zeros((3, 256), dtype=np.int64)
+        self.cross = {name: 0 for name, _, _ in PAIRS}
+
+    def update(self, block):
+        """Add an (h, w, 3) uint8 block of pixels."""
+        if not block.size:
+            return
+        img = Image.fromarray(np.ascontiguousarray(block), "RGB")
+        self.channel_hists += np.asarray(img.histogram(), dtype=np.int64).reshape(3, 256)
+        self.gray_hist += np.asarray(img.convert("L").histogram(), dtype=np.int64)
+        for name, i, j in PAIRS:
+            # 255 * 255 fits in uint16; accumulate in uint64 then Python int
+            prod = np.multiply(block[..., i], block[..., j], dtype=np.uint16)
+            self.cross[name] += int(prod.sum(dtype=np.uint64))
+
+    @property
+    def count(self):
+        return int(self.gray_hist.sum())
+
+    def correlations(self):
+        # A flat channel (black frame, solid fill) has no defined correlation;
+        # report 0.0 rather than NaN, which JSON and the scores can't carry
+        n = self.count
+        if not n:
+            return {name: 0.0 for name, _, _ in PAIRS}
+        sums = (self.channel_hists @ LEVELS).astype(np.float64)
+        sumsq = (self.channel_hists @ (LEVELS * LEVELS)).astype(np.float64)
+        mean = sums / n
+        std = np.sqrt(np.clip(sumsq / n - mean * mean, 0.0, None))
+        out = {}
+        for name, i, j in PAIRS:
+            cov = self.cross[name] / n - mean[i] * mean[j]
+            denom = std[i] * std[j]
+            out[name] = float(np.clip(cov / denom, -1.0, 1.0)) if denom > 0 else 0.0
+        return out
+
+    def result(self):
+        return {
+            "pixels": self.count,
+            "gray_histogram": self.gray_hist,
+            "channel_histograms": dict(zip(CHANNELS, self.channel_hists)),
+            "gray_entropy": entropy_from_hist(self.gray_hist),
+            "channel_entropies": {c: entropy_from_hist(h) for c, h in zip(CHANNELS, self.channel_hists)},
+            "correlations": self.correlations(),
+        }
+
+
+def compute_image_stats(rgb, rows_per_block=ROWS_PER_BLOCK):
+    """
+    Histograms, entropies and inter-channel correlation of a decoded RGB array,
+    computed in row blocks (no per-pixel Python objects).
+    """
+    acc = StatsAccumulator()
+    for y in range(0, rgb.shape[0], rows_per_block):
+        acc.update(rgb[y:y + rows_per_block])
+    return acc.result()
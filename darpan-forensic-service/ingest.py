@@ -0,0 +1,123 @@
+#ingest
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+
+import magic
+from fastapi import HTTPException
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("DARPAN_MAX_UPLOAD_MB", "100")) * 1024 * 1024)
+CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 8192
+# Allowance for multipart boundaries, headers and small form fields on top of
+# the file itself when limiting the raw request body
+FORM_OVERHEAD_BYTES = 64 * 1024
+FALLBACK_NAME = "upload.bin"
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware rejecting request bodies over `max_bytes` with 413 while
+    they arrive, before Starlette has spooled them: up front when the
+    Content-Length says so, otherwise as soon as the streamed body crosses
+    the limit (FastAPI re-raises HTTPExceptions from body parsing).
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            body = f'{{"detail":"Request body exceeds {self.max_bytes} bytes"}}'.encode()
+            await send({"type": "http.response.start", "status": 413,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"connection", b"close")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {self.max_bytes} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def safe_filename(name):
+    """The client's file name reduced to a plain name that is safe to create in a temp dir."""
+    name = os.path.basename((name or "").replace("\\", "/")).strip()
+    if name in ("", ".", "..") or "\0" in name:
+        return FALLBACK_NAME
+    if len(name.encode("utf-8")) > 200:
+        suffix = Path(name).suffix
+        return "upload" + (suffix if len(suffix) <= 16 else "")
+    return name
+
+
+def _write_chunk(f, h, chunk):
+    h.update(chunk)
+    f.write(chunk)
+
+
+def sniff_mime(head, fallback=None):
+    try:
+        return magic.from_buffer(head, mime=True)
+    except Exception:
+        return fallback or "unknown/unknown"
+
+
+async def stream_upload(upload, dest_dir, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Stream an UploadFile to `dest_dir` in chunks, hashing as it is written.
+
+    Returns {"path", "filename", "sha256", "size", "mime"}; the MIME type is
+    sniffed from the first bytes rather than trusted from the client. Files
+    larger than `max_bytes` are rejected with 413 and the partial copy is
+    removed. By now Starlette has already spooled the request body, so
+    oversized requests are cut off earlier, while they arrive, by
+    UploadLimitMiddleware.
+    """
+    filename = safe_filename(upload.filename)
+    path = Path(dest_dir) / filename
+    h = hashlib.sha256()
+    head = b""
+    size = 0
+
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            await asyncio.to_thread(_write_chunk, f, h, chunk)
+        await asyncio.to_thread(f.close)
+    except BaseException:
+        f.close()
+        path.unlink(missing_ok=True)
+        raise
+
+    return {
+        "path": path,
+        "filename": filename,
+        "sha256": h.hexdigest(),
+        "size": size,
+        "mime": sniff_mime(head, upload.content_type),
+    }
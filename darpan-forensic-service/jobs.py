@@ -0,0 +1,126 @@
+#jobs
+import asyncio
+import os
+import shutil
+import time
+import traceback
+import uuid
+
+JOB_WORKERS = int(os.environ.get("DARPAN_JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.environ.get("DARPAN_JOB_QUEUE", "32"))
+JOB_TTL_S = int(os.environ.get("DARPAN_JOB_TTL", "3600"))
+MAX_WAIT_S = 30
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Submit/poll execution of forensic analyses.
+
+    submit() returns a job id immediately; at most `workers` analyses run
+    at once and at most `queue_limit` jobs may be pending or running.
+    Analyses report partial results per stage, which pollers see as soon as
+    they arrive; wait() long-polls until the job changes or times out.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT, ttl_s=JOB_TTL_S):
+        self._slots = asyncio.Semaphore(workers)
+        self.queue_limit = queue_limit
+        self.ttl_s = ttl_s
+        self._jobs = {}
+        self._changed = {}
+        self._tasks = set()  # the loop only keeps weak references to running tasks
+
+    # ---------- Submit ----------
+    def submit(self, analyze, upload, tmp_dir):
+        """
+        Queue `analyze(upload, progress=...)`; `tmp_dir` is removed when it
+        finishes. Raises QueueFull when the backlog limit is reached.
+        """
+        self._prune()
+        active = sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+        if active >= self.queue_limit:
+            raise QueueFull(f"{active} jobs pending")
+
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "file_name": upload["filename"],
+            "file_sha256": upload["sha256"],
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "partial": {},
+            "result": None,
+            "error": None,
+        }
+        self._changed[job_id] = asyncio.Event()
+        task = asyncio.ensure_future(self._run(job_id, analyze, upload, tmp_dir))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id, analyze, upload, tmp_dir):
+        job = self._jobs[job_id]
+        try:
+            async with self._slots:
+                self._update(job_id, status="running", started_at=time.time())
+
+                def progress(stage, data):
+                    job["partial"][stage] = data
+                    self._notify(job_id)
+
+                result = await analyze(upload, progress=progress)
+            self._update(job_id, status="done", result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"[!] Job {job_id} failed: {e}")
+            print(traceback.format_exc())
+            self._update(job_id, status="error", error=str(e), finished_at=time.time())
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ---------- Poll ----------
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id, timeout):
+        """Return the job once it changes (or is already finished), or after `timeout` s."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in ("done", "error") or timeout <= 0:
+            return dict(job)
+        event = self._changed[job_id]
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(timeout, MAX_WAIT_S))
+        except asyncio.TimeoutError:
+            pass
+        return self.get(job_id)
+
+    # ---------- Internals ----------
+    def _update(self, job_id, **fields):
+        self._jobs[job_id].update(fields)
+        self._notify(job_id)
+
+    def _notify(self, job_id):
+        # Wake current waiters; later waiters block on a fresh event
+        self._changed[job_id].set()
+        self._changed[job_id] = asyncio.Event()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_s
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+            del self._changed[job_id]
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"jobs": counts, "queue_limit": self.queue_limit}
@@ -0,0 +1,212 @@
+#lsb_stego
+"""
+Vectorised LSB steganalysis on a decoded RGB array, plus MIME-based
+dispatch for the external stego tools.
+
+- Bit planes: fraction of set bits in the two lowest planes per channel.
+- Chi-square attack (Westfeld & Pfitzmann): LSB replacement equalises the
+  counts of each value pair (2k, 2k+1); run over growing prefixes of the
+  image to catch sequential embedding.
+- RS analysis (Fridrich et al.): estimates the embedded fraction from how
+  LSB flipping changes the noisiness of 4-pixel groups.
+"""
+import math
+import os
+
+import numpy as np
+
+from decoded_image import open_image
+
+# Only the first rows up to this many pixels are analysed (cropping keeps
+# LSBs intact, unlike resizing).
+MAX_PIXELS = int(os.environ.get("DARPAN_STEGO_MAX_PIXELS", str(4_000_000)))
+CHI_SEGMENTS = 10
+# RS estimates below this are within the method's error on clean images
+RS_THRESHOLD = 0.1
+RS_MASK = np.array([0, 1, 1, 0], dtype=np.int16)
+
+# Formats whose decoded pixels are the stored pixels. In lossy formats the
+# payload lives in DCT coefficients, so pixel LSBs say nothing.
+LOSSLESS_FORMATS = {"PNG", "BMP", "TIFF", "GIF", "PPM", "TGA", "ICO"}
+
+# Which external tool can possibly apply to which MIME type
+TOOL_MIME_TYPES = {
+    "steghide": {"image/jpeg", "image/bmp", "image/x-ms-bmp", "audio/wav", "audio/x-wav", "audio/basic"},
+    "zsteg": {"image/png", "image/bmp", "image/x-ms-bmp"},
+}
+
+
+def stego_tools_for(mime, filepath):
+    """{tool: argv} for the external stego tools that support `mime`."""
+    argv = {
+        "steghide": ["steghide", "info", "-p", "", str(filepath)],
+        "zsteg": ["zsteg", str(filepath)],
+    }
+    return {name: argv[name] for name, mimes in TOOL_MIME_TYPES.items() if mime in mimes}
+
+
+# -----------------------------
+# Statistics
+# -----------------------------
+def _chi2_sf(x, df):
+    """Chi-square survival function (Wilson-Hilferty approximation)."""
+    if df <= 0:
+        return 1.0
+    h = 2.0 / (9.0 * df)
+    z = ((x / df) ** (1.0 / 3.0) - (1.0 - h)) / math.sqrt(h)
+    return 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def bit_plane_stats(rgb):
+    """{"R": {"lsb_ones": .., "bit1_ones": ..}, ...}: share of set bits per plane."""
+    out = {}
+    for i, ch in enumerate("RGB"):
+        plane = rgb[..., i]
+        out[ch] = {
+            "lsb_ones": round(float(np.count_nonzero(plane & 1)) / plane.size, 4),
+            "bit1_ones": round(float(np.count_nonzero(plane & 2)) / plane.size, 4),
+        }
+    return out
+
+
+def chi_square_attack(channel, segments=CHI_SEGMENTS):
+    """
+    Embedding probability from the pair-of-values test over the first
+    1/segments, 2/segments, ... of the channel (row order).
+    """
+    flat = channel.reshape(-1)
+    bounds = np.linspace(0, flat.size, segments + 1, dtype=np.int64)[1:]
+    # One bincount per segment, accumulated into prefix histograms
+    seg_hists = np.stack([np.bincount(flat[a:b], minlength=256)
+                          for a, b in zip(np.r_[0, bounds[:-1]], bounds)])
+    prefix = np.cumsum(seg_hists, axis=0).astype(np.float64)
+
+    even, odd = prefix[:, 0::2], prefix[:, 1::2]
+    expected = (even + odd) / 2.0
+    valid = expected > 4  # standard minimum expected count
+    terms = np.where(valid, (even - expected) ** 2 / np.where(valid, expected, 1), 0.0)
+    stats = terms.sum(axis=1)
+    dfs = valid.sum(axis=1) - 1
+    return [round(_chi2_sf(s, int(df)), 4) for s, df in zip(stats, dfs)]
+
+
+def _flip(x, direction):
+    if direction == 1:
+        return x ^ 1                      # F1: 2k <-> 2k+1
+    return ((x + 1) ^ 1) - 1              # F-1: 2k-1 <-> 2k
+
+
+def _rs_counts(groups, mask):
+    """Share of regular / singular groups after flipping under `mask`."""
+    f0 = np.abs(np.diff(groups, axis=1)).sum(axis=1)
+    flipped = groups.copy()
+    for j, m in enumerate(mask):
+        if m:
+            flipped[:, j] = _flip(groups[:, j], int(m))
+    f1 = np.abs(np.diff(flipped, axis=1)).sum(axis=1)
+    n = len(groups)
+    return np.count_nonzero(f1 > f0) / n, np.count_nonzero(f1 < f0) / n
+
+
+def rs_analysis(channel):
+    """Estimated embedded fraction (0..1) of one channel by RS analysis."""
+    h, w = channel.shape
+    w4 = w - w % 4
+    if h == 0 or w4 == 0:
+        return None
+    groups = channel[:, :w4].astype(np.int16).reshape(-1, 4)
+    inverted = groups ^ 1
+
+    r_m, s_m = _rs_counts(groups, RS_MASK)
+    r_nm, s_nm = _rs_counts(groups, -RS_MASK)
+    r_mi, s_mi = _rs_counts(inverted, RS_MASK)
+    r_nmi, s_nmi = _rs_counts(inverted, -RS_MASK)
+
+    d0, d1 = r_m - s_m, r_mi - s_mi
+    dn0, dn1 = r_nm - s_nm, r_nmi - s_nmi
+    a = 2 * (d1 + d0)
+    b = dn0 - dn1 - d1 - 3 * d0
+    c = d0 - dn0
+    if abs(a) < 1e-12:
+        z = -c / b if abs(b) > 1e-12 else 0.0
+    else:
+        disc = b * b - 4 * a * c
+        if disc < 0:
+            return 0.0
+        roots = ((-b + math.sqrt(disc)) / (2 * a), (-b - math.sqrt(disc)) / (2 * a))
+        z = min(roots, key=abs)
+    if abs(z - 0.5) < 1e-12:
+        return None
+    return round(float(min(max(z / (z - 0.5), 0.0), 1.0)), 4)
+
+
+# -----------------------------
+# Entry points
+# -----------------------------
+def analyze_lsb(rgb, fmt=None):
+    """
+    LSB steganalysis of an (H, W, 3) uint8 array. Returns
+    {"applicable", "pixels_analysed", "bit_planes", "chi_square", "rs_estimate",
+    "suspicious", "summary"}.
+    """
+    if fmt and fmt.upper() not in LOSSLESS_FORMATS:
+        return {"applicable": False,
+                "summary": f"LSB analysis skipped: {fmt} is lossy, pixel LSBs carry no payload."}
+
+    rows = max(1, min(rgb.shape[0], MAX_PIXELS // max(rgb.shape[1], 1)))
+    region = rgb[:rows]
+
+    chi = {ch: chi_square_attack(region[..., i]) for i, ch in enumerate("RGB")}
+    rs = {ch: rs_analysis(region[..., i]) for i, ch in enumerate("RGB")}
+    # Sequential embedding keeps the early prefixes near p=1. Smooth
+    # histograms also score high there, so the verdict rests on RS and the
+    # chi-square result is reported as supporting evidence.
+    chi_early = max(v[0] for v in chi.values())
+    rs_max = max((v for v in rs.values() if v is not None), default=0.0)
+    suspicious = rs_max >= RS_THRESHOLD
+
+    if suspicious:
+        summary = (f"LSB embedding suspected: RS estimate up to {rs_max:.0%} of pixels "
+                   f"(chi-square p={chi_early:.2f} on the first {100 // CHI_SEGMENTS}%).")
+    else:
+        summary = f"No LSB embedding detected (chi-square p={chi_early:.2f}, RS estimate {rs_max:.0%})."
+    return {
+        "applicable": True,
+        "pixels_analysed": int(region.shape[0] * region.shape[1]),
+        "bit_planes": bit_plane_stats(region),
+        "chi_square": chi,
+        "rs_estimate": rs,
+        "suspicious": suspicious,
+        "summary": summary,
+    }
+
+
+def analyze_lsb_file(filepath):
+    """analyze_lsb for callers that haven't decoded the image yet."""
+    try:
+        with open_image(filepath) as img:
+            fmt = img.format
+            if fmt not in LOSSLESS_FORMATS:
+                return analyze_lsb(None, fmt)
+            rgb = np.asarray(img.convert("RGB"))
+    except Exception as e:
+        return {"applicable": False, "summary": f"LSB analysis skipped: {e}"}
+    return analyze_lsb(rgb, fmt)
+
+
+def stego_report(lsb, tool_results):
+    """
+    Combine the LSB analysis with the external tools' outputs:
+    {"summary", "lsb", "tools": {name: output}}.
+    """
+    parts = [lsb["summary"]]
+    for name, result in tool_results.items():
+        output = result["output"].strip()
+        parts.append(f"{name}: {output.splitlines()[0] if output else 'no output'}")
+    if not tool_results:
+        parts.append("No external stego tool applies to this file type.")
+    return {
+        "summary": " ".join(parts),
+        "lsb": lsb,
+        "tools": {name: result["output"] for name, result in tool_results.items()},
+    }
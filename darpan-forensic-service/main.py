@@ -1,29 +1,96 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import FileResponse
-import hashlib, os, tempfile, subprocess, json, math
-from pathlib import Path
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
+import asyncio, hmac, os, shutil, tempfile, json, time
 from datetime import datetime
-from PIL import Image
-from report_generator import build_pdf_report, build_json_report
-from scatter_analysis import analyze_image_scatter  # 🆕 new import
+from ingest import stream_upload, UploadLimitMiddleware
+from plugins import warm_up, stats as plugin_stats
+from cpu_pool import shutdown_executor, warm_pool
+from analyzers import Pipeline, AnalyzerError
+from exiftool_pool import get_pool as get_exiftool_pool, shutdown_pool as shutdown_exiftool_pool
+from result_cache import ResultCache
+from artifact_store import ArtifactStore, artifact_refs
+from case_store import CaseStore
+from pdf_reports import PdfReports
+from jobs import JobManager, QueueFull
+from phash_index import PHashIndex, KNOWN_FAKE, ANALYSED, DEFAULT_RADIUS as PHASH_RADIUS
 
 app = FastAPI(title="DARPAN Forensic Service")
+app.add_middleware(UploadLimitMiddleware)
+result_cache = ResultCache()
+case_store = CaseStore()
+artifact_store = ArtifactStore()
+pdf_reports = PdfReports(case_store, artifact_store)
+jobs = JobManager()
+phash_index = PHashIndex()
 
-# ---------- Utility ----------
-def sha256sum(file_path):
-    h = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            h.update(chunk)
-    return h.hexdigest()
+EXIFTOOL_HEALTH_INTERVAL_S = int(os.environ.get("DARPAN_EXIFTOOL_HEALTH_INTERVAL", "60"))
+CASE_GC_INTERVAL_S = int(os.environ.get("DARPAN_CASE_GC_INTERVAL", "600"))
+# Bearer token for admin endpoints (registering known fakes); unset disables them
+ADMIN_TOKEN = os.environ.get("DARPAN_ADMIN_TOKEN", "")
+# Skip the full pipeline for near-duplicates of registered known fakes
+PHASH_SHORT_CIRCUIT = os.environ.get("DARPAN_PHASH_SHORT_CIRCUIT", "1") == "1"
+# Preload analyzers, the CPU pool and exiftool in the background after startup
+WARMUP = os.environ.get("DARPAN_WARMUP", "1") == "1"
+# Origins allowed to GET artifacts and report downloads from a browser (the
+# ai-engine hands the frontend absolute links to them), comma-separated
+CORS_ORIGINS = [o.strip() for o in os.environ.get("DARPAN_CORS_ORIGINS", "*").split(",") if o.strip()]
+app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_methods=["GET"], allow_headers=["*"])
+# Services the analyzers may use (see analyzers.Analyzer.services)
+SERVICES = {"artifacts": artifact_store, "phash_index": phash_index}
+# What a full report asks for; analyzers that don't apply to the upload are skipped
+REPORT_ANALYZERS = ["exiftool", "signatures", "stego", "ai_detection", "image", "hashes", "near_duplicates",
+                    "timeline", "frame_scatter"]
 
 
-def run_cmd(cmd, timeout=30):
-    """Safely run CLI commands like exiftool/binwalk/steghide."""
-    try:
-        return subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout).stdout.strip()
-    except subprocess.TimeoutExpired:
-        return f"{cmd.split()[0]} timed out"
+# ---------- Lifecycle ----------
+async def _exiftool_health_loop():
+    while True:
+        await asyncio.sleep(EXIFTOOL_HEALTH_INTERVAL_S)
+        await asyncio.to_thread(get_exiftool_pool().health_check)
+
+
+async def _case_gc_loop():
+    while True:
+        await asyncio.to_thread(case_store.gc)
+        await asyncio.to_thread(artifact_store.gc)
+        await asyncio.sleep(CASE_GC_INTERVAL_S)
+
+
+async def _warm_up():
+    """
+    Runs once the server is accepting requests: imports the analyzer plugins
+    in this process, starts the pool workers (importing them there too) and
+    the exiftool process, so the first upload doesn't pay for any of it.
+    """
+    start = time.perf_counter()
+    timings = {}
+    timings["plugins_s"] = await asyncio.to_thread(lambda: round(sum(warm_up().values()), 3))
+    t = time.perf_counter()
+    timings["cpu_workers"] = await warm_pool()
+    timings["cpu_pool_s"] = round(time.perf_counter() - t, 3)
+    t = time.perf_counter()
+    await asyncio.to_thread(get_exiftool_pool)
+    timings["exiftool_s"] = round(time.perf_counter() - t, 3)
+    timings["total_s"] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+@app.on_event("startup")
+async def startup():
+    app.state.exiftool_health = asyncio.create_task(_exiftool_health_loop())
+    app.state.case_gc = asyncio.create_task(_case_gc_loop())
+    app.state.warm_up = asyncio.create_task(_warm_up()) if WARMUP else None
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.exiftool_health.cancel()
+    app.state.case_gc.cancel()
+    if app.state.warm_up is not None:
+        app.state.warm_up.cancel()
+    shutdown_executor()
+    await asyncio.to_thread(shutdown_exiftool_pool)
 
 
 # ---------- Core Analysis ----------
@@ -31,79 +98,299 @@ def run_cmd(cmd, timeout=30):
 async def analyze_media_forensics(file: UploadFile = File(...)):
     """Analyze a media file using EXIF, Binwalk, Steghide, AI heuristics, and scatter analysis."""
     tmp_dir = tempfile.mkdtemp(prefix="darpan_")
-    file_path = Path(tmp_dir) / file.filename
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    try:
+        upload = await stream_upload(file, tmp_dir)
+        return await run_analysis(upload)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
 
-    case_id = "DFP-" + sha256sum(file_path)[:12]
+async def run_analysis(upload, progress=None):
+    """
+    Full forensic pass over an ingested upload (see ingest.stream_upload).
+    `progress(stage, data)`, if given, receives partial results as stages finish.
+    """
+    progress = progress or (lambda stage, data: None)
+    file_sha256 = upload["sha256"]
+    case_id = "DFP-" + file_sha256[:12]
     start_time = datetime.utcnow()
 
-    # Run forensic tools
-    meta = run_cmd(f"exiftool {file_path}")
-    binwalk_data = run_cmd(f"binwalk {file_path}")
-    steghide_data = run_cmd(f"steghide info '{file_path}'")
-
-    # --- AI Detection (Entropy-based) ---
-    with Image.open(file_path) as img:
-        gray = img.convert("L")
-        pixels = list(gray.getdata())
-        histogram = [0]*256
-        for p in pixels:
-            histogram[p] += 1
-        total = len(pixels)
-        entropy = -sum((h/total)*math.log2(h/total) for h in histogram if h != 0)
-        ai_score = round(min(entropy / 16, 1.0), 2)
-
-    # --- Scatter Analysis (FFT + correlations) ---
-    scatter_results = analyze_image_scatter(str(file_path))
+    # --- Re-submitted content: serve the stored report ---
+    cached, tier = result_cache.get(file_sha256)
+    # ...unless a known fake matching it was registered since it was made
+    if cached is not None and new_known_fakes(cached):
+        cached = None
+    # ...or an artifact it references has since been garbage-collected
+    if cached is not None and all([artifact_store.touch(ref) for ref in artifact_refs(cached)]):
+        if case_store.lookup(case_id, "json") is None:
+            # The case files outlived their TTL: write them back so report_urls resolve
+            await asyncio.to_thread(persist_case, cached)
+        else:
+            case_store.register(case_id, file_sha256)  # refresh the case TTL
+        cached["cache"] = tier
+        return cached
+
+    def on_result(name, data):
+        if name in PARTIALS:
+            progress(*PARTIALS[name](data))
+
+    # --- Analyzers that apply to this upload, scheduled by dependency ---
+    try:
+        async with await Pipeline.open(upload, services=SERVICES, on_result=on_result) as pipeline:
+            # Perceptual hashes first: recirculated known fakes stop here
+            results = await pipeline.run(["near_duplicates"])
+            known_fakes = results.get("near_duplicates", {}).get("known_fake")
+            if PHASH_SHORT_CIRCUIT and known_fakes and "decode" in results:
+                return await asyncio.to_thread(finish_known_fake, upload, case_id, start_time, results["decode"],
+                                               results["hashes"], results["near_duplicates"])
+            results = await pipeline.run(REPORT_ANALYZERS)
+    except AnalyzerError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
     # --- Build final result object ---
+    decoded, image = results.get("decode"), results.get("image")
     result = {
         "case_id": case_id,
         "generated_at": start_time.isoformat(),
-        "file_name": file.filename,
-        "file_sha256": sha256sum(file_path),
-        "mime": file.content_type,
-        "metadata": {"ExifTool": meta},
-        "binwalk": binwalk_data,
-        "steghide": steghide_data,
-        "ai_detection": {
-            "ai_score": ai_score,
-            "avg_entropy": round(entropy, 2)
-        },
-        "scatter_analysis": scatter_results,
+        "file_name": upload["filename"],
+        "file_sha256": file_sha256,
+        "file_size": upload["size"],
+        "mime": upload["mime"],
+        "media_kind": pipeline.kind,
+        "metadata": {"ExifTool": results.get("exiftool")},
+        "binwalk": results.get("signatures"),
+        "steghide": results.get("stego"),
+        "ai_detection": results.get("ai_detection"),
+        # Video / animated: spectrum and scores of the most synthetic-looking sampled frame
+        "scatter_analysis": image["scatter"] if image else results.get("frame_scatter"),
+        "timeline": results.get("timeline"),
+        "image_hashes": results.get("hashes"),
+        "near_duplicates": results.get("near_duplicates"),
+        "image_info": {**decoded.describe(), "tiled": decoded.tiled} if decoded else None,
+        "analyzers": pipeline.status,
+        "tool_timings_s": {**pipeline.timings(),
+                           **{name: r["wall_time_s"] for name, r in results.get("stego_tools", {}).items()}},
+        "report_urls": report_urls(case_id),
         "process_time_s": round((datetime.utcnow() - start_time).total_seconds(), 2)
     }
+    # Sections whose analyzers didn't apply (or failed; see "analyzers") are left out
+    result = {k: v for k, v in result.items() if v is not None}
 
-    # --- Save JSON report ---
-    json_path = Path(tmp_dir) / f"{case_id}.json"
+    # Moving media are indexed by their first sampled frame
+    frames = results.get("frames", {}).get("frames")
+    phash = results.get("hashes", {}).get("phash") or (frames[0]["phash"] if frames else None)
+    await asyncio.to_thread(save_report, result, phash)
+    pdf_reports.prerender(case_id, result)
+    return result
+
+
+# Analyzer results streamed to job pollers, as (report key, section)
+PARTIALS = {
+    "near_duplicates": lambda r: ("near_duplicates", r),
+    "exiftool": lambda r: ("metadata", {"ExifTool": r}),
+    "signatures": lambda r: ("binwalk", r),
+    "stego": lambda r: ("steghide", r),
+    "ai_detection": lambda r: ("ai_detection", r),
+    "image": lambda r: ("scatter_analysis", r["scatter"]),
+    "frame_scatter": lambda r: ("scatter_analysis", r),
+    "timeline": lambda r: ("timeline", r),
+}
+
+
+def new_known_fakes(report):
+    """
+    Registered known fakes near the report's pHashes (image, or sampled
+    frames) that the report doesn't list yet, as sha256s.
+    """
+    phashes = [(report.get("image_hashes") or {}).get("phash")]
+    phashes += [f.get("phash") for f in (report.get("timeline") or {}).get("frames", [])]
+    found = {m["sha256"] for phash in filter(None, phashes)
+             for m in phash_index.query(phash, PHASH_RADIUS, label=KNOWN_FAKE)}
+    return found - {m["sha256"] for m in (report.get("near_duplicates") or {}).get("known_fake", [])}
+
+
+def persist_case(result):
+    """Write the case JSON and register it; the PDF renders on first download."""
+    case_id = result["case_id"]
+    json_path = case_store.case_dir(case_id) / f"{case_id}.json"
     with open(json_path, "w") as f:
         json.dump(result, f, indent=2)
+    case_store.register(case_id, result["file_sha256"], {"json": json_path})
+    pdf_reports.invalidate(case_id)  # any PDF rendered so far shows the old JSON
 
-    # --- Generate PDF report ---
-    pdf_path = Path(tmp_dir) / f"{case_id}.pdf"
-    build_pdf_report(result, str(pdf_path))
 
+def save_report(result, phash=None):
+    """Persist a finished report: case files, cache, pHash index. Blocking; run it in a thread."""
+    case_id, file_sha256 = result["case_id"], result["file_sha256"]
+    persist_case(result)
+    result_cache.put(file_sha256, result)
+    if phash:
+        phash_index.add(phash, ANALYSED, sha256=file_sha256, case_id=case_id)
+
+
+def report_urls(case_id):
+    """Links to the rendered reports, which clients fetch only when needed."""
+    return {fmt: f"/download?case_id={case_id}&format={fmt}" for fmt in REPORT_MEDIA_TYPES}
+
+
+def finish_known_fake(upload, case_id, start_time, decoded, hashes, near_duplicates):
+    """
+    Report for a near-duplicate of a registered fake. Tools, FFT and the
+    entropy heuristic are skipped, so the report isn't put in the result
+    cache: a later full analysis of the same bytes should still be possible
+    once the fake registry changes.
+    """
+    result = {
+        "case_id": case_id,
+        "generated_at": start_time.isoformat(),
+        "file_name": upload["filename"],
+        "file_sha256": upload["sha256"],
+        "file_size": upload["size"],
+        "mime": upload["mime"],
+        "known_fake_match": near_duplicates["known_fake"][0],
+        "near_duplicates": near_duplicates,
+        "analysis_skipped": "near-duplicate of registered known manipulated media",
+        "image_hashes": hashes,
+        "image_info": decoded.describe(),
+        "report_urls": report_urls(case_id),
+        "process_time_s": round((datetime.utcnow() - start_time).total_seconds(), 2)
+    }
+    persist_case(result)
     return result
 
 
+# ---------- Known-fake registry ----------
+def require_admin(authorization):
+    """Admin endpoints need `Authorization: Bearer <DARPAN_ADMIN_TOKEN>`."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (DARPAN_ADMIN_TOKEN not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.post("/known-fakes", status_code=201)
+async def register_known_fake(file: UploadFile = File(...), note: str = Form(""),
+                              authorization: str = Header(None)):
+    """
+    Add an image to the near-duplicate index as known manipulated media.
+    Matching uploads are short-circuited to "known fake", so this is admin-only.
+    """
+    require_admin(authorization)
+    tmp_dir = tempfile.mkdtemp(prefix="darpan_")
+    try:
+        upload = await stream_upload(file, tmp_dir)
+        try:
+            async with await Pipeline.open(upload) as pipeline:
+                hashes = (await pipeline.run(["hashes"])).get("hashes")
+        except AnalyzerError as e:
+            raise HTTPException(status_code=415, detail=f"Not a decodable image: {e}")
+        if hashes is None:
+            raise HTTPException(status_code=415, detail=f"Not a still image ({pipeline.kind} media)")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if "phash" not in hashes:
+        raise HTTPException(status_code=422, detail=f"Could not hash image: {hashes.get('error')}")
+    phash_index.add(hashes["phash"], KNOWN_FAKE, sha256=upload["sha256"], note=note or None)
+    return {"sha256": upload["sha256"], "phash": hashes["phash"], "label": KNOWN_FAKE}
+
+
+@app.get("/near-duplicates")
+async def query_near_duplicates(phash: str, radius: int = PHASH_RADIUS):
+    """Indexed images within `radius` bits of a 64-bit pHash (16 hex digits)."""
+    try:
+        matches = phash_index.query(phash, radius, limit=50)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid pHash: {phash}")
+    return {"phash": phash, "radius": radius, "matches": matches}
+
+
+# ---------- Jobs (submit / poll) ----------
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """Queue an analysis and return its job id immediately."""
+    tmp_dir = tempfile.mkdtemp(prefix="darpan_")
+    try:
+        upload = await stream_upload(file, tmp_dir)
+        job_id = jobs.submit(run_analysis, upload, tmp_dir)
+    except QueueFull as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail=f"Job queue full: {e}", headers={"Retry-After": "5"})
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return {"job_id": job_id, "status": "queued", "poll_url": f"/jobs/{job_id}"}
+
+
+@app.get("/jobs/{job_id}")
+async def poll_job(job_id: str, wait: float = 0):
+    """Job status with partial results; `wait` > 0 long-polls for up to that many seconds."""
+    job = await jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+# ---------- Health ----------
+@app.get("/health")
+async def health():
+    """Liveness; "warm" turns true once the background warm-up has finished."""
+    warm = app.state.warm_up
+    status = {"status": "ok", "warm": warm is not None and warm.done() and not warm.cancelled()}
+    if status["warm"] and warm.exception() is None:
+        status["warm_up"] = warm.result()
+    status["plugins"] = plugin_stats()
+    return status
+
+
+# ---------- Cache Stats ----------
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and sizes of the report cache, plus job queue and pHash index status."""
+    return {**result_cache.stats(), "job_queue": jobs.stats(), "phash_index": phash_index.stats()}
+
+
 # ---------- Download Report ----------
+REPORT_MEDIA_TYPES = {"pdf": "application/pdf", "json": "application/json"}
+
+
 @app.get("/download")
 async def download_report(case_id: str, format: str = "pdf"):
     """Download generated forensic report (PDF or JSON)."""
-    # Dynamic lookup in /tmp or project root
-    base_dirs = [Path("/tmp"), Path.cwd()]
-    file_path = None
+    if format not in REPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
 
-    for base in base_dirs:
-        candidate = next(base.glob(f"**/{case_id}*.{format}"), None)
-        if candidate and candidate.exists():
-            file_path = candidate
-            break
+    if format == "pdf":
+        pdf = await pdf_reports.get(case_id)
+        if pdf is None:
+            raise HTTPException(status_code=404, detail=f"Report not found for {case_id}")
+        return Response(pdf, media_type=REPORT_MEDIA_TYPES["pdf"],
+                        headers={"Content-Disposition": f'attachment; filename="{case_id}.pdf"'})
 
+    file_path = case_store.lookup(case_id, format)
     if not file_path:
         raise HTTPException(status_code=404, detail=f"Report not found for {case_id}")
 
-    media_type = "application/pdf" if format == "pdf" else "application/json"
-    return FileResponse(file_path, media_type=media_type, filename=file_path.name)
+    return FileResponse(file_path, media_type=REPORT_MEDIA_TYPES[format], filename=file_path.name)
+
+
+# ---------- Artifacts ----------
+@app.get("/artifacts/{digest}")
+async def get_artifact(digest: str):
+    """Content-addressed report artifact (spectrum thumbnails etc.); immutable, so cacheable forever."""
+    found = artifact_store.locate(digest)
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Artifact not found: {digest}")
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, headers={
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{digest}"',
+    })
+
 
+# ---------- Case Store Stats ----------
+@app.get("/cases/stats")
+async def cases_stats():
+    """Indexed cases, artifact disk usage, garbage-collection, blob store and PDF render status."""
+    return {**case_store.stats(), "artifact_store": artifact_store.stats(), "pdf_reports": pdf_reports.stats()}
@@ -0,0 +1,132 @@
+#pdf_reports
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from plugins import plugin
+from report_generator import PDF_LAYOUT_VERSION
+from result_cache import ANALYZER_VERSION
+
+# PDFs depend on both the analyzer output and the layout code
+REPORT_VERSION = f"{ANALYZER_VERSION}.{PDF_LAYOUT_VERSION}"
+MEMORY_ENTRIES = int(os.environ.get("DARPAN_PDF_CACHE_ENTRIES", "32"))
+PRERENDER = os.environ.get("DARPAN_PDF_PRERENDER", "0") == "1"
+
+
+class PdfReports:
+    """
+    Renders case PDFs on first request instead of on the analysis path.
+
+    Rendered files are registered in the case store under a versioned
+    artifact key ("pdf:<report version>") so a layout or analyzer change
+    re-renders, and recent PDFs are kept in memory as bytes. Concurrent
+    requests for the same case share one render. Whoever rewrites a case's
+    JSON calls invalidate(); a render already running for it still answers
+    its callers but is not kept.
+    """
+
+    def __init__(self, case_store, artifacts=None, memory_entries=MEMORY_ENTRIES):
+        self.case_store = case_store
+        self.artifacts = artifacts
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}  # case_id -> (render task, render id)
+        self._render_ids = 0
+        self._invalidations = 0
+        self._background = set()  # the loop only keeps weak references to running tasks
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "renders": 0}
+
+    @property
+    def artifact_key(self):
+        return f"pdf:{REPORT_VERSION}"
+
+    def _remember(self, case_id, data):
+        """Keep a PDF in memory; the caller holds self._lock."""
+        self._memory[case_id] = data
+        self._memory.move_to_end(case_id)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, case_id):
+        """Forget the rendered PDF of a case whose JSON has just been rewritten."""
+        with self._lock:
+            self._memory.pop(case_id, None)
+            self._inflight.pop(case_id, None)  # a running render is now stale
+            self._invalidations += 1
+        path = self.case_store.forget(case_id, self.artifact_key)
+        if path:
+            path.unlink(missing_ok=True)
+
+    def _render(self, case_id, report, render_id):
+        if report is None:
+            json_path = self.case_store.lookup(case_id, "json")
+            if not json_path:
+                return None
+            with open(json_path) as f:
+                report = json.load(f)
+        # Named per render, so a stale render can't overwrite the current file
+        pdf_path = self.case_store.case_dir(case_id) / f"{case_id}-v{REPORT_VERSION}-{render_id}.pdf"
+        plugin("build_pdf_report")(report, str(pdf_path), artifacts=self.artifacts)
+        data = pdf_path.read_bytes()
+        with self._lock:
+            self.counters["renders"] += 1
+            current = self._inflight.get(case_id, (None, None))[1] == render_id
+            if current:
+                self.case_store.register(case_id, report.get("file_sha256"), {self.artifact_key: pdf_path})
+                self._remember(case_id, data)
+        if not current:
+            pdf_path.unlink(missing_ok=True)
+        return data
+
+    async def get(self, case_id, report=None):
+        """PDF bytes for a case, rendering (once) if needed; None if the case is unknown."""
+        with self._lock:
+            if case_id in self._memory:
+                self._memory.move_to_end(case_id)
+                self.counters["memory_hits"] += 1
+                return self._memory[case_id]
+            invalidations = self._invalidations
+
+        path = self.case_store.lookup(case_id, self.artifact_key)
+        if path:
+            data = await asyncio.to_thread(path.read_bytes)
+            with self._lock:
+                self.counters["disk_hits"] += 1
+                if invalidations == self._invalidations:  # else it may be the old PDF
+                    self._remember(case_id, data)
+            return data
+
+        with self._lock:
+            task, _ = self._inflight.get(case_id, (None, None))
+            if task is None:
+                self._render_ids += 1
+                render_id = self._render_ids
+                task = asyncio.ensure_future(asyncio.to_thread(self._render, case_id, report, render_id))
+                self._inflight[case_id] = (task, render_id)
+                task.add_done_callback(lambda t: self._forget_render(case_id, t))
+        return await asyncio.shield(task)  # a disconnecting client mustn't cancel others' render
+
+    def _forget_render(self, case_id, task):
+        with self._lock:
+            if self._inflight.get(case_id, (None,))[0] is task:
+                del self._inflight[case_id]
+
+    def prerender(self, case_id, report):
+        """Schedule a background render (when DARPAN_PDF_PRERENDER=1)."""
+        if PRERENDER:
+            task = asyncio.ensure_future(self._prerender(case_id, report))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _prerender(self, case_id, report):
+        try:
+            await self.get(case_id, report)
+        except Exception as e:
+            print(f"[!] PDF pre-render failed for {case_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "memory_entries": len(self._memory), "report_version": REPORT_VERSION}
@@ -0,0 +1,187 @@
+#phash_index
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = os.environ.get("DARPAN_DATA", "/tmp/darpan_data")
+# Default Hamming radius (of 64 bits) for "same picture, recompressed/resized"
+DEFAULT_RADIUS = int(os.environ.get("DARPAN_PHASH_RADIUS", "6"))
+# Entry labels
+KNOWN_FAKE = "known_fake"
+ANALYSED = "analysed"
+# Unsorted inserts are scanned linearly until merged into the sorted tables
+MERGE_THRESHOLD = 4096
+
+CHUNKS = 4          # 64-bit hash -> four 16-bit substrings
+CHUNK_BITS = 16
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(x):
+        return np.bitwise_count(x)
+else:  # numpy < 2.0
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(x):
+        return _POP8[x.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def _chunks(h):
+    """(n,) uint64 -> (CHUNKS, n) uint16 substrings."""
+    return np.stack([((h >> np.uint64(CHUNK_BITS * k)) & np.uint64(0xFFFF)).astype(np.uint16)
+                     for k in range(CHUNKS)])
+
+
+def _neighbours(value, radius):
+    """All 16-bit values within Hamming `radius` of `value`."""
+    out = [value]
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), r):
+            v = value
+            for b in bits:
+                v ^= 1 << b
+            out.append(v)
+    return out
+
+
+_HEX64 = re.compile(r"[0-9a-fA-F]{16}")
+
+
+def hex_to_int(phash_hex):
+    """A 64-bit pHash as an int; ValueError unless it is exactly 16 hex digits."""
+    if not isinstance(phash_hex, str) or not _HEX64.fullmatch(phash_hex):
+        raise ValueError(f"pHash must be 16 hex digits, got {phash_hex!r}")
+    return int(phash_hex, 16)
+
+
+class PHashIndex:
+    """
+    Persistent near-duplicate index over 64-bit perceptual hashes.
+
+    Multi-index hashing: each hash is split into four 16-bit substrings, and
+    by the pigeonhole principle any hash within Hamming distance r of the
+    query matches it in at least one substring within floor(r / 4). Each
+    substring table is a sorted array probed with searchsorted, so a query
+    touches only a few candidate rows, which are then verified with an
+    exact popcount. Entries live in SQLite under DARPAN_DATA and are loaded
+    into NumPy arrays on startup.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or DATA_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.root / "phash_index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS phashes (
+                id INTEGER PRIMARY KEY,
+                phash INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                sha256 TEXT,
+                case_id TEXT,
+                note TEXT,
+                added_at REAL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS phashes_sha_label ON phashes(sha256, label);
+        """)
+        self._load()
+
+    # ---------- Loading / merging ----------
+    def _load(self):
+        rows = self._db.execute("SELECT id, phash FROM phashes ORDER BY id").fetchall()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        # SQLite stores signed 64-bit; reinterpret as unsigned
+        hashes = np.array([r[1] for r in rows], dtype=np.int64).view(np.uint64)
+        self._build(ids, hashes)
+        self._pending_ids = []
+        self._pending_hashes = []
+
+    def _build(self, ids, hashes):
+        self._ids = ids
+        self._hashes = hashes
+        chunks = _chunks(hashes) if len(hashes) else np.zeros((CHUNKS, 0), dtype=np.uint16)
+        self._order = [np.argsort(c, kind="stable") for c in chunks]
+        self._sorted = [c[o] for c, o in zip(chunks, self._order)]
+
+    def _merge(self):
+        if not self._pending_ids:
+            return
+        ids = np.concatenate([self._ids, np.array(self._pending_ids, dtype=np.int64)])
+        hashes = np.concatenate([self._hashes, np.array(self._pending_hashes, dtype=np.uint64)])
+        self._build(ids, hashes)
+        self._pending_ids, self._pending_hashes = [], []
+
+    # ---------- Insert ----------
+    def add(self, phash_hex, label, sha256=None, case_id=None, note=None):
+        """Index a hash; re-adding the same (sha256, label) is a no-op."""
+        value = hex_to_int(phash_hex)
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO phashes (phash, label, sha256, case_id, note, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(np.uint64(value).astype(np.int64)), label, sha256, case_id, note, time.time()),
+            )
+            if cur.rowcount:
+                self._pending_ids.append(cur.lastrowid)
+                self._pending_hashes.append(value)
+                if len(self._pending_ids) >= MERGE_THRESHOLD:
+                    self._merge()
+
+    # ---------- Query ----------
+    def _candidates(self, q, radius):
+        sub_r = radius // CHUNKS
+        found = []
+        for k in range(CHUNKS):
+            probes = np.array(_neighbours((q >> (CHUNK_BITS * k)) & 0xFFFF, sub_r), dtype=np.uint16)
+            lo = np.searchsorted(self._sorted[k], probes, side="left")
+            hi = np.searchsorted(self._sorted[k], probes, side="right")
+            for a, b in zip(lo, hi):
+                if b > a:
+                    found.append(self._order[k][a:b])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def query(self, phash_hex, radius=DEFAULT_RADIUS, label=None, limit=10):
+        """
+        Entries within Hamming `radius` of the hash, nearest first:
+        [{"distance", "label", "sha256", "case_id", "note"}].
+        """
+        q = hex_to_int(phash_hex)
+        qa = np.uint64(q)
+        with self._lock:
+            rows = self._candidates(q, radius)
+            cand_ids = self._ids[rows]
+            dist = _popcount(self._hashes[rows] ^ qa).astype(np.int64)
+            if self._pending_ids:
+                p_hashes = np.array(self._pending_hashes, dtype=np.uint64)
+                cand_ids = np.concatenate([cand_ids, np.array(self._pending_ids, dtype=np.int64)])
+                dist = np.concatenate([dist, _popcount(p_hashes ^ qa).astype(np.int64)])
+        keep = dist <= radius
+        cand_ids, dist = cand_ids[keep], dist[keep]
+        if not len(cand_ids):
+            return []
+
+        order = np.argsort(dist, kind="stable")
+        by_id = {int(i): int(d) for i, d in zip(cand_ids[order], dist[order])}
+        marks = ",".join("?" * len(by_id))
+        sql = f"SELECT id, label, sha256, case_id, note FROM phashes WHERE id IN ({marks})"
+        params = list(by_id)
+        if label:
+            sql += " AND label = ?"
+            params.append(label)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        matches = [{"distance": by_id[r[0]], "label": r[1], "sha256": r[2], "case_id": r[3], "note": r[4]}
+                   for r in rows]
+        matches.sort(key=lambda m: m["distance"])
+        return matches[:limit]
+
+    def stats(self):
+        with self._lock:
+            labels = dict(self._db.execute("SELECT label, COUNT(*) FROM phashes GROUP BY label").fetchall())
+            return {"entries": len(self._ids) + len(self._pending_ids), "by_label": labels,
+                    "pending_merge": len(self._pending_ids), "default_radius": DEFAULT_RADIUS}
@@ -0,0 +1,91 @@
+#plugins
+"""
+Lazily imported analyzer plugins.
+
+Analyzers pull in NumPy, PIL, imagehash, OpenCV and reportlab. The API
+modules refer to them by name through plugin() and the module is imported
+on first use, so none of that sits between a cold start and the first
+healthy response. warm_up() imports everything ahead of the first request
+(main.py runs it in the background once the server is up).
+"""
+import importlib
+import threading
+import time
+
+# name -> "module:attribute"
+PLUGINS = {}
+_loaded = {}
+_import_s = {}
+_errors = {}
+_lock = threading.Lock()
+
+
+def register(name, target):
+    """Register `target` ("module:attribute") under `name` without importing it."""
+    PLUGINS[name] = target
+
+
+def plugin(name):
+    """The object registered under `name`, importing its module on first use."""
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    module_name, _, attr = PLUGINS[name].partition(":")
+    with _lock:
+        if name not in _loaded:
+            t0 = time.perf_counter()
+            obj = importlib.import_module(module_name)
+            _import_s.setdefault(module_name, round(time.perf_counter() - t0, 4))
+            for part in attr.split("."):
+                obj = getattr(obj, part)
+            _loaded[name] = obj
+    return _loaded[name]
+
+
+def warm_up(names=None):
+    """
+    Import the given plugins (default: all); returns {module: import seconds}.
+    A plugin that fails to import is recorded and left for its first real use
+    to report.
+    """
+    for name in names or list(PLUGINS):
+        try:
+            plugin(name)
+        except Exception as e:
+            _errors[name] = str(e)
+    return dict(_import_s)
+
+
+def stats():
+    return {"registered": len(PLUGINS), "loaded": len(_loaded), "import_s": dict(_import_s),
+            "errors": dict(_errors)}
+
+
+# -----------------------------
+# Analyzers
+# -----------------------------
+register("decode_image", "decoded_image:DecodedImage.open")
+register("needs_tiling", "tiled_analysis:needs_tiling")
+register("stego_tools_for", "lsb_stego:stego_tools_for")
+register("stego_report", "lsb_stego:stego_report")
+register("media_kind", "frame_sampler:media_kind")
+register("iter_frames", "frame_sampler:iter_frames")
+register("build_timeline", "frame_sampler:build_timeline")
+register("build_pdf_report", "report_generator:build_pdf_report")
+register("build_json_report", "report_generator:build_json_report")
+register("scan_file", "binscan:scan_file")
+register("heuristic_ai_score", "forensic:heuristic_ai_score")
+# Libraries the analyzers import on first use, preloaded by warm_up()
+register("reportlab", "reportlab.pdfgen.canvas:Canvas")
+register("opencv", "cv2:VideoCapture")
+register("scipy_dct", "scipy.fftpack:dct")  # imagehash.phash imports it on its first call
+
+# Used inside the CPU pool workers (cpu_pool tasks)
+register("compute_image_stats", "image_stats:compute_image_stats")
+register("analyze_image_scatter", "scatter_analysis:analyze_image_scatter")
+register("image_hashes", "forensic:image_hashes")
+register("analyze_lsb", "lsb_stego:analyze_lsb")
+register("analyze_image_tiled", "tiled_analysis:analyze_image_tiled")
+WORKER_PLUGINS = ["compute_image_stats", "analyze_image_scatter", "image_hashes", "analyze_lsb",
+                  "analyze_image_tiled", "scan_file", "scipy_dct"]
@@ -4,9 +4,9 @@ import io
 import base64
 import datetime
 from textwrap import wrap
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+
+# Bump when the PDF layout changes so cached PDFs are re-rendered
+PDF_LAYOUT_VERSION = "5"
 
 
 def build_json_report(case_id, filename, file_sha256, findings):
@@ -21,8 +21,17 @@ def build_json_report(case_id, filename, file_sha256, findings):
     return report
 
 
-def build_pdf_report(report_json, out_path):
-    """Generate a well-formatted PDF report with scatter visualization."""
+def build_pdf_report(report_json, out_path, artifacts=None):
+    """
+    Generate a well-formatted PDF report with scatter visualization.
+    `artifacts` (an ArtifactStore) resolves images the report references
+    by digest instead of inlining.
+    """
+    # reportlab is only needed once a PDF is actually rendered
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
     c = canvas.Canvas(out_path, pagesize=letter)
@@ -54,8 +63,26 @@ def build_pdf_report(report_json, out_path):
     y -= 16
     c.drawString(40, y, f"EXIF Data: {'Present' if meta_section else 'None'}")
     y -= 16
-    c.drawString(40, y, f"Binwalk: {'Embedded content found' if 'Embedded' in binwalk_section else 'None reported'}")
-    y -= 24
+    if isinstance(binwalk_section, dict):
+        embedded = binwalk_section.get("embedded", 0)
+        binwalk_line = f"{embedded} embedded signature(s) found" if embedded else "None reported"
+    else:
+        binwalk_line = "Embedded content found" if "Embedded" in binwalk_section else "None reported"
+    c.drawString(40, y, f"Embedded files: {binwalk_line}")
+    y -= 16
+    lsb_section = findings.get("steghide", {})
+    lsb_section = lsb_section.get("lsb", {}) if isinstance(lsb_section, dict) else {}
+    if not lsb_section.get("applicable"):
+        lsb_line = "Not applicable"
+    else:
+        lsb_line = "Embedding suspected" if lsb_section.get("suspicious") else "None detected"
+    c.drawString(40, y, f"LSB Steganography: {lsb_line}")
+    y -= 16
+    timeline = findings.get("timeline")
+    if timeline:
+        c.drawString(40, y, f"Frame Timeline: {timeline.get('summary', 'N/A')}")
+        y -= 16
+    y -= 8
 
     # Scatter Analysis Section
     c.setFont("Helvetica-Bold", 12)
@@ -80,9 +107,15 @@ def build_pdf_report(report_json, out_path):
     y -= 24
 
     # Embed scatter image if available
-    if scatter_section.get("scatter_image_base64"):
+    scatter_ref = scatter_section.get("scatter_image")
+    if scatter_section.get("scatter_image_base64") or (scatter_ref and artifacts is not None):
         try:
-            img_bytes = base64.b64decode(scatter_section["scatter_image_base64"])
+            if scatter_ref:
+                img_bytes = artifacts.read(scatter_ref["digest"])
+                if img_bytes is None:
+                    raise FileNotFoundError(f"artifact {scatter_ref['digest'][:12]} expired")
+            else:
+                img_bytes = base64.b64decode(scatter_section["scatter_image_base64"])
             img = ImageReader(io.BytesIO(img_bytes))
             img_h = 150
             img_w = 400
@@ -0,0 +1,127 @@
+#result_cache
+import copy
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Bump whenever an analyzer's output changes so stale reports aren't served.
+ANALYZER_VERSION = "12"
+
+DATA_DIR = os.environ.get("DARPAN_DATA", "/tmp/darpan_data")
+MEMORY_ENTRIES = int(os.environ.get("DARPAN_CACHE_MEMORY_ENTRIES", "256"))
+DISK_LIMIT_BYTES = int(float(os.environ.get("DARPAN_CACHE_DISK_MB", "512")) * 1024 * 1024)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of forensic reports keyed on the file's SHA-256.
+
+    Two tiers: an in-memory LRU of report dicts and a JSON file per report
+    under <DARPAN_DATA>/result_cache/<analyzer version>/, evicted oldest-first
+    once the tier exceeds its byte budget. Entries from other analyzer
+    versions are never read and are removed on startup.
+    """
+
+    def __init__(self, root=None, version=ANALYZER_VERSION,
+                 memory_entries=MEMORY_ENTRIES, disk_limit_bytes=DISK_LIMIT_BYTES):
+        self.version = version
+        self.base = Path(root or DATA_DIR) / "result_cache"
+        self.root = self.base / version
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.disk_limit_bytes = disk_limit_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._drop_old_versions()
+        self._disk_bytes = sum(p.stat().st_size for p in self.root.glob("*/*.json"))
+
+    # ---------- Paths ----------
+    def _path(self, sha256):
+        return self.root / sha256[:2] / f"{sha256}.json"
+
+    def _drop_old_versions(self):
+        for d in self.base.iterdir():
+            if d.is_dir() and d.name != self.version:
+                for p in d.glob("*/*.json"):
+                    p.unlink(missing_ok=True)
+
+    # ---------- Lookup / store ----------
+    def get(self, sha256):
+        """Return (report, tier) or (None, None). The report is a private copy."""
+        with self._lock:
+            if sha256 in self._memory:
+                self._memory.move_to_end(sha256)
+                self.counters["memory_hits"] += 1
+                return copy.deepcopy(self._memory[sha256]), "memory"
+
+        path = self._path(sha256)
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None, None
+
+        os.utime(path)  # mtime doubles as last-access time for eviction
+        with self._lock:
+            self.counters["disk_hits"] += 1
+            self._remember(sha256, report)
+        return copy.deepcopy(report), "disk"
+
+    def put(self, sha256, report):
+        report = copy.deepcopy(report)
+        path = self._path(sha256)
+        path.parent.mkdir(exist_ok=True)
+        # A private temp file per writer: the same file may be analysed twice at once
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{sha256}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(report, f)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self.counters["stores"] += 1
+            self._remember(sha256, report)
+            self._disk_bytes += path.stat().st_size - old_size
+            if self._disk_bytes > self.disk_limit_bytes:
+                self._evict_disk()
+
+    def _remember(self, sha256, report):
+        self._memory[sha256] = report
+        self._memory.move_to_end(sha256)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Oldest-accessed first, down to 90% of the budget to avoid thrashing
+        files = sorted(self.root.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        target = self.disk_limit_bytes * 0.9
+        for p in files:
+            if self._disk_bytes <= target:
+                break
+            size = p.stat().st_size
+            p.unlink(missing_ok=True)
+            self._disk_bytes -= size
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "disk_limit_bytes": self.disk_limit_bytes,
+                "analyzer_version": self.version,
+            }
@@ -1,63 +1,113 @@
 #scatter_analysis
 import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
 from io import BytesIO
 import base64
-import cv2
-
-def analyze_image_scatter(image_path: str):
-    img = Image.open(image_path).convert("RGB")
-    img_np = np.array(img)
-
-    # Split into channels
-    r, g, b = cv2.split(img_np)
-
-    # Compute entropy per channel
-    def entropy(channel):
-        hist, _ = np.histogram(channel.flatten(), bins=256, range=(0, 256))
-        hist = hist / hist.sum()
-        hist = hist[hist > 0]
-        return -np.sum(hist * np.log2(hist))
-
-    entropies = {
-        "R_entropy": entropy(r),
-        "G_entropy": entropy(g),
-        "B_entropy": entropy(b)
-    }
+from PIL import Image, ImageDraw
+from image_stats import load_rgb, compute_image_stats
+
+# The spectrum thumbnail only needs the low-frequency layout, so the FFT runs
+# on a copy whose longest side is at most this.
+SPECTRUM_MAX_SIDE = 512
+PANEL_SIDE = 256
+PANEL_GAP = 8
+LABEL_HEIGHT = 16
+
+
+def _spectrum_input(img_np, max_side=SPECTRUM_MAX_SIDE):
+    """(3, h, w) float32 channels of a downscaled copy of the image."""
+    img = Image.fromarray(img_np)
+    factor = max(img.size) // max_side
+    if factor > 1:
+        img = img.reduce(factor)  # box filter on integer factor, much cheaper than resize
+    img.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return np.asarray(img, dtype=np.float32).transpose(2, 0, 1)
+
+
+def log_spectra(img_np, max_side=SPECTRUM_MAX_SIDE):
+    """
+    Centered log-magnitude spectrum per channel, (3, h, w) float32.
+    rfft2 computes only the non-negative column frequencies; the other half
+    is the point reflection of it, since the input is real.
+    """
+    channels = _spectrum_input(img_np, max_side)
+    half = np.log1p(np.abs(np.fft.rfft2(channels)), dtype=np.float32)  # (3, h, w//2+1)
+    return full_spectrum(half, channels.shape[2])
+
+
+def full_spectrum(half, w):
+    """Centered (3, h, w) spectrum from an rfft2-shaped (3, h, w//2+1) half."""
+    _, h, wr = half.shape
+    full = np.empty((half.shape[0], h, w), dtype=np.float32)
+    full[:, :, :wr] = half
+    # F[u, v] = conj(F[-u, -v]) for v >= wr
+    rows = (-np.arange(h)) % h
+    cols = w - np.arange(wr, w)
+    full[:, :, wr:] = half[:, rows][:, :, cols]
+    return np.fft.fftshift(full, axes=(1, 2))
 
-    # Correlation between channels
-    correlations = {
-        "R-G_corr": np.corrcoef(r.flatten(), g.flatten())[0, 1],
-        "R-B_corr": np.corrcoef(r.flatten(), b.flatten())[0, 1],
-        "G-B_corr": np.corrcoef(g.flatten(), b.flatten())[0, 1]
-    }
 
-    # FFT scatter visualization
-    fig, axs = plt.subplots(1, 3, figsize=(9, 3))
-    for ax, channel, color in zip(axs, [r, g, b], ['R', 'G', 'B']):
-        f = np.fft.fft2(channel)
-        fshift = np.fft.fftshift(f)
-        spectrum = 20 * np.log(np.abs(fshift) + 1)
-        ax.imshow(spectrum, cmap='gray')
-        ax.set_title(f"{color} channel FFT")
-        ax.axis('off')
-
-    plt.tight_layout()
+def render_spectra(spectra):
+    """Three labelled grayscale panels side by side, as PNG bytes."""
+    panels = []
+    for spectrum in spectra:
+        lo, hi = float(spectrum.min()), float(spectrum.max())
+        scaled = (spectrum - lo) * (255.0 / (hi - lo)) if hi > lo else np.zeros_like(spectrum)
+        panel = Image.fromarray(scaled.astype(np.uint8))
+        panel.thumbnail((PANEL_SIDE, PANEL_SIDE), Image.Resampling.BILINEAR)
+        panels.append(panel)
+
+    width = sum(p.width for p in panels) + PANEL_GAP * (len(panels) + 1)
+    height = max(p.height for p in panels) + LABEL_HEIGHT + PANEL_GAP
+    canvas = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(canvas)
+    x = PANEL_GAP
+    for panel, color in zip(panels, "RGB"):
+        draw.text((x, 2), f"{color} channel FFT", fill=0)
+        canvas.paste(panel, (x, LABEL_HEIGHT))
+        x += panel.width + PANEL_GAP
+
     buf = BytesIO()
-    plt.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    scatter_img_b64 = base64.b64encode(buf.read()).decode('utf-8')
+    canvas.save(buf, format="PNG", optimize=False)
+    return buf.getvalue()
+
+
+def analyze_image_scatter(image_path: str, rgb=None, stats=None, render=True, artifacts=None):
+    """
+    Per-channel entropy, channel correlation and FFT spectra of an image.
+    Pass the already decoded `rgb` array (and its `stats`) to avoid decoding twice.
+    With render=False the spectrum is skipped and only the numeric scores are
+    returned. With an ArtifactStore in `artifacts`, the spectrum PNG is stored
+    there and referenced as "scatter_image" instead of inlined as base64.
+    """
+    img_np = rgb if rgb is not None else load_rgb(image_path)
+    if stats is None:
+        stats = compute_image_stats(img_np)
+
+    # FFT spectrum visualization
+    png = render_spectra(log_spectra(img_np)) if render else None
+    return scatter_result(stats, png, artifacts)
+
+
+def scatter_result(stats, png=None, artifacts=None):
+    """Report section from image statistics and an optional spectrum PNG."""
+    # Entropy per channel
+    entropies = {f"{c}_entropy": v for c, v in stats["channel_entropies"].items()}
+
+    # Correlation between channels
+    correlations = stats["correlations"]
 
     # Overall synthetic heuristic
     mean_entropy = np.mean(list(entropies.values()))
     avg_corr = np.mean(list(correlations.values()))
     synthetic_score = round((avg_corr - mean_entropy/10 + 1) / 2, 3)
 
-    return {
+    result = {
         "entropies": entropies,
         "correlations": correlations,
         "synthetic_likelihood": synthetic_score,
-        "scatter_image_base64": scatter_img_b64
     }
+    if artifacts is not None:
+        result["scatter_image"] = artifacts.put(png, "image/png") if png else None
+    else:
+        result["scatter_image_base64"] = base64.b64encode(png).decode('utf-8') if png else None
+    return result
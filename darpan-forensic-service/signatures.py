@@ -0,0 +1,194 @@
+#signatures
+"""
+In-process embedded-file signature scanner (the part of binwalk the service
+actually uses).
+
+Multi-pattern matching in the Wu-Manber style: every signature starts with a
+literal two-byte prefix, and a 65536-entry table marks which prefixes can
+start a signature. One vectorised pass over an mmap of the file looks up
+the two-byte value at every offset, and only the few flagged offsets are
+verified against the full signature patterns.
+"""
+import mmap
+import re
+import struct
+
+import numpy as np
+
+# Bytes per vectorised prefix-lookup pass; bounds the uint16 temporaries.
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# (type, description, pattern, offset of the pattern from the start of the
+# embedded file). The first two bytes of every pattern must be literal.
+SIGNATURES = [
+    ("jpeg", "JPEG image data", rb"\xff\xd8\xff[\xc0-\xfe]", 0),
+    ("png", "PNG image", rb"\x89PNG\r\n\x1a\n", 0),
+    ("gif", "GIF image data", rb"GIF8[79]a", 0),
+    ("bmp", "PC bitmap", rb"BM.{4}\x00\x00\x00\x00.\x00\x00\x00(?:\x0c|\x28|\x38|\x40|\x6c|\x7c)\x00\x00\x00", 0),
+    ("tiff", "TIFF image data, little-endian", rb"II\x2a\x00", 0),
+    ("tiff", "TIFF image data, big-endian", rb"MM\x00\x2a", 0),
+    ("webp", "RIFF WebP image", rb"RIFF.{4}WEBP", 0),
+    ("wav", "RIFF WAVE audio", rb"RIFF.{4}WAVE", 0),
+    ("avi", "RIFF AVI video", rb"RIFF.{4}AVI ", 0),
+    ("iso_bmff", "ISO media (MP4/MOV/HEIC)", rb"ftyp(?:isom|iso[2-6]|mp4[12]|avc1|qt  |M4V |M4A |heic|heix|mif1|avif|3gp[4-6])", 4),
+    ("ogg", "Ogg data", rb"OggS\x00", 0),
+    ("flac", "FLAC audio", rb"fLaC\x00\x00\x00\x22", 0),
+    ("mp3_id3", "MP3 ID3 tag", rb"ID3[\x02-\x04]\x00", 0),
+    ("zip", "Zip archive data", rb"PK\x03\x04", 0),
+    ("zip_end", "End of Zip archive", rb"PK\x05\x06", 0),
+    ("rar", "RAR archive data", rb"Rar!\x1a\x07(?:\x00|\x01\x00)", 0),
+    ("7z", "7-zip archive data", rb"7z\xbc\xaf\x27\x1c", 0),
+    ("gzip", "gzip compressed data", rb"\x1f\x8b\x08[\x00-\x1f]", 0),
+    ("bzip2", "bzip2 compressed data", rb"BZh[1-9]1AY&SY", 0),
+    ("xz", "XZ compressed data", rb"\xfd7zXZ\x00", 0),
+    ("zstd", "Zstandard compressed data", rb"\x28\xb5\x2f\xfd", 0),
+    ("cab", "Microsoft Cabinet archive", rb"MSCF\x00\x00\x00\x00", 0),
+    ("tar", "POSIX tar archive", rb"ustar(?:\x00|\x20\x20)", 257),
+    ("pdf", "PDF document", rb"%PDF-[12]\.[0-9]", 0),
+    ("elf", "ELF executable", rb"\x7fELF[\x01\x02][\x01\x02]\x01", 0),
+    ("pe", "Microsoft executable (DOS stub)", rb"This program cannot be run in DOS mode", 78),
+    ("macho", "Mach-O 64-bit executable", rb"\xcf\xfa\xed\xfe", 0),
+    ("macho", "Mach-O 32-bit executable", rb"\xce\xfa\xed\xfe", 0),
+    ("sqlite", "SQLite 3.x database", rb"SQLite format 3\x00", 0),
+    ("pem", "PEM encoded key/certificate", rb"-----BEGIN (?:[A-Z ]{0,20})(?:PRIVATE KEY|CERTIFICATE|PGP)", 0),
+]
+
+
+def _literal_prefix(pattern):
+    """First two bytes of a pattern, unescaping \\xNN and \\-escaped punctuation."""
+    out, i = bytearray(), 0
+    while len(out) < 2:
+        if pattern[i:i + 2] == b"\\x":
+            out.append(int(pattern[i + 2:i + 4], 16))
+            i += 4
+        elif pattern[i:i + 1] == b"\\":
+            out.append(pattern[i + 1])
+            i += 2
+        else:
+            if pattern[i:i + 1] in b".[(|?*+{":
+                raise ValueError(f"signature {pattern!r} must start with two literal bytes")
+            out.append(pattern[i])
+            i += 1
+    return (out[0] << 8) | out[1]
+
+
+def _build_tables():
+    table = np.zeros(1 << 16, dtype=bool)
+    by_prefix = {}
+    for sig in SIGNATURES:
+        prefix = _literal_prefix(sig[2])
+        table[prefix] = True
+        by_prefix.setdefault(prefix, []).append((sig, re.compile(sig[2], re.DOTALL)))
+    return table, by_prefix
+
+
+_PREFIX_TABLE, _BY_PREFIX = _build_tables()
+
+
+def _candidates(data):
+    """Offsets (ascending) whose two-byte value starts some signature."""
+    n = len(data)
+    for start in range(0, n - 1, CHUNK_BYTES):
+        window = data[start:min(start + CHUNK_BYTES + 1, n)]
+        keys = (window[:-1].astype(np.uint16) << 8) | window[1:]
+        hits = np.flatnonzero(_PREFIX_TABLE[keys])
+        for pos in hits:
+            yield start + int(pos), int(keys[pos])
+
+
+def _zip_detail(buf, start):
+    hdr = buf[start:start + 30]
+    if len(hdr) < 30:
+        return {}
+    name_len = struct.unpack_from("<H", hdr, 26)[0]
+    name = bytes(buf[start + 30:start + 30 + name_len]).decode("utf-8", "replace")
+    return {"name": name}
+
+
+def _png_detail(buf, start):
+    ihdr = buf[start + 8:start + 24]
+    if len(ihdr) < 16 or ihdr[4:8] != b"IHDR":
+        return {}
+    width, height = struct.unpack_from(">II", ihdr, 8)
+    return {"width": width, "height": height}
+
+
+def _elf_detail(buf, start):
+    cls = buf[start + 4]
+    return {"bits": 64 if cls == 2 else 32}
+
+
+DETAILS = {"zip": _zip_detail, "png": _png_detail, "elf": _elf_detail}
+
+
+def scan_buffer(buf, max_matches=256):
+    """
+    Signature matches in a bytes-like object:
+    [{"offset", "type", "description", ...detail}], in file order.
+    Returns (matches, total) where `total` counts hits beyond `max_matches`.
+    """
+    matches, total = [], 0
+    data = np.frombuffer(buf, dtype=np.uint8)
+    try:
+        hits = [(pos, sig) for pos, key in _candidates(data)
+                for sig, rx in _BY_PREFIX[key] if rx.match(buf, pos)]
+    finally:
+        del data  # release the buffer export (mmap can't close while exported)
+    for pos, (sig_type, description, _, rel) in hits:
+        start = pos - rel
+        if start < 0:
+            continue
+        total += 1
+        if len(matches) >= max_matches:
+            continue
+        hit = {"offset": start, "type": sig_type, "description": description}
+        if sig_type in DETAILS:
+            try:
+                hit.update(DETAILS[sig_type](buf, start))
+            except (IndexError, struct.error):
+                pass
+        matches.append(hit)
+    return matches, total
+
+
+def _summary(matches, total):
+    embedded = [m for m in matches if m["offset"] > 0]
+    if not matches:
+        return "No known file signatures found."
+    host = matches[0]["description"] if matches[0]["offset"] == 0 else "unknown data"
+    if not embedded:
+        return f"{host} at offset 0; no embedded files found."
+    kinds = sorted({m["description"] for m in embedded})
+    more = f" ({total - len(matches)} further matches not listed)" if total > len(matches) else ""
+    return (f"{host} at offset 0; Embedded signatures found: {len(embedded)} "
+            f"({', '.join(kinds)}), first at offset {embedded[0]['offset']}{more}.")
+
+
+def scan_signatures(filepath, max_matches=256):
+    """
+    Map the file and scan it for embedded-file magic signatures; see
+    signature_report for the result. (binscan.scan_file runs the same scan
+    alongside its other passes over one mapping.)
+    """
+    with open(filepath, "rb") as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            matches, total = [], 0
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matches, total = scan_buffer(mm, max_matches)
+    return signature_report(matches, total, size)
+
+
+def signature_report(matches, total, size):
+    """
+    {"matches", "total_matches", "embedded", "size", "summary"}, where
+    `embedded` counts matches past offset 0 (i.e. not the host file itself).
+    """
+    return {
+        "matches": matches,
+        "total_matches": total,
+        "embedded": sum(1 for m in matches if m["offset"] > 0),
+        "size": size,
+        "summary": _summary(matches, total),
+    }
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import decoded_image
+from conftest import noise_rgb
+from decoded_image import BandReader, DecodedImage
+
+# (format, save options, mode, expected BandReader decode)
+LAYOUTS = [
+    ("BMP", {}, "RGB", "bands"),
+    ("BMP", {}, "P", "bands"),
+    ("PPM", {}, "L", "bands"),
+    ("TIFF", {}, "RGB", "bands"),
+    ("TIFF", {}, "RGBA", "bands"),
+    ("TIFF", {}, "1", "bands"),
+    ("TGA", {}, "RGB", "bands"),
+    ("TIFF", {"compression": "tiff_lzw"}, "RGB", "full"),
+    ("PNG", {}, "RGB", "full"),
+]
+
+
+def save(tmp_path, rgb, fmt, options=None, mode="RGB"):
+    path = tmp_path / f"image.{fmt.lower()}"
+    Image.fromarray(rgb).convert(mode).save(path, fmt, **(options or {}))
+    return path
+
+
+@pytest.mark.parametrize("fmt,options,mode,decode", LAYOUTS, ids=lambda v: str(v))
+def test_bands_match_a_full_decode(tmp_path, fmt, options, mode, decode):
+    path = save(tmp_path, noise_rgb(101, 67), fmt, options, mode)
+    full = np.asarray(Image.open(path).convert("RGB"))
+    with BandReader(path) as reader:
+        assert reader.decode == decode
+        bands = list(reader.bands(rows=16))
+    assert [y for y, _ in bands] == list(range(0, 101, 16))
+    # Each band is decoded at its own size, not cropped from a full buffer
+    assert [band.size for _, band in bands] == [(67, 16)] * 6 + [(67, 5)]
+    np.testing.assert_array_equal(np.concatenate([np.asarray(b.convert("RGB")) for _, b in bands]), full)
+
+
+def test_rotated_tiff_is_not_read_in_bands(tmp_path):
+    path = tmp_path / "rotated.tiff"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.fromarray(noise_rgb(40, 30)).save(path, "TIFF", exif=exif)
+    with BandReader(path) as reader:
+        assert reader.decode == "full"
+
+
+def test_large_jpeg_is_drafted_under_the_budget(tmp_path):
+    path = save(tmp_path, noise_rgb(400, 640), "JPEG")
+    with BandReader(path, draft_max_pixels=400 * 640 // 10) as reader:
+        assert (reader.decode, reader.scale, reader.size) == ("draft", 4, (160, 100))
+    with BandReader(path) as reader:
+        assert (reader.decode, reader.scale, reader.size) == ("full", 1, (640, 400))
+
+
+def test_reduced_copy_is_built_band_by_band(tmp_path, monkeypatch):
+    monkeypatch.setattr(decoded_image, "BAND_ROWS", 24)
+    rgb = noise_rgb(200, 90)
+    path = save(tmp_path, rgb, "BMP")
+    with BandReader(path) as reader:
+        assert reader.reduced(60).size == (27, 60)
+        # reduce() boxes (4x4 here) never straddle two bands
+        boxes = np.asarray(reader.reduced(50))
+    np.testing.assert_array_equal(boxes, np.asarray(Image.fromarray(rgb).reduce(4)))
+
+
+def test_large_uncompressed_working_copy_skips_the_full_decode(tmp_path, monkeypatch):
+    path = save(tmp_path, noise_rgb(300, 200), "BMP")
+    reduced = []
+    original = BandReader.reduced
+    monkeypatch.setattr(BandReader, "reduced", lambda self, side: reduced.append(side) or original(self, side))
+    decoded = DecodedImage.open(path, full=False, working_max_side=40)
+    assert reduced == [40]
+    assert decoded.rgb is None and decoded.working.shape == (40, 27, 3)
+    assert decoded.describe()["width"] == 200
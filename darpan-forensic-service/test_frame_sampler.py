@@ -0,0 +1,54 @@
+import json
+import math
+
+import numpy as np
+from PIL import Image
+
+from cpu_pool import frame_task
+from frame_sampler import build_timeline, iter_animated, iter_video
+from image_stats import compute_image_stats
+
+
+def _analyse(frames):
+    return [{"index": i, "t": round(t, 3), **frame_task(rgb)} for i, t, rgb in frames]
+
+
+def test_flat_channels_have_zero_correlation():
+    corr = compute_image_stats(np.zeros((32, 32, 3), np.uint8))["correlations"]
+    assert corr == {name: 0.0 for name in corr}
+
+
+def test_black_frames_in_video_give_finite_timeline(black_clip):
+    frames = _analyse(iter_video(black_clip, fps=2, max_frames=8))
+    assert len(frames) == 8
+    assert all(math.isfinite(f["synthetic_likelihood"]) for f in frames)
+    timeline = build_timeline(frames)
+    json.dumps(timeline, allow_nan=False)
+    assert timeline["sampled"] == 8
+    assert timeline["synthetic_likelihood"]["peak_t"] >= 2.0  # the noise half
+
+
+def test_black_animation_gives_finite_timeline(tmp_path):
+    path = tmp_path / "black.gif"
+    # Flat frames; alternating shades so the GIF encoder doesn't merge them
+    gif = [Image.new("RGB", (32, 32), (i % 2 * 40,) * 3) for i in range(5)]
+    gif[0].save(path, save_all=True, append_images=gif[1:], duration=500, loop=0)
+    timeline = build_timeline(_analyse(iter_animated(path, fps=1, max_frames=8)))
+    json.dumps(timeline, allow_nan=False)
+    assert timeline["sampled"] == 3  # 2.5s at 1 fps
+
+
+def test_timeline_skips_unscored_frames():
+    frames = [{"index": 0, "t": 0.0, "phash": None, "synthetic_likelihood": float("nan")},
+              {"index": 5, "t": 1.0, "phash": None, "synthetic_likelihood": 0.4}]
+    timeline = build_timeline(frames)
+    assert timeline["synthetic_likelihood"] == {"mean": 0.4, "max": 0.4, "peak_t": 1.0}
+    assert build_timeline(frames[:1])["synthetic_likelihood"] is None
+
+
+def test_black_clip_report_is_served(client, black_clip):
+    data = black_clip.read_bytes()
+    for _ in range(2):  # fresh analysis, then the cached copy
+        r = client.post("/analyze-media-forensics", files={"file": ("black.mp4", data, "video/mp4")})
+        assert r.status_code == 200, r.text
+        assert r.json()["timeline"]["sampled"] > 0
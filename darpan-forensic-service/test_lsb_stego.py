@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import lsb_stego
+from lsb_stego import RS_THRESHOLD, analyze_lsb, analyze_lsb_file, chi_square_attack, rs_analysis
+
+
+def smooth_channel(h=256, w=256, seed=1):
+    """A photo-like channel: smooth gradients plus a little sensor noise."""
+    y, x = np.mgrid[0:h, 0:w]
+    noise = np.random.default_rng(seed).normal(0, 2.5, (h, w))
+    return np.clip(96 + 60 * np.sin(x / 23.0) + 40 * np.cos(y / 31.0) + noise, 0, 255).astype(np.uint8)
+
+
+def smooth_rgb(seed=1):
+    return np.stack([smooth_channel(seed=seed + i) for i in range(3)], axis=-1)
+
+
+def embed(pixels, rate, seed=2):
+    """LSB replacement with random message bits at a random `rate` of the samples."""
+    rng = np.random.default_rng(seed)
+    out = pixels.copy()
+    hit = rng.random(out.shape) < rate
+    out[hit] = (out[hit] & 0xFE) | rng.integers(0, 2, int(hit.sum()), dtype=np.uint8)
+    return out
+
+
+def test_chi_square_follows_a_sequential_payload():
+    # Multiples of 3 leave the (2k, 2k+1) pairs far from equal in a clean image
+    cover = smooth_channel() // 3 * 3
+    stego = cover.copy()
+    stego[:128] = embed(stego[:128], 1.0)  # top half carries the message
+    assert max(chi_square_attack(cover)) < 0.01
+    p = chi_square_attack(stego)
+    assert min(p[:5]) > 0.95    # prefixes inside the payload look embedded...
+    assert max(p[5:]) < 0.01    # ...and stop as soon as clean rows are included
+
+
+def test_chi_square_needs_enough_samples():
+    # Too few pixels per value for any pair to be tested: no evidence either way
+    assert chi_square_attack(np.zeros((4, 4), np.uint8)) == [1.0] * 10
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.25, 0.5, 0.75])
+def test_rs_estimates_the_embedded_fraction(rate):
+    assert rs_analysis(embed(smooth_channel(), rate)) == pytest.approx(rate, abs=0.1)
+
+
+def test_rs_on_too_narrow_a_channel():
+    assert rs_analysis(np.zeros((8, 3), np.uint8)) is None
+
+
+def test_analyze_lsb_flags_only_the_stego_image():
+    cover = smooth_rgb()
+    clean = analyze_lsb(cover, "PNG")
+    assert clean["applicable"] and not clean["suspicious"]
+    assert all(v < RS_THRESHOLD for v in clean["rs_estimate"].values())
+
+    stego = analyze_lsb(embed(cover, 0.5), "PNG")
+    assert stego["suspicious"]
+    assert all(v == pytest.approx(0.5, abs=0.1) for v in stego["rs_estimate"].values())
+    assert stego["summary"].startswith("LSB embedding suspected")
+    # Half the replaced bits already matched, so about 1/4 of LSBs flip: still ~50% ones
+    assert all(v["lsb_ones"] == pytest.approx(0.5, abs=0.05) for v in stego["bit_planes"].values())
+
+
+def test_only_the_first_rows_are_analysed(monkeypatch):
+    monkeypatch.setattr(lsb_stego, "MAX_PIXELS", 256 * 100)
+    assert analyze_lsb(smooth_rgb(), "BMP")["pixels_analysed"] == 256 * 100
+
+
+def test_lossy_formats_are_skipped():
+    assert analyze_lsb(None, "JPEG") == {
+        "applicable": False, "summary": "LSB analysis skipped: JPEG is lossy, pixel LSBs carry no payload."}
+
+
+def test_payload_survives_a_lossless_file(tmp_path):
+    path = tmp_path / "stego.png"
+    Image.fromarray(embed(smooth_rgb(), 0.5)).save(path)
+    assert analyze_lsb_file(path)["suspicious"]
+    path = tmp_path / "stego.jpg"
+    Image.fromarray(embed(smooth_rgb(), 0.5)).save(path, quality=95)
+    assert analyze_lsb_file(path)["applicable"] is False
@@ -0,0 +1,58 @@
+import main
+from conftest import noise_rgb
+from phash_index import ANALYSED, KNOWN_FAKE
+
+
+def _analyse(client, data, name="image.png"):
+    r = client.post("/analyze-media-forensics", files={"file": (name, data, "image/png")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _flip(phash, *bits):
+    value = int(phash, 16)
+    for b in bits:
+        value ^= 1 << b
+    return f"{value:016x}"
+
+
+def test_exact_resubmission_is_flagged_once_registered(client, monkeypatch, png_bytes):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    data = png_bytes(noise_rgb(seed=101))
+    first = _analyse(client, data)
+    assert "known_fake_match" not in first
+    assert _analyse(client, data)["cache"] == "memory"
+
+    r = client.post("/known-fakes", files={"file": ("fake.png", data, "image/png")},
+                    headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 201, r.text
+    again = _analyse(client, data)
+    assert again["known_fake_match"]["sha256"] == first["file_sha256"]
+    assert "cache" not in again
+
+
+def test_known_fake_is_found_behind_closer_variants(client, png_bytes):
+    first = _analyse(client, png_bytes(noise_rgb(seed=102)))
+    phash = first["image_hashes"]["phash"]
+    for bit in range(12):
+        main.phash_index.add(_flip(phash, bit), ANALYSED, sha256=f"variant-{phash}-{bit}")
+    main.phash_index.add(_flip(phash, 20, 40, 60), KNOWN_FAKE, sha256=f"fake-{phash}")
+
+    # Same picture, different bytes: misses the result cache, hits the index
+    again = _analyse(client, png_bytes(noise_rgb(seed=102)) + b"\0")
+    assert again["known_fake_match"]["sha256"] == f"fake-{phash}"
+
+
+def test_known_fake_report_replaces_the_served_pdf(client, monkeypatch, png_bytes):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    data = png_bytes(noise_rgb(seed=103))
+    case_id = _analyse(client, data)["case_id"]
+    full_pdf = client.get("/download", params={"case_id": case_id, "format": "pdf"}).content
+
+    client.post("/known-fakes", files={"file": ("fake.png", data, "image/png")},
+                headers={"Authorization": "Bearer s3cret"})
+    assert "analysis_skipped" in _analyse(client, data)
+    pdf = client.get("/download", params={"case_id": case_id, "format": "pdf"})
+    assert pdf.status_code == 200
+    assert pdf.content != full_pdf
+    assert len(pdf.content) < len(full_pdf)  # no scatter plot or tool sections
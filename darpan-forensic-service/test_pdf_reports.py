@@ -0,0 +1,81 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import pdf_reports
+from case_store import CaseStore
+from pdf_reports import PdfReports
+
+
+class FakeRenderer:
+    """build_pdf_report stand-in: the "PDF" is the report's summary; can be held mid-render."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, report, pdf_path, artifacts=None):
+        self.started.set()
+        self.release.wait(5)
+        with open(pdf_path, "wb") as f:
+            f.write(report["summary"].encode())
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    fake = FakeRenderer()
+    monkeypatch.setattr(pdf_reports, "plugin", lambda name: fake)
+    return fake
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CaseStore(tmp_path)
+
+
+def write_case(store, summary, case_id="DFP-1"):
+    path = store.case_dir(case_id) / f"{case_id}.json"
+    path.write_text(json.dumps({"case_id": case_id, "file_sha256": "ab" * 32, "summary": summary}))
+    store.register(case_id, "ab" * 32, {"json": path})
+
+
+def test_rewritten_case_is_rerendered(store, renderer):
+    reports = PdfReports(store)
+    write_case(store, "full analysis")
+    assert asyncio.run(reports.get("DFP-1")) == b"full analysis"
+    assert asyncio.run(reports.get("DFP-1")) == b"full analysis"  # memory
+    assert asyncio.run(PdfReports(store).get("DFP-1")) == b"full analysis"  # disk
+
+    write_case(store, "known fake")
+    reports.invalidate("DFP-1")
+    assert asyncio.run(reports.get("DFP-1")) == b"known fake"
+    assert asyncio.run(PdfReports(store).get("DFP-1")) == b"known fake"
+    assert reports.stats()["renders"] == 2
+
+
+def test_render_running_during_a_rewrite_is_not_kept(store, renderer):
+    reports = PdfReports(store)
+    write_case(store, "old")
+
+    async def scenario():
+        renderer.release.clear()
+        stale = asyncio.ensure_future(reports.get("DFP-1"))
+        await asyncio.to_thread(renderer.started.wait, 5)
+        write_case(store, "new")
+        reports.invalidate("DFP-1")
+        fresh = asyncio.ensure_future(reports.get("DFP-1"))
+        renderer.release.set()
+        return await stale, await fresh
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale in (b"old", b"new")  # whatever it read; the caller asked before the rewrite
+    assert fresh == b"new"
+    assert asyncio.run(reports.get("DFP-1")) == b"new"
+    assert len(list(store.case_dir("DFP-1").glob("*.pdf"))) == 1
+
+
+def test_unknown_case(store, renderer):
+    assert asyncio.run(PdfReports(store).get("DFP-missing")) is None
@@ -0,0 +1,52 @@
+import pytest
+
+import phash_index
+from phash_index import ANALYSED, KNOWN_FAKE, PHashIndex, hex_to_int
+
+BASE = 0x8F3C_5A0F_1234_ABCD
+
+
+def flipped(bits, base=BASE):
+    """`base` with the given bit positions flipped, as a 16-digit hex pHash."""
+    for b in bits:
+        base ^= 1 << b
+    return f"{base:016x}"
+
+
+@pytest.fixture(params=[False, True], ids=["pending", "merged"])
+def index(request, tmp_path, monkeypatch):
+    # Merged: every insert is folded into the sorted substring tables
+    monkeypatch.setattr(phash_index, "MERGE_THRESHOLD", 1 if request.param else 10_000)
+    return PHashIndex(tmp_path)
+
+
+def test_radius_is_inclusive(index):
+    # Spread across the four 16-bit chunks, so only one chunk may match exactly
+    index.add(flipped([1, 17, 33, 49, 60, 62]), ANALYSED, sha256="six")
+    index.add(flipped([1, 17, 33, 49, 60, 62, 63]), ANALYSED, sha256="seven")
+    assert [m["sha256"] for m in index.query(flipped([]), radius=6)] == ["six"]
+    assert [(m["sha256"], m["distance"]) for m in index.query(flipped([]), radius=7)] == [("six", 6), ("seven", 7)]
+    assert index.query(flipped([]), radius=5) == []
+
+
+def test_label_filter_is_not_crowded_out_by_closer_entries(index):
+    for i in range(15):
+        index.add(flipped([i]), ANALYSED, sha256=f"variant{i}")
+    index.add(flipped([20, 40, 50]), KNOWN_FAKE, sha256="fake", note="viral")
+    assert all(m["label"] == ANALYSED for m in index.query(flipped([]), radius=6))  # limit=10
+    fakes = index.query(flipped([]), radius=6, label=KNOWN_FAKE)
+    assert [(m["sha256"], m["distance"], m["note"]) for m in fakes] == [("fake", 3, "viral")]
+
+
+def test_readd_is_noop_and_entries_persist(index, tmp_path):
+    index.add(flipped([]), ANALYSED, sha256="a", case_id="DFP-a")
+    index.add(flipped([]), ANALYSED, sha256="a", case_id="DFP-a")
+    assert index.stats()["entries"] == 1
+    reopened = PHashIndex(tmp_path)
+    assert [m["case_id"] for m in reopened.query(flipped([]))] == ["DFP-a"]
+
+
+@pytest.mark.parametrize("bad", ["", "abc", "g" * 16, "0" * 17, "f" * 400, None])
+def test_hex_to_int_rejects_malformed_hashes(bad):
+    with pytest.raises(ValueError):
+        hex_to_int(bad)
@@ -0,0 +1,77 @@
+import json
+import threading
+
+from result_cache import ResultCache
+
+SHA_A = "aa" * 32
+SHA_B = "bb" * 32
+
+
+def test_miss_then_memory_then_disk_hit(tmp_path):
+    cache = ResultCache(tmp_path)
+    assert cache.get(SHA_A) == (None, None)
+    cache.put(SHA_A, {"case_id": "DFP-a", "score": 1})
+    assert cache.get(SHA_A) == ({"case_id": "DFP-a", "score": 1}, "memory")
+    assert ResultCache(tmp_path).get(SHA_A) == ({"case_id": "DFP-a", "score": 1}, "disk")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_reports_are_private_copies(tmp_path):
+    cache = ResultCache(tmp_path)
+    report = {"sections": {"a": 1}}
+    cache.put(SHA_A, report)
+    report["sections"]["a"] = 2
+    served, _ = cache.get(SHA_A)
+    served["cache"] = "memory"
+    assert cache.get(SHA_A)[0] == {"sections": {"a": 1}}
+
+
+def test_analyzer_version_change_invalidates(tmp_path):
+    ResultCache(tmp_path, version="1").put(SHA_A, {"v": 1})
+    assert ResultCache(tmp_path, version="2").get(SHA_A) == (None, None)
+    assert ResultCache(tmp_path, version="1").get(SHA_A) == (None, None)  # dropped on startup
+
+
+def test_disk_budget_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path, memory_entries=0, disk_limit_bytes=3000)
+    cache.put(SHA_A, {"pad": "x" * 1000})
+    cache.put(SHA_B, {"pad": "y" * 1000})
+    cache.get(SHA_A)  # B is now the oldest
+    cache.put("cc" * 32, {"pad": "z" * 1000})
+    assert cache.get(SHA_B) == (None, None)
+    assert cache.get(SHA_A)[1] == "disk"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_puts_of_one_file_leave_a_whole_report(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path)
+    halfway = threading.Barrier(2, timeout=5)
+
+    def interleaved_dump(obj, f):
+        # Both writers are mid-file at the same time
+        text = json.dumps(obj)
+        f.write(text[:len(text) // 2])
+        f.flush()
+        halfway.wait()
+        f.write(text[len(text) // 2:])
+
+    monkeypatch.setattr("result_cache.json.dump", interleaved_dump)
+    reports = [{"writer": i, "pad": str(i) * 10_000} for i in range(2)]
+    errors = []
+
+    def put(report):
+        try:
+            cache.put(SHA_A, report)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(r,)) for r in reports]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    on_disk = json.loads(cache._path(SHA_A).read_text())
+    assert on_disk == reports[on_disk["writer"]]
+    assert not list(cache._path(SHA_A).parent.glob("*.tmp"))
+    assert cache.stats()["disk_bytes"] == cache._path(SHA_A).stat().st_size
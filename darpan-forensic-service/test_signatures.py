@@ -0,0 +1,81 @@
+import io
+import struct
+import zipfile
+
+import pytest
+from PIL import Image
+
+import signatures
+from binscan import scan_file
+from conftest import noise_rgb
+from signatures import scan_buffer, scan_signatures
+
+
+def png_data(h=8, w=12):
+    buf = io.BytesIO()
+    Image.fromarray(noise_rgb(h, w)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def zip_data(name="payload.txt"):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr(name, "hidden")
+    return buf.getvalue()
+
+
+def test_embedded_zip_behind_a_png(tmp_path):
+    host, payload = png_data(), zip_data()
+    path = tmp_path / "carrier.png"
+    path.write_bytes(host + payload)
+    report = scan_signatures(path)
+    by_type = {m["type"]: m for m in report["matches"]}
+    assert report["matches"][0] == {"offset": 0, "type": "png", "description": "PNG image",
+                                    "width": 12, "height": 8}
+    assert by_type["zip"]["offset"] == len(host)
+    assert by_type["zip"]["name"] == "payload.txt"
+    # The central directory's end record sits 22 bytes before the end of the archive
+    assert by_type["zip_end"]["offset"] == len(host) + len(payload) - 22
+    assert report["embedded"] == 2 and report["size"] == len(host) + len(payload)
+    assert f"first at offset {len(host)}" in report["summary"]
+
+
+def test_offsets_are_reported_from_the_start_of_the_embedded_file():
+    # ISO BMFF matches "ftyp" 4 bytes in, tar matches "ustar" 257 bytes in
+    mp4 = struct.pack(">I", 24) + b"ftypisom" + bytes(12)
+    tar = b"a.txt".ljust(257, b"\x00") + b"ustar\x00" + bytes(250)
+    buf = bytes(100) + mp4 + bytes(30) + tar
+    matches, total = scan_buffer(buf)
+    assert [(m["type"], m["offset"]) for m in matches] == [("iso_bmff", 100), ("tar", 100 + len(mp4) + 30)]
+    assert total == 2
+
+
+def test_match_whose_file_would_start_before_offset_0_is_dropped():
+    assert scan_buffer(b"ftypisom" + bytes(8)) == ([], 0)
+
+
+@pytest.mark.parametrize("at", [0, 7, 8, 9, 15])
+def test_signatures_across_chunk_boundaries(monkeypatch, at):
+    # A prefix split over two prefix-lookup chunks must still be seen
+    monkeypatch.setattr(signatures, "CHUNK_BYTES", 8)
+    buf = bytes(at) + b"\x7fELF\x02\x01\x01" + bytes(20)
+    assert scan_buffer(buf)[0] == [{"offset": at, "type": "elf", "description": "ELF executable", "bits": 64}]
+
+
+def test_prefix_without_full_pattern_is_not_a_match():
+    assert scan_buffer(b"\xff\xd8\x00" + b"PK\x03\x00" + b"GIF8xa")[0] == []
+
+
+def test_matches_beyond_the_cap_are_counted():
+    matches, total = scan_buffer(b"".join(b"PK\x05\x06" + bytes(18) for _ in range(5)), max_matches=3)
+    assert [m["offset"] for m in matches] == [0, 22, 44]
+    assert total == 5
+
+
+def test_empty_file_and_binscan_agree(tmp_path):
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    assert scan_signatures(empty)["summary"] == "No known file signatures found."
+    path = tmp_path / "carrier.png"
+    path.write_bytes(png_data() + zip_data())
+    assert scan_file(path, max_signatures=256)["signatures"] == scan_signatures(path)
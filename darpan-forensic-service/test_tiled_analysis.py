@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import decoded_image
+from conftest import noise_rgb
+from image_stats import compute_image_stats
+from tiled_analysis import analyze_image_tiled
+
+
+@pytest.mark.parametrize("fmt,decode", [("BMP", "bands"), ("TIFF", "bands"), ("PNG", "full")])
+def test_tiled_stats_match_the_whole_image(tmp_path, fmt, decode):
+    rgb = noise_rgb(150, 110)
+    rgb[:40] //= 4  # uneven histogram, so entropy isn't saturated
+    path = tmp_path / f"image.{fmt.lower()}"
+    Image.fromarray(rgb).save(path, fmt)
+    result = analyze_image_tiled(path, tile_side=32, render=False)
+    expected = compute_image_stats(rgb)
+    assert result["stats"]["pixels"] == expected["pixels"] == 150 * 110
+    assert result["stats"]["gray_entropy"] == pytest.approx(expected["gray_entropy"])
+    assert result["stats"]["decode"] == {"mode": decode, "scale": 1}
+    assert result["lsb"] is not None
+
+
+def test_drafted_jpeg_reports_its_scale(tmp_path, monkeypatch):
+    monkeypatch.setattr(decoded_image, "DRAFT_MAX_PIXELS", 10_000)
+    path = tmp_path / "image.jpg"
+    Image.fromarray(noise_rgb(200, 160)).save(path, "JPEG")
+    stats = analyze_image_tiled(path, tile_side=32, render=False)["stats"]
+    assert stats["decode"] == {"mode": "draft", "scale": 2}
+    assert stats["pixels"] == 100 * 80
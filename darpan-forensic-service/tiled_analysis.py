@@ -0,0 +1,116 @@
+#tiled_analysis
+"""
+Memory-bounded image analysis for very large images.
+
+Pixels are read with decoded_image.BandReader one band of tiles at a time,
+so NumPy temporaries are O(band) whatever the resolution. Histograms and
+correlation moments are aggregated with StatsAccumulator, and the spectrum
+is the average power spectrum of a strided subset of native-resolution
+tiles (Bartlett's method) instead of one FFT over the whole picture.
+
+Only uncompressed layouts (BMP, PPM, uncompressed TIFF/TGA) are read band
+by band from the file. Large JPEGs are analysed at a reduced DCT scale, and
+PNG, WebP and compressed TIFF are still decoded whole by PIL; the result's
+stats["decode"] says which happened.
+"""
+import os
+
+import numpy as np
+
+from decoded_image import BandReader, open_image
+from image_stats import StatsAccumulator
+from lsb_stego import MAX_PIXELS as LSB_MAX_PIXELS, LOSSLESS_FORMATS, analyze_lsb
+from scatter_analysis import SPECTRUM_MAX_SIDE, full_spectrum, render_spectra, scatter_result
+
+# Images with at least this many pixels take the tiled path in main.py
+TILED_MIN_PIXELS = int(os.environ.get("DARPAN_TILED_MIN_PIXELS", str(40_000_000)))
+TILE_SIDE = int(os.environ.get("DARPAN_TILE_SIDE", "1024"))
+# Tiles whose spectra are averaged; spread evenly over the image
+MAX_SPECTRUM_TILES = 64
+
+
+def image_pixels(image_path):
+    """Pixel count from the header, without decoding."""
+    with open_image(image_path) as img:
+        return img.width * img.height
+
+
+def needs_tiling(image_path):
+    """True when an image is large enough to take the tiled path."""
+    return image_pixels(image_path) >= TILED_MIN_PIXELS
+
+
+def iter_tiles(reader, side=TILE_SIDE):
+    """Yield (index, (h, w, 3) uint8 tile) in row-major order, one band of tiles at a time."""
+    index = 0
+    for _, band in reader.bands(side):
+        rgb = np.asarray(band.convert("RGB"))
+        for x in range(0, reader.width, side):
+            yield index, rgb[:, x:x + side]
+            index += 1
+
+
+def _spectrum_tiles(width, height, side, limit):
+    """Indices of up to `limit` evenly spread tiles (row-major numbering)."""
+    cols, rows = -(-width // side), -(-height // side)
+    total = cols * rows
+    return set(np.linspace(0, total - 1, min(limit, total)).round().astype(int).tolist())
+
+
+class SpectrumAccumulator:
+    """Average rfft2 power spectrum of fixed-size blocks, per channel."""
+
+    def __init__(self, side=SPECTRUM_MAX_SIDE):
+        self.side = side
+        self.power = np.zeros((3, side, side // 2 + 1), dtype=np.float64)
+        self.count = 0
+
+    def update(self, tile):
+        if tile.shape[0] < self.side or tile.shape[1] < self.side:
+            return  # edge tiles would need zero padding and skew the average
+        block = tile[:self.side, :self.side].astype(np.float32).transpose(2, 0, 1)
+        self.power += np.square(np.abs(np.fft.rfft2(block)))
+        self.count += 1
+
+    def log_spectra(self):
+        if not self.count:
+            return None
+        half = np.log1p(np.sqrt(self.power / self.count)).astype(np.float32)
+        return full_spectrum(half, self.side)
+
+
+def analyze_image_tiled(image_path, tile_side=TILE_SIDE, render=True, lsb=True, artifacts=None):
+    """
+    Tiled equivalent of stats + scatter analysis (+ LSB on the first rows).
+    Returns {"stats": {"gray_entropy", "pixels", "decode"}, "scatter": ..., "lsb": ... or None},
+    where "decode" is {"mode": "bands" | "draft" | "full", "scale"} (see BandReader).
+    """
+    with BandReader(image_path) as reader:
+        fmt, width, height = reader.format, reader.width, reader.height
+        acc = StatsAccumulator()
+        spectra = SpectrumAccumulator(min(SPECTRUM_MAX_SIDE, tile_side))
+        wanted = _spectrum_tiles(width, height, tile_side, MAX_SPECTRUM_TILES) if render else set()
+
+        for index, tile in iter_tiles(reader, tile_side):
+            acc.update(tile)
+            if index in wanted:
+                spectra.update(tile)
+
+        lsb_result = None
+        if lsb:
+            if fmt in LOSSLESS_FORMATS:
+                # analyze_lsb only looks at the first rows up to its pixel cap
+                rows = max(1, min(height, LSB_MAX_PIXELS // width))
+                lsb_result = analyze_lsb(np.asarray(reader.rows(0, rows).convert("RGB")), fmt)
+            else:
+                lsb_result = analyze_lsb(None, fmt)
+        decode = {"mode": reader.decode, "scale": reader.scale}
+
+    stats = acc.result()
+    spectrum = spectra.log_spectra()
+    png = render_spectra(spectrum) if spectrum is not None else None
+    return {
+        "stats": {"gray_entropy": stats["gray_entropy"], "pixels": stats["pixels"], "decode": decode},
+        "scatter": scatter_result(stats, png, artifacts),
+        "lsb": lsb_result,
+    }
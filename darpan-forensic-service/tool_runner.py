@@ -0,0 +1,65 @@
+#tool_runner
+import asyncio
+import os
+import time
+
+# Upper bound on external tool processes running at once across all requests.
+MAX_TOOL_PROCS = int(os.environ.get("DARPAN_MAX_TOOL_PROCS", "4"))
+
+# Per-tool timeouts (seconds), overridable with e.g. DARPAN_TIMEOUT_BINWALK=90
+DEFAULT_TIMEOUTS = {"exiftool": 30, "binwalk": 60, "steghide": 15, "zsteg": 30}
+
+_proc_slots = asyncio.Semaphore(MAX_TOOL_PROCS)
+
+
+def tool_timeout(name, default=30):
+    env = os.environ.get(f"DARPAN_TIMEOUT_{name.upper()}")
+    return float(env) if env else DEFAULT_TIMEOUTS.get(name, default)
+
+
+async def run_tool(name, argv, timeout=None):
+    """
+    Run one CLI tool as an asyncio subprocess (no shell) without blocking the
+    event loop. Waiting for a process slot does not count against `timeout`.
+    """
+    timeout = timeout or tool_timeout(name)
+    result = {"tool": name, "output": "", "returncode": None, "timed_out": False}
+
+    async with _proc_slots:
+        start = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            result["error"] = str(e)
+            result["output"] = f"{name} unavailable: {e}"
+            result["wall_time_s"] = round(time.perf_counter() - start, 3)
+            return result
+
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            result["output"] = stdout.decode("utf-8", errors="ignore").strip()
+            result["returncode"] = proc.returncode
+        except asyncio.TimeoutError:
+            result["timed_out"] = True
+            result["output"] = f"{name} timed out"
+        finally:
+            # Timed out, or the caller was cancelled: don't leave the tool running
+            if proc.returncode is None:
+                proc.kill()
+                await asyncio.shield(proc.wait())
+        result["wall_time_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def run_tools(commands):
+    """
+    Run {name: argv} concurrently; returns {name: result} in the same order.
+    """
+    names = list(commands)
+    results = await asyncio.gather(*(run_tool(n, commands[n]) for n in names))
+    return dict(zip(names, results))